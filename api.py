@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Serviço HTTP do cálculo do consumo referencial, para integração com outros sistemas
+# (SCADA, faturamento) sem passar pela interface do Streamlit.
+#
+# Usa apenas a biblioteca padrão (http.server): as requisições são atendidas em
+# threads e o cálculo roda em um pool de processos. Cada resposta traz o tempo de
+# processamento no cabeçalho `Server-Timing`, e `/metricas` expõe o histograma de
+# duração por rota no formato do Prometheus.
+#
+# Tempo limite (`--timeout`): o cliente recebe 504 ao estourá-lo, mas uma tarefa
+# já em execução no pool não pode ser cancelada de fora. Por isso o prazo também
+# vale dentro dos processos de trabalho: toda tarefa recebe o prazo absoluto da
+# requisição e não começa se ele já passou (pedidos que esperaram na fila não
+# ocupam o pool à toa), e o lote confere o prazo antes de cada série, devolvendo
+# as restantes com erro "TempoEsgotado". Assim um processo fica preso no máximo
+# pelo cálculo de uma série além do prazo, sem recriar o pool (o que derrubaria
+# as requisições de outros clientes).
+#
+# Rotas (corpo e resposta em JSON):
+#   GET  /saude
+#   GET  /metricas
+#   POST /vazoes               {"consumo_ref", "dias_mes", "horas_operacao", "k1", "k2"}
+#   POST /consumo-referencial  {"consumo": [...], "modelo", "percentil"}
+#   POST /testes-normalidade   {"consumo": [...], "corrigidos": true}  (Lilliefors/Anderson-Darling)
+#   POST /coeficientes         {"data_hora": [...], "volume": [...], "cobertura": [...], "percentil"}
+#   POST /calcular             {"consumo": [...], "modelo", "percentil", "dias_mes", "horas_operacao", "k1", "k2"}
+#   POST /lote                 {"series": [{"id", "consumo", ...}], parâmetros comuns a todas as séries}
+#
+# Uso:
+#   python api.py --porta 8600 --workers 4
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotado
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from calculo import TEMPO_DIA, calcular_vazoes
+from instrumentacao import AgregadorMetricas
+
+PARAMETROS_PADRAO = {
+    "modelo": "KDE",
+    "percentil": 95,
+    "dias_mes": 30,
+    "horas_operacao": 24,
+    "k1": 1.4,
+    "k2": 2.0,
+}
+MODELOS = ("KDE", "Distribuição Normal")
+# Tamanho máximo do corpo de uma requisição (bytes)
+CORPO_MAX = 50 * 2 ** 20
+
+
+def _numero(corpo, nome, padrao, minimo=None, maximo=None, inteiro=False):
+    valor = corpo.get(nome, padrao)
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise ValueError(f"O campo '{nome}' deve ser numérico.")
+    if inteiro and valor != int(valor):
+        raise ValueError(f"O campo '{nome}' deve ser inteiro.")
+    if minimo is not None and valor < minimo:
+        raise ValueError(f"O campo '{nome}' deve ser maior ou igual a {minimo}.")
+    if maximo is not None and valor > maximo:
+        raise ValueError(f"O campo '{nome}' deve ser menor ou igual a {maximo}.")
+    return int(valor) if inteiro else float(valor)
+
+
+def validar_parametros(corpo, base=PARAMETROS_PADRAO):
+    """Parâmetros do projeto com os mesmos limites da aba Cálculo; campos ausentes vêm de `base`."""
+    modelo = corpo.get("modelo", base["modelo"])
+    if modelo not in MODELOS:
+        raise ValueError(f"Modelo desconhecido: {modelo} (use {' ou '.join(MODELOS)}).")
+    return {
+        "modelo": modelo,
+        "percentil": _numero(corpo, "percentil", base["percentil"], 50, 99, inteiro=True),
+        "dias_mes": _numero(corpo, "dias_mes", base["dias_mes"], 1, 31, inteiro=True),
+        "horas_operacao": _numero(corpo, "horas_operacao", base["horas_operacao"], 1, 24, inteiro=True),
+        "k1": _numero(corpo, "k1", base["k1"], 1.0),
+        "k2": _numero(corpo, "k2", base["k2"], 1.0),
+    }
+
+
+def validar_consumo(valores, minimo=3):
+    if not isinstance(valores, list) or len(valores) < minimo:
+        raise ValueError(f"O campo 'consumo' deve ser uma lista com pelo menos {minimo} valores.")
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in valores):
+        raise ValueError("O campo 'consumo' deve conter apenas números finitos.")
+    return [float(v) for v in valores]
+
+
+def _para_json(obj):
+    # Valores não finitos (ex.: p-valor indefinido) viram null, pois o JSON não os aceita
+    if isinstance(obj, dict):
+        return {k: _para_json(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_para_json(v) for v in obj]
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    return obj
+
+
+# -- Tarefas executadas no pool de processos ----------------------------------------
+
+def _aquecer():
+    # Importa as dependências pesadas na partida de cada processo, e não na primeira requisição
+    import scipy.stats  # noqa: F401
+    import estatistica  # noqa: F401
+
+
+def _tarefa_consumo_ref(consumo, modelo, percentil):
+    from calculo import consumo_referencial
+    return {"consumo_ref": consumo_referencial(consumo, modelo, percentil)}
+
+
+def _tarefa_testes(consumo, corrigidos=False):
+    from calculo import testes_normalidade, textos_testes
+    testes = testes_normalidade(consumo)
+    if corrigidos:
+        from normalidade import testes_corrigidos
+        testes.update(testes_corrigidos(consumo))
+    resultado = {nome: {"estatistica": e, "p_valor": p} for nome, (e, p) in testes.items()}
+    resultado["interpretacao"] = textos_testes(testes)
+    return resultado
+
+
+def _tarefa_coeficientes(data_hora, volume, cobertura, percentil):
+    import pandas as pd
+    from coeficientes import estimar_k1_k2
+
+    indice = pd.DatetimeIndex(pd.to_datetime(data_hora))
+    volume = pd.Series(volume, index=indice, dtype=float).sort_index()
+    if cobertura is not None:
+        cobertura = pd.Series(cobertura, index=indice, dtype=float).sort_index()
+    estimativa = estimar_k1_k2(volume, cobertura, percentil)
+    return {
+        "k1": estimativa["k1"],
+        "k2": estimativa["k2"],
+        "dias": estimativa["dias"],
+        "k1_anual": {str(ano): float(v) for ano, v in estimativa["k1_anual"].items()},
+        "distribuicao": {str(p): linha for p, linha in estimativa["distribuicao"].to_dict("index").items()},
+    }
+
+
+def _tarefa_calcular(consumo, parametros):
+    from calculo import calcular_projeto
+    return calcular_projeto(consumo, tempo_dia=TEMPO_DIA, **parametros)
+
+
+def _com_prazo(prazo, funcao, *args):
+    # `prazo` é um instante absoluto (time.time(), comum a todos os processos)
+    if time.time() > prazo:
+        raise TempoEsgotado("Prazo da requisição esgotado antes do início do cálculo.")
+    return funcao(*args)
+
+
+def _tarefa_lote(itens, prazo=None):
+    """Calcula um bloco de séries; devolve uma lista de resultados ou erros, na ordem recebida.
+
+    Com `prazo` (instante absoluto, em time.time()), as séries que restarem depois
+    dele não são calculadas e voltam com o erro "TempoEsgotado".
+    """
+    from calculo import calcular_projeto
+
+    saida = []
+    for identificador, consumo, parametros in itens:
+        if prazo is not None and time.time() > prazo:
+            saida.append({"id": identificador, "erro": "TempoEsgotado",
+                          "mensagem": "O prazo da requisição acabou antes do cálculo desta série."})
+            continue
+        try:
+            resultado = {"id": identificador}
+            resultado.update(calcular_projeto(consumo, tempo_dia=TEMPO_DIA, **parametros))
+            saida.append(resultado)
+        except Exception as e:
+            saida.append({"id": identificador, "erro": type(e).__name__, "mensagem": str(e)})
+    return saida
+
+
+class ServicoCalculo:
+    """Despacha as rotas para o pool de processos e registra a duração de cada requisição."""
+
+    def __init__(self, workers=None, timeout=60.0, metricas=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.metricas = metricas or AgregadorMetricas()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_aquecer)
+        self._rotas = {
+            "/vazoes": self._vazoes,
+            "/consumo-referencial": self._consumo_ref,
+            "/testes-normalidade": self._testes,
+            "/coeficientes": self._coeficientes,
+            "/calcular": self._calcular,
+            "/lote": self._lote,
+        }
+
+    @property
+    def rotas(self):
+        return list(self._rotas)
+
+    def _executar(self, funcao, *args):
+        futuro = self._executor.submit(_com_prazo, time.time() + self.timeout, funcao, *args)
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TempoEsgotado:
+            futuro.cancel()
+            raise
+
+    def _vazoes(self, corpo):
+        parametros = validar_parametros(corpo)
+        if "consumo_ref" not in corpo:
+            raise ValueError("Informe o campo 'consumo_ref'.")
+        consumo_ref = _numero(corpo, "consumo_ref", None, 0.0)
+        return calcular_vazoes(consumo_ref, parametros["dias_mes"], parametros["horas_operacao"],
+                               parametros["k1"], parametros["k2"], TEMPO_DIA)
+
+    def _consumo_ref(self, corpo):
+        parametros = validar_parametros(corpo)
+        return self._executar(_tarefa_consumo_ref, validar_consumo(corpo.get("consumo")),
+                              parametros["modelo"], parametros["percentil"])
+
+    def _testes(self, corpo):
+        return self._executar(_tarefa_testes, validar_consumo(corpo.get("consumo")), bool(corpo.get("corrigidos")))
+
+    def _coeficientes(self, corpo):
+        data_hora, volume = corpo.get("data_hora"), corpo.get("volume")
+        cobertura = corpo.get("cobertura")
+        if not isinstance(data_hora, list) or not isinstance(volume, list) or len(data_hora) != len(volume):
+            raise ValueError("Informe 'data_hora' e 'volume' como listas de mesmo tamanho.")
+        if cobertura is not None and (not isinstance(cobertura, list) or len(cobertura) != len(volume)):
+            raise ValueError("O campo 'cobertura' deve ter o mesmo tamanho de 'volume'.")
+        percentil = _numero(corpo, "percentil", 100, 50, 100, inteiro=True)
+        return self._executar(_tarefa_coeficientes, data_hora, volume, cobertura, percentil)
+
+    def _calcular(self, corpo):
+        return self._executar(_tarefa_calcular, validar_consumo(corpo.get("consumo")), validar_parametros(corpo))
+
+    def _lote(self, corpo):
+        series = corpo.get("series")
+        if not isinstance(series, list) or not series:
+            raise ValueError("O campo 'series' deve ser uma lista não vazia.")
+        comuns = validar_parametros(corpo)
+        itens, resultados = [], [None] * len(series)
+        for i, serie in enumerate(series):
+            identificador = serie.get("id", i) if isinstance(serie, dict) else i
+            try:
+                if not isinstance(serie, dict):
+                    raise ValueError("Cada série deve ser um objeto com o campo 'consumo'.")
+                itens.append((i, (identificador, validar_consumo(serie.get("consumo")),
+                                  validar_parametros(serie, comuns))))
+            except ValueError as e:
+                resultados[i] = {"id": identificador, "erro": "ValueError", "mensagem": str(e)}
+        # Blocos de séries por tarefa, para diluir o custo de comunicação entre processos
+        n_blocos = min(len(itens), self.workers * 4) or 1
+        blocos = [itens[j::n_blocos] for j in range(n_blocos)]
+        prazo = time.time() + self.timeout
+        futuros = [self._executor.submit(_tarefa_lote, [item for _, item in bloco], prazo)
+                   for bloco in blocos if bloco]
+        limite = time.monotonic() + self.timeout
+        for bloco, futuro in zip([b for b in blocos if b], futuros):
+            try:
+                saida = futuro.result(timeout=max(limite - time.monotonic(), 0))
+            except TempoEsgotado:
+                for f in futuros:
+                    f.cancel()
+                raise
+            for (i, _), resultado in zip(bloco, saida):
+                resultados[i] = resultado
+        return {
+            "resultados": resultados,
+            "calculados": sum("erro" not in r for r in resultados),
+            "erros": sum("erro" in r for r in resultados),
+        }
+
+    def atender(self, rota, corpo):
+        """Executa a rota; devolve (status HTTP, resposta)."""
+        funcao = self._rotas.get(rota)
+        if funcao is None:
+            return 404, {"erro": f"Rota desconhecida: {rota}"}
+        if not isinstance(corpo, dict):
+            return 400, {"erro": "O corpo da requisição deve ser um objeto JSON."}
+        try:
+            return 200, funcao(corpo)
+        except TempoEsgotado:
+            return 504, {"erro": f"O cálculo excedeu o tempo limite de {self.timeout:.0f} s."}
+        except ValueError as e:
+            return 400, {"erro": str(e)}
+        except Exception as e:
+            return 500, {"erro": f"{type(e).__name__}: {e}"}
+
+    def encerrar(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def criar_servidor(servico, host="127.0.0.1", porta=8600):
+    """Servidor HTTP (uma thread por requisição) ligado a `servico`."""
+
+    class _Handler(BaseHTTPRequestHandler):
+        def _responder(self, status, corpo, inicio, tipo="application/json; charset=utf-8"):
+            if isinstance(corpo, str):
+                dados = corpo.encode("utf-8")
+            else:
+                dados = json.dumps(_para_json(corpo), ensure_ascii=False).encode("utf-8")
+            segundos = time.perf_counter() - inicio
+            # Rotas desconhecidas são agrupadas, para não criar uma série de métricas por URL
+            rota = self.path if self.path in servico.rotas or self.path in ("/saude", "/metricas") else "outra"
+            servico.metricas.registrar_etapa(f"api {self.command} {rota}", segundos)
+            self.send_response(status)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(dados)))
+            self.send_header("Server-Timing", f"total;dur={segundos * 1000:.1f}")
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            inicio = time.perf_counter()
+            if self.path == "/saude":
+                self._responder(200, {"status": "ok", "workers": servico.workers, "rotas": servico.rotas}, inicio)
+            elif self.path == "/metricas":
+                self._responder(200, servico.metricas.prometheus(), inicio,
+                                "text/plain; version=0.0.4; charset=utf-8")
+            else:
+                self._responder(404, {"erro": f"Rota desconhecida: {self.path}"}, inicio)
+
+        def do_POST(self):
+            inicio = time.perf_counter()
+            try:
+                tamanho = int(self.headers.get("Content-Length") or 0)
+                if tamanho < 0:
+                    raise ValueError(tamanho)
+            except ValueError:
+                self._responder(400, {"erro": "Content-Length inválido."}, inicio)
+                return
+            if tamanho > CORPO_MAX:
+                self._responder(413, {"erro": "Corpo da requisição muito grande."}, inicio)
+                return
+            try:
+                corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+            except ValueError:
+                self._responder(400, {"erro": "JSON inválido."}, inicio)
+                return
+            status, resposta = servico.atender(self.path, corpo)
+            self._responder(status, resposta, inicio)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, int(porta)), _Handler)
+
+
+class ClienteCalculo:
+    """Cliente mínimo (urllib) do serviço, para testes e integrações simples."""
+
+    def __init__(self, url="http://127.0.0.1:8600", timeout=120.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def chamar(self, rota, corpo=None):
+        """Devolve (status HTTP, resposta decodificada)."""
+        dados = None if corpo is None else json.dumps(corpo).encode("utf-8")
+        pedido = urllib.request.Request(self.url + rota, data=dados,
+                                        headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(pedido, timeout=self.timeout) as resposta:
+                return resposta.status, json.loads(resposta.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b"{}")
+
+    def calcular(self, consumo, **parametros):
+        return self.chamar("/calcular", {"consumo": list(consumo), **parametros})
+
+    def lote(self, series, **parametros):
+        """`series` é um dicionário {id: consumo} ou uma lista de objetos com 'id' e 'consumo'."""
+        if isinstance(series, dict):
+            series = [{"id": chave, "consumo": list(valores)} for chave, valores in series.items()]
+        return self.chamar("/lote", {"series": series, **parametros})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP do cálculo do consumo referencial.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=None, help="Processos de cálculo (padrão: nº de CPUs)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Tempo máximo por requisição (s)")
+    args = parser.parse_args(argv)
+
+    servico = ServicoCalculo(args.workers, args.timeout)
+    servidor = criar_servidor(servico, args.host, args.porta)
+    print(f"Serviço de cálculo em http://{args.host}:{args.porta} ({servico.workers} processos)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servico.encerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,26 +5,63 @@
 
 
 import streamlit as st
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import norm, shapiro, normaltest, kstest
 import os
 import base64
+import uuid
 
-from io import BytesIO
-from docx import Document
-from docx.shared import Inches, Cm
+from instrumentacao import Cronometro, HistoricoSessao, METRICAS, iniciar_servidor_metricas
+
+# As dependências pesadas (pandas, scipy, matplotlib, python-docx) são
+# importadas apenas pela aba ou etapa que as utiliza; as abas informativas
+# carregam somente o Streamlit (ver medir_inicializacao.py).
 
 # 1) Configuração da página (deve ser a primeira chamada de Streamlit)
 st.set_page_config(page_title="Consumo Referencial", layout="centered")
 
-# 2) Persistência do DataFrame e chave do uploader no session_state
-if "df_consumo" not in st.session_state:
-    st.session_state.df_consumo = None
+# 2) Persistência da série (arrays compactos, ver projetos.SerieConsumo) e chave do uploader no session_state
+if "serie_consumo" not in st.session_state:
+    st.session_state.serie_consumo = None
 if "uploader_key" not in st.session_state:
     st.session_state.uploader_key = 0
+if "df_horario" not in st.session_state:
+    st.session_state.df_horario = None
+if "resumo_consumo" not in st.session_state:
+    st.session_state.resumo_consumo = None
+if "df_setores" not in st.session_state:
+    st.session_state.df_setores = None
+# Execução aberta do repositório de projetos (resultados salvos reaproveitados sem recálculo)
+if "execucao_aberta" not in st.session_state:
+    st.session_state.execucao_aberta = None
+# K1 e K2 estimados das leituras do sensor em uma execução aberta (o sensor não é salvo)
+if "k_salvo" not in st.session_state:
+    st.session_state.k_salvo = None
+# Valores iniciais dos campos do projeto e dos parâmetros (chaves do session_state)
+CAMPOS_PROJETO = {
+    "nome_projeto": "Projeto 1",
+    "tecnico_operador": "",
+    "tipo_medicao": "Micromedição - Hidrômetros",
+    "modelo": "KDE",
+    "percentil": 95,
+    "dias_mes": 30,
+    "horas_operacao": 24,
+    "k1": 1.4,
+    "k2": 2.0,
+    "percentil_k": 100,
+    "tipo_hist": "Frequência Absoluta",
+}
+
+# Instrumentação: tempo de cada etapa nesta execução do script e histórico da sessão
+if "sessao_id" not in st.session_state:
+    st.session_state.sessao_id = uuid.uuid4().hex[:12]
+    st.session_state.historico_metricas = HistoricoSessao()
+cronometro = Cronometro()
+
+@st.cache_resource
+def servidor_metricas(porta, host):
+    return iniciar_servidor_metricas(porta, host=host)
+
+if os.environ.get("CONSUMO_METRICAS_PORTA"):
+    servidor_metricas(int(os.environ["CONSUMO_METRICAS_PORTA"]), os.environ.get("CONSUMO_METRICAS_HOST", "127.0.0.1"))
 
 # 3) Submenu "Abastecimento de Água" com as quatro opções
 st.sidebar.title("Demanda Hídrica:")
@@ -35,452 +72,935 @@ aba = st.sidebar.selectbox("Consumo e Vazão", [
     "📘 Sobre o Modelo Estatístico"
 ])
 
-# Função para formatação numérica: ponto para milhar e vírgula para decimal
-def format_num(value, decimals=2):
-    fmt = f",.{decimals}f" if decimals > 0 else f",.0f"
-    return f"{value:{fmt}}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-# 4) Aba "Cálculo do Consumo e Vazão"
-if aba == "🧮 Cálculo":
-    st.title("Cálculo do Consumo Referencial")
-
-    st.header("Dados do Projeto")
-    # Limite de 140 caracteres para os campos de texto
-    nome_projeto = st.text_input("Nome do Projeto", value="Projeto 1", max_chars=140)
-    tecnico_operador = st.text_input("Técnico Operador", value="", max_chars=140)
-    tipo_medicao = st.selectbox("Tipo de Medição", [
-        "Micromedição - Hidrômetros",
-        "Macromedição - Sensores de Vazão"
-    ])
-
-    st.header("1. Dados de Consumo Mensal")
-    # Se o CSV já estiver carregado, exibe mensagem e permite carregar outro
-    if st.session_state.df_consumo is not None:
-        st.info("Arquivo CSV já carregado.")
-        if st.button("Carregar outro arquivo CSV"):
-            st.session_state.df_consumo = None
-            st.session_state.uploader_key += 1  # Reinicializa o uploader
-            pass
+
+# Cache por etapa do cálculo (tamanho limitado, descarte dos itens mais antigos).
+# A chave é o hash do conteúdo dos dados + apenas os parâmetros usados pela etapa;
+# argumentos iniciados por "_" não entram na chave do Streamlit.
+CACHE_MAX_ENTRADAS = 64
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def kde_em_cache(chave_dados, _consumo):
+    from estatistica import ajustar_kde
+    return ajustar_kde(_consumo, bw_adjust=1)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def consumo_ref_em_cache(chave_dados, modelo, percentil, _consumo):
+    from calculo import consumo_referencial
+    kde = kde_em_cache(chave_dados, _consumo) if modelo == "KDE" else None
+    return consumo_referencial(_consumo, modelo, percentil, kde=kde)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def estatisticas_em_cache(chave_dados, _consumo):
+    from calculo import estatisticas_basicas
+    return estatisticas_basicas(_consumo)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def testes_em_cache(chave_dados, _consumo):
+    from calculo import testes_normalidade
+    return testes_normalidade(_consumo)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner="Consultando a distribuição nula (Monte Carlo)...")
+def testes_corrigidos_em_cache(chave_dados, _consumo):
+    from normalidade import testes_corrigidos
+    return testes_corrigidos(_consumo)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def fig_distribuicao_em_cache(chave_dados, stat_param, consumo_ref, rotulo_ref, _consumo):
+    from graficos import figura_distribuicao, renderizar_png
+    basicas = estatisticas_em_cache(chave_dados, _consumo)
+    return renderizar_png(figura_distribuicao, _consumo, kde_em_cache(chave_dados, _consumo), basicas["media"],
+                          basicas["desvio_padrao"], consumo_ref, rotulo_ref, stat_param)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def fig_cdf_em_cache(chave_dados, _consumo):
+    from graficos import figura_cdf, renderizar_png
+    basicas = estatisticas_em_cache(chave_dados, _consumo)
+    return renderizar_png(figura_cdf, kde_em_cache(chave_dados, _consumo), basicas["media"], basicas["desvio_padrao"])
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def series_distribuicao_em_cache(chave_dados, stat_param, _consumo):
+    from graficos_interativos import series_distribuicao
+    basicas = estatisticas_em_cache(chave_dados, _consumo)
+    return series_distribuicao(_consumo, kde_em_cache(chave_dados, _consumo), basicas["media"],
+                               basicas["desvio_padrao"], stat_param)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def series_cdf_em_cache(chave_dados, _consumo):
+    from graficos_interativos import series_cdf
+    basicas = estatisticas_em_cache(chave_dados, _consumo)
+    return series_cdf(kde_em_cache(chave_dados, _consumo), basicas["media"], basicas["desvio_padrao"])
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def grade_em_cache(chave_dados, modelo, faixa_p, faixa_h, k1s, k2s, dias_mes, _consumo):
+    import numpy as np
+    from calculo import grade_sensibilidade
+    kde = kde_em_cache(chave_dados, _consumo) if modelo == "KDE" else None
+    return grade_sensibilidade(_consumo, modelo, np.arange(faixa_p[0], faixa_p[1] + 1),
+                               np.arange(faixa_h[0], faixa_h[1] + 1), k1s, k2s, dias_mes, kde=kde)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def setores_em_cache(chave_setores, modelo, percentil, dias_mes, horas_operacao, k1, k2, _df_setores):
+    from setores import calcular_setores
+    return calcular_setores(_df_setores, modelo, percentil, dias_mes, horas_operacao, k1, k2)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def k_empirico_em_cache(percentil_k, df_horario):
+    from coeficientes import estimar_k1_k2
+    return estimar_k1_k2(df_horario["volume"], df_horario["cobertura"], percentil_k)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRADAS, show_spinner="Reamostrando (bootstrap)...")
+def bootstrap_em_cache(chave_dados, modelo, percentil, n_replicas, semente, _consumo):
+    from estatistica import bootstrap_consumo_ref
+    return bootstrap_consumo_ref(_consumo, percentil, modelo, n_replicas, semente)
+
+# Repositório de projetos salvos (SQLite), compartilhado pelas sessões
+@st.cache_resource
+def repositorio_projetos():
+    import sqlite3
+    from projetos import RepositorioProjetos
+    try:
+        return RepositorioProjetos()
+    except (sqlite3.Error, OSError):
+        return None  # Sem banco gravável: o app funciona sem salvar projetos
+
+# Fila de relatórios Word compartilhada pelas sessões (processos em segundo plano)
+@st.cache_resource
+def fila_relatorios():
+    from relatorio import FilaRelatorios
+    # O tempo de geração (da submissão até o relatório pronto) entra nas métricas do processo
+    return FilaRelatorios(workers=2, max_artefatos=CACHE_MAX_ENTRADAS,
+                          ao_concluir=lambda chave, segundos: METRICAS.registrar_etapa("relatorio_geracao", segundos))
+
+# Consulta periódica apenas enquanto o relatório está pendente; ao terminar, a
+# execução completa do script exibe o resultado e o temporizador deixa de existir
+@st.fragment(run_every=1)
+def acompanhar_relatorio(chave):
+    futuro = fila_relatorios().obter(chave)
+    if futuro is None or futuro.done():
+        st.rerun()
+    st.info("Gerando o relatório em segundo plano... Você pode continuar usando o app.")
+
+def painel_relatorio(chave, chave_atual):
+    from relatorio import MIME_DOCX
+    futuro = fila_relatorios().obter(chave)
+    if futuro is None:
+        return
+    if not futuro.done():
+        acompanhar_relatorio(chave)
+    elif futuro.exception() is not None:
+        st.error(f"Erro ao gerar o relatório: {futuro.exception()}")
     else:
-        uploaded_file = st.file_uploader(
-            "Faça o upload de um arquivo CSV (2 colunas: Mês, Consumo (m³))",
-            type="csv",
-            key=st.session_state.uploader_key
+        if chave != chave_atual:
+            st.warning("Os dados ou parâmetros mudaram desde a geração deste relatório.")
+        st.download_button(
+            label="Baixar Relatório Word",
+            data=futuro.result(),
+            file_name="Relatorio_Consumo.docx",
+            mime=MIME_DOCX,
+            key=f"baixar_{chave}"
         )
-        if uploaded_file is not None:
-            try:
-                df = pd.read_csv(uploaded_file)
-                if df.shape[1] >= 2:
-                    df.columns = ['Mês', 'Consumo (m³)']
-                    st.session_state.df_consumo = df
+
+# Captura opcional (cProfile) das abas desta execução, pedida pelo painel de desempenho
+perfilador = None
+if st.session_state.get("perfilar_proxima"):
+    import cProfile
+    st.session_state.perfilar_proxima = False
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+
+try:
+    # 4) Aba "Cálculo do Consumo e Vazão"
+    if aba == "🧮 Cálculo":
+        import numpy as np
+        import pandas as pd
+        from calculo import TEMPO_DIA, format_num, textos_testes, ler_consumo_csv, hash_dados, calcular_vazoes
+        from projetos import SerieConsumo, formatar_data
+
+        st.title("Cálculo do Consumo Referencial")
+
+        # Campos com chave no session_state: ao abrir um projeto salvo, recebem os
+        # parâmetros da execução (por isso são criados sem `value`)
+        for campo, padrao in CAMPOS_PROJETO.items():
+            st.session_state.setdefault(campo, padrao)
+
+        # Projetos salvos: a série, os parâmetros e os resultados voltam sem recálculo
+        repositorio = repositorio_projetos()
+        projetos_salvos = repositorio.projetos() if repositorio is not None else []
+        if projetos_salvos:
+            with st.expander("📂 Abrir projeto salvo"):
+                projeto_escolhido = st.selectbox("Projeto", [nome for nome, _, _ in projetos_salvos])
+                execucoes_salvas = dict(repositorio.execucoes(projeto_escolhido))
+                id_escolhido = st.selectbox("Execução", list(execucoes_salvas),
+                                            format_func=lambda i: formatar_data(execucoes_salvas[i]))
+                if st.button("Abrir projeto"):
+                    with cronometro.etapa("abrir_projeto"):
+                        execucao = repositorio.abrir(id_escolhido)
+                    st.session_state.serie_consumo = execucao.serie
+                    st.session_state.df_horario = None
+                    st.session_state.resumo_consumo = None
+                    st.session_state.df_setores = None
+                    st.session_state.execucao_aberta = execucao
+                    st.session_state.nome_projeto = execucao.projeto
+                    parametros_salvos = execucao.parametros
+                    # K estimado do sensor não volta para os campos de K1/K2: pode ficar abaixo
+                    # do mínimo (1,0) e seria alterado pelo widget. Execuções antigas não têm
+                    # "origem_k"; valores abaixo de 1,0 só podem ter vindo da estimativa.
+                    k_estimado = (parametros_salvos.get("origem_k") == "sensor"
+                                  or min(parametros_salvos.get("k1", 1.0), parametros_salvos.get("k2", 1.0)) < 1.0)
+                    for campo in CAMPOS_PROJETO:
+                        if campo in parametros_salvos and not (k_estimado and campo in ("k1", "k2")):
+                            st.session_state[campo] = parametros_salvos[campo]
+                    st.session_state.k_salvo = ({"k1": parametros_salvos["k1"], "k2": parametros_salvos["k2"],
+                                                 "percentil_k": parametros_salvos.get("percentil_k")}
+                                                if k_estimado else None)
+                    st.session_state.uploader_key += 1
+
+        st.header("Dados do Projeto")
+        # Limite de 140 caracteres para os campos de texto
+        nome_projeto = st.text_input("Nome do Projeto", max_chars=140, key="nome_projeto")
+        tecnico_operador = st.text_input("Técnico Operador", max_chars=140, key="tecnico_operador")
+        tipo_medicao = st.selectbox("Tipo de Medição", [
+            "Micromedição - Hidrômetros",
+            "Macromedição - Sensores de Vazão"
+        ], key="tipo_medicao")
+
+        st.header("1. Dados de Consumo Mensal")
+        # Se o CSV já estiver carregado, exibe mensagem e permite carregar outro
+        if st.session_state.serie_consumo is not None:
+            st.info("Arquivo CSV já carregado.")
+            if st.button("Carregar outro arquivo CSV"):
+                st.session_state.serie_consumo = None
+                st.session_state.df_horario = None
+                st.session_state.resumo_consumo = None
+                st.session_state.df_setores = None
+                st.session_state.execucao_aberta = None
+                st.session_state.k_salvo = None
+                st.session_state.uploader_key += 1  # Reinicializa o uploader
+                pass
+        else:
+            formatos = ["Consumo mensal (CSV)", "Vários setores (CSV no formato longo ou largo)"]
+            if tipo_medicao == "Macromedição - Sensores de Vazão":
+                formatos.append("Leituras brutas do sensor (CSV, CSV.gz ou Parquet)")
+            formato_dados = st.radio("Formato dos dados", formatos)
+            if formato_dados == "Consumo mensal (CSV)":
+                uploaded_file = st.file_uploader(
+                    "Faça o upload de um arquivo CSV (2 colunas: Mês, Consumo (m³))",
+                    type="csv",
+                    key=st.session_state.uploader_key
+                )
+            elif formato_dados == "Vários setores (CSV no formato longo ou largo)":
+                from setores import hash_setores, ler_setores, serie_setor
+
+                uploaded_file = None
+                arquivo_setores = st.file_uploader(
+                    "Faça o upload de um CSV com as colunas setor, Mês e Consumo (m³), "
+                    "ou com a coluna Mês e uma coluna por setor",
+                    type="csv",
+                    key=f"setores_{st.session_state.uploader_key}"
+                )
+                if arquivo_setores is not None:
+                    try:
+                        with cronometro.etapa("leitura_dados"):
+                            df_setores = ler_setores(arquivo_setores)
+                        st.session_state.df_setores = df_setores
+                        st.session_state.chave_setores = hash_setores(df_setores)
+                        st.session_state.serie_consumo = SerieConsumo.da_tabela(
+                            serie_setor(df_setores, df_setores["setor"].iloc[0]))
+                        st.success(f"{df_setores['setor'].nunique()} setores carregados com sucesso!")
+                    except ValueError as e:
+                        st.error(str(e))
+                    except Exception as e:
+                        st.error(f"Erro ao ler o CSV: {e}")
+            else:
+                from ingestao import TIPOS_LEITURA, agregar_leituras
+
+                uploaded_file = None
+                arquivo_bruto = st.file_uploader(
+                    "Faça o upload das leituras do sensor (data/hora e leitura)",
+                    type=["csv", "gz", "parquet"],
+                    key=f"bruto_{st.session_state.uploader_key}"
+                )
+                col_a, col_b = st.columns(2)
+                coluna_tempo = col_a.text_input("Coluna de data/hora", value="data_hora")
+                coluna_valor = col_b.text_input("Coluna da leitura", value="valor")
+                tipo_leitura = col_a.selectbox("Tipo de leitura", list(TIPOS_LEITURA),
+                                               format_func=TIPOS_LEITURA.get)
+                lacuna_max = col_b.number_input("Intervalo máximo sem lacuna (min)", min_value=1.0, value=60.0)
+                vazao_max = col_a.number_input("Vazão máxima plausível (L/s, 0 = sem limite)", min_value=0.0, value=0.0)
+                corrigir = col_b.checkbox("Extrapolar o volume pela cobertura do mês")
+                if arquivo_bruto is not None and st.button("Agregar leituras em consumo mensal"):
+                    try:
+                        with st.spinner("Agregando leituras..."):
+                            with cronometro.etapa("leitura_dados"):
+                                agregador = agregar_leituras(arquivo_bruto, coluna_tempo, coluna_valor, tipo_leitura,
+                                                             lacuna_max, vazao_max or None)
+                                df = agregador.resultado(corrigir)
+                        if df.empty:
+                            st.error("Nenhuma leitura válida encontrada no arquivo.")
+                        else:
+                            st.session_state.serie_consumo = SerieConsumo.da_tabela(df)
+                            # Volumes horários guardados (em float32) para a estimativa empírica de K1 e K2
+                            st.session_state.df_horario = agregador.horario()[["volume", "cobertura"]].astype("float32")
+                            st.success(f"{len(df)} meses agregados a partir das leituras do sensor.")
+                    except Exception as e:
+                        st.error(f"Erro ao agregar as leituras: {e}")
+            if uploaded_file is not None:
+                try:
+                    with cronometro.etapa("leitura_dados"):
+                        serie = SerieConsumo.da_tabela(ler_consumo_csv(uploaded_file))
+                    st.session_state.serie_consumo = serie
                     st.success("Arquivo carregado com sucesso!")
+                except ValueError as e:
+                    st.error(str(e))
+                except Exception as e:
+                    st.error(f"Erro ao ler o CSV: {e}")
+
+        # Se o CSV está carregado, prossegue com o cálculo
+        if st.session_state.serie_consumo is not None:
+            serie = st.session_state.serie_consumo
+            df_setores = st.session_state.df_setores
+
+            if df_setores is not None:
+                # Vários setores: a análise detalhada abaixo é a do setor escolhido
+                from setores import serie_setor
+                setor = st.selectbox("Setor detalhado", df_setores["setor"].unique())
+                serie = SerieConsumo.da_tabela(serie_setor(df_setores, setor))
+                st.session_state.serie_consumo = serie
+
+            # Modo incremental (um único sistema): novos meses atualizam o resumo do projeto
+            # (momentos + sketch de quantis) em vez de reprocessar a série inteira
+            if df_setores is None:
+                with st.expander("➕ Acrescentar meses (modo incremental)"):
+                    from incremental import ResumoConsumo
+
+                    arquivo_novos = st.file_uploader(
+                        "CSV com os novos meses (2 colunas: Mês, Consumo (m³))",
+                        type="csv",
+                        key=f"novos_{st.session_state.uploader_key}"
+                    )
+                    if arquivo_novos is not None and st.button("Acrescentar ao projeto"):
+                        try:
+                            df_novos = ler_consumo_csv(arquivo_novos)
+                            valores_novos = pd.to_numeric(df_novos['Consumo (m³)'], errors="raise").to_numpy(dtype=float)
+                            with cronometro.etapa("atualizacao_incremental"):
+                                resumo = st.session_state.resumo_consumo or ResumoConsumo.da_serie(
+                                    serie.valores, serie.rotulos)
+                                resumo.adicionar(valores_novos, df_novos['Mês'])
+                            st.session_state.resumo_consumo = resumo
+                            serie = serie.acrescentar(df_novos)
+                            st.session_state.serie_consumo = serie
+                            st.success(f"{len(df_novos)} meses acrescentados ({resumo.n} no total).")
+                        except ValueError as e:
+                            st.error(str(e))
+                        except Exception as e:
+                            st.error(f"Erro ao ler o CSV: {e}")
+                    if st.session_state.resumo_consumo is not None:
+                        st.caption("Consumo referencial, média e desvio padrão calculados a partir do resumo incremental.")
+                        st.download_button("Baixar resumo incremental (JSON)", st.session_state.resumo_consumo.para_json(),
+                                           file_name="resumo_consumo.json", mime="application/json")
+            st.dataframe(serie.tabela())
+
+            st.header("2. Parâmetros do Projeto")
+            modelo = st.selectbox("Modelo Estatístico", ["KDE", "Distribuição Normal"], key="modelo")
+            percentil = st.slider("Percentil de Projeto (%)", 50, 99, key="percentil")
+            dias_mes = st.number_input("Número de dias do mês", min_value=1, max_value=31, key="dias_mes")
+
+            # Novo campo: Número de horas diárias de operação (1 <= t <= 24)
+            horas_operacao = st.number_input("Número de horas diárias de operação", min_value=1, max_value=24, step=1,
+                                             key="horas_operacao")
+
+            tempo_dia = TEMPO_DIA  # Valor fixo (segundos em um dia)
+            estimativa_k = None
+            percentil_k = None
+            k_salvo = st.session_state.k_salvo
+            if st.session_state.df_horario is not None and st.checkbox("Estimar K1 e K2 a partir das leituras do sensor"):
+                percentil_k = st.slider("Percentil das razões diárias (100 = máximo observado)", 50, 100,
+                                        key="percentil_k")
+                try:
+                    with cronometro.etapa("k1_k2_empirico"):
+                        estimativa_k = k_empirico_em_cache(percentil_k, st.session_state.df_horario)
+                except ValueError as e:
+                    st.warning(str(e))
+            if estimativa_k is not None:
+                origem_k = "sensor"
+                k1 = estimativa_k["k1"]
+                k2 = estimativa_k["k2"]
+                st.write(f"K1 estimado = **{format_num(k1, 2)}**; K2 estimado = **{format_num(k2, 2)}** "
+                         f"({estimativa_k['dias']} dias completos)")
+                st.dataframe(estimativa_k["distribuicao"].style.format("{:.3f}"))
+            elif k_salvo is not None:
+                # Estimativa da execução aberta: mantida como foi salva
+                origem_k = "sensor"
+                k1, k2, percentil_k = k_salvo["k1"], k_salvo["k2"], k_salvo["percentil_k"]
+                origem = (f"percentil {percentil_k} das razões diárias" if percentil_k is not None
+                          else "percentil não registrado")
+                st.write(f"K1 estimado (salvo) = **{format_num(k1, 3)}**; K2 estimado (salvo) = "
+                         f"**{format_num(k2, 3)}** — leituras do sensor, {origem}")
+                if min(k1, k2) < 1.0:
+                    st.warning("K1 ou K2 abaixo de 1,0: o valor não pode ser informado manualmente "
+                               "(mínimo 1,0) e só é mantido como estimativa.")
+                st.button("Informar K1 e K2 manualmente", on_click=lambda: st.session_state.update(k_salvo=None))
+            else:
+                origem_k = "manual"
+                k1 = st.number_input("Coeficiente de máx. diária (K1)", min_value=1.0, key="k1")
+                k2 = st.number_input("Coeficiente de máx. horária (K2)", min_value=1.0, key="k2")
+
+            if df_setores is not None:
+                st.header("Comparação entre Setores")
+                with cronometro.etapa("setores"):
+                    tabela_setores = setores_em_cache(st.session_state.chave_setores, modelo, percentil, dias_mes,
+                                                      horas_operacao, k1, k2, df_setores)
+                st.caption(f"{len(tabela_setores)} setores calculados de uma só vez; a análise abaixo detalha "
+                           f"o setor **{setor}**.")
+                st.dataframe(tabela_setores.style.format(
+                    {coluna: "{:,.2f}" for coluna in tabela_setores.columns if coluna != "n_meses"}
+                    | {"participacao_q_max_real": "{:.1%}"}
+                ))
+                st.download_button(
+                    label="Baixar Comparação entre Setores (CSV)",
+                    data=tabela_setores.reset_index().to_csv(index=False).encode('utf-8'),
+                    file_name="Comparacao_Setores.csv",
+                    mime="text/csv"
+                )
+
+            consumo = serie.valores
+            chave_dados = hash_dados(consumo)
+
+            # Projeto reaberto: resultados salvos para os mesmos dados e os mesmos parâmetros da etapa
+            execucao = st.session_state.execucao_aberta
+            if execucao is not None and execucao.chave_dados != chave_dados:
+                execucao = None
+
+            def do_projeto(nome, **parametros):
+                return execucao.resultado(nome, **parametros) if execucao is not None else None
+
+            # Cada etapa é buscada no cache pelo hash dos dados + seus próprios parâmetros; no modo
+            # incremental, o consumo referencial e os momentos vêm do resumo do projeto
+            resumo = st.session_state.resumo_consumo
+            with cronometro.etapa("ajuste_modelo"):
+                consumo_ref = do_projeto("consumo_ref", modelo=modelo, percentil=percentil)
+                if consumo_ref is None and resumo is not None:
+                    consumo_ref = resumo.consumo_referencial(modelo, percentil)
+                elif consumo_ref is None:
+                    consumo_ref = consumo_ref_em_cache(chave_dados, modelo, percentil, consumo)
+            vazoes = calcular_vazoes(consumo_ref, dias_mes, horas_operacao, k1, k2, tempo_dia)
+            q_med = vazoes["q_med"]
+            q_max_dia = vazoes["q_max_dia"]
+            q_max_hora = vazoes["q_max_hora"]
+            q_max_real = vazoes["q_max_real"]
+
+            with cronometro.etapa("estatisticas"):
+                basicas = do_projeto("estatisticas") or (
+                    resumo.estatisticas_basicas() if resumo is not None else estatisticas_em_cache(chave_dados, consumo))
+            desvio_padrao = basicas["desvio_padrao"]
+            media = basicas["media"]
+
+            st.header("3. Resultados")
+            # Exibição em 3 colunas e 2 linhas
+            col1, col2, col3 = st.columns(3)
+            # Primeira linha
+            col1.metric("Consumo Referencial (m³)", format_num(consumo_ref, 0))
+            col2.metric("Desvio Padrão (m³)", format_num(desvio_padrao, 2))
+            col3.metric("Vazão Média (L/s)", format_num(q_med, 2))
+            # Segunda linha
+            col1.metric("Vazão Máx. Diária (L/s)", format_num(q_max_dia, 2))
+            col2.metric("Vazão Máx. Horária (L/s)", format_num(q_max_hora, 2))
+            col3.metric("Vazão Máx. Dia+Hora (L/s)", format_num(q_max_real, 2))
+
+            if st.checkbox("Intervalos de confiança (bootstrap)"):
+                col_b1, col_b2, col_b3 = st.columns(3)
+                n_replicas = col_b1.selectbox("Réplicas", [1000, 5000, 10000, 20000], index=2)
+                nivel = col_b2.selectbox("Nível de confiança", [0.90, 0.95, 0.99], index=1,
+                                         format_func=lambda v: f"{int(v * 100)}%")
+                semente = col_b3.number_input("Semente", min_value=0, value=42, step=1)
+                with cronometro.etapa("bootstrap"):
+                    replicas = bootstrap_em_cache(chave_dados, modelo, percentil, n_replicas, int(semente), consumo)
+                from calculo import intervalos_bootstrap
+                ic = intervalos_bootstrap(replicas, dias_mes, horas_operacao, k1, k2, nivel, tempo_dia)
+                nomes = {
+                    "consumo_ref": "Consumo Referencial (m³)",
+                    "q_med": "Vazão Média (L/s)",
+                    "q_max_dia": "Vazão Máx. Diária (L/s)",
+                    "q_max_hora": "Vazão Máx. Horária (L/s)",
+                    "q_max_real": "Vazão Máx. Dia+Hora (L/s)",
+                }
+                tabela_ic = pd.DataFrame({
+                    "Grandeza": ic["grandeza"].map(nomes),
+                    "Limite inferior": [format_num(v, 2) for v in ic["inferior"]],
+                    "Limite superior": [format_num(v, 2) for v in ic["superior"]],
+                    "Erro padrão": [format_num(v, 2) for v in ic["erro_padrao"]],
+                })
+                st.caption(f"Intervalos percentis de {int(nivel * 100)}% com {n_replicas} réplicas bootstrap")
+                st.table(tabela_ic)
+
+            st.header("4. Testes de Normalidade")
+            with cronometro.etapa("testes_normalidade"):
+                testes = do_projeto("testes") or testes_em_cache(chave_dados, consumo)
+
+            txt_sw, txt_dp, txt_ks = textos_testes(testes)
+
+            st.write(f"**{txt_sw}**")
+            st.write(f"**{txt_dp}**")
+            st.write(f"**{txt_ks}**")
+
+            testes_corrigidos = None
+            textos_corrigidos = []
+            if st.checkbox("P-valores corrigidos (Lilliefors e Anderson-Darling por Monte Carlo)"):
+                with cronometro.etapa("testes_corrigidos"):
+                    testes_corrigidos = (do_projeto("testes_corrigidos")
+                                         or testes_corrigidos_em_cache(chave_dados, consumo))
+                    textos_corrigidos = textos_testes(testes_corrigidos)
+                for texto in textos_corrigidos:
+                    st.write(f"**{texto}**")
+                st.caption("O KS acima usa a média e o desvio estimados dos próprios dados, o que torna o p-valor "
+                           "otimista. Os p-valores corrigidos comparam as estatísticas com amostras normais "
+                           "simuladas para o mesmo número de meses (tabelas guardadas por n). A estatística D "
+                           "dos dois KS difere porque usam estimadores distintos do desvio padrão: o KS acima "
+                           "divide por n (desvio populacional) e o corrigido, como no teste de Lilliefors, "
+                           "divide por n − 1 (desvio amostral).")
+
+            # Novo campo para escolha da apresentação do histograma
+            tipo_hist = st.selectbox("Tipo de apresentação do histograma:",
+                                     ["Frequência Absoluta", "Densidade de Probabilidade"], key="tipo_hist")
+            if tipo_hist == "Densidade de Probabilidade":
+                stat_param = "density"
+            else:
+                stat_param = "count"
+
+            # Gráficos interativos: só as séries compactas vão ao navegador; as imagens do
+            # Matplotlib são geradas apenas neste modo ou ao exportar o relatório
+            graficos_imagem = st.toggle("Exibir os gráficos como imagens (Matplotlib)", value=False)
+
+            st.header("5. Gráfico de Distribuição")
+            rotulo_ref = f'{percentil}% ≈ {format_num(consumo_ref, 0)} m³'
+            with cronometro.etapa("figura_distribuicao"):
+                if graficos_imagem:
+                    st.image(fig_distribuicao_em_cache(chave_dados, stat_param, consumo_ref, rotulo_ref, consumo))
                 else:
-                    st.error("O arquivo precisa ter pelo menos duas colunas.")
-            except Exception as e:
-                st.error(f"Erro ao ler o CSV: {e}")
-
-    # Se o CSV está carregado, prossegue com o cálculo
-    if st.session_state.df_consumo is not None:
-        df = st.session_state.df_consumo
-        st.dataframe(df)
-
-        st.header("2. Parâmetros do Projeto")
-        modelo = st.selectbox("Modelo Estatístico", ["KDE", "Distribuição Normal"])
-        percentil = st.slider("Percentil de Projeto (%)", 50, 99, 95)
-        dias_mes = st.number_input("Número de dias do mês", min_value=1, max_value=31, value=30)
-
-        # Novo campo: Número de horas diárias de operação (1 <= t <= 24)
-        horas_operacao = st.number_input("Número de horas diárias de operação", min_value=1, max_value=24, value=24, step=1)
-
-        tempo_dia = 86400  # Valor fixo (segundos em um dia)
-        k1 = st.number_input("Coeficiente de máx. diária (K1)", min_value=1.0, value=1.4)
-        k2 = st.number_input("Coeficiente de máx. horária (K2)", min_value=1.0, value=2.0)
-
-        consumo = df['Consumo (m³)'].values
-
-        # Cálculo do consumo referencial
-        if modelo == "KDE":
-            fig_temp, ax_temp = plt.subplots()
-            kde = sns.kdeplot(consumo, bw_adjust=1, ax=ax_temp)
-            kde_y = kde.get_lines()[0].get_ydata()
-            kde_x = kde.get_lines()[0].get_xdata()
-            plt.close(fig_temp)
-            cdf_kde = np.cumsum(kde_y)
-            cdf_kde = cdf_kde / cdf_kde[-1]
-            consumo_ref = kde_x[np.searchsorted(cdf_kde, percentil / 100)]
-        else:
-            consumo_ref = np.percentile(consumo, percentil)
-
-        # Fator de ajuste (r = 24 / t)
-        r = 24 / horas_operacao
-
-        # Cálculo das vazões (com fator de ajuste)
-        q_med_base = (consumo_ref / dias_mes) / tempo_dia * 1000
-        q_med = q_med_base * r
-        q_max_dia = q_med * k1
-        q_max_hora = q_med * k2
-        q_max_real = q_med * k1 * k2
-
-        desvio_padrao = np.std(consumo)
-        media = np.mean(consumo)
-
-        st.header("3. Resultados")
-        # Exibição em 3 colunas e 2 linhas
-        col1, col2, col3 = st.columns(3)
-        # Primeira linha
-        col1.metric("Consumo Referencial (m³)", format_num(consumo_ref, 0))
-        col2.metric("Desvio Padrão (m³)", format_num(desvio_padrao, 2))
-        col3.metric("Vazão Média (L/s)", format_num(q_med, 2))
-        # Segunda linha
-        col1.metric("Vazão Máx. Diária (L/s)", format_num(q_max_dia, 2))
-        col2.metric("Vazão Máx. Horária (L/s)", format_num(q_max_hora, 2))
-        col3.metric("Vazão Máx. Dia+Hora (L/s)", format_num(q_max_real, 2))
-
-        st.header("4. Testes de Normalidade")
-        stat_sw, p_sw = shapiro(consumo)
-        stat_dp, p_dp = normaltest(consumo)
-        stat_ks, p_ks = kstest(consumo, 'norm', args=(media, desvio_padrao))
-
-        def interpreta(p):
-            return "✔️ Aceita a hipótese de normalidade." if p > 0.05 else "❌ Rejeita a hipótese de normalidade."
-
-        txt_sw = f"Shapiro-Wilk: Estatística = {format_num(stat_sw, 3)}; p-valor = {format_num(p_sw, 3)} — {interpreta(p_sw)}"
-        txt_dp = f"D'Agostino e Pearson: Estatística = {format_num(stat_dp, 3)}; p-valor = {format_num(p_dp, 3)} — {interpreta(p_dp)}"
-        txt_ks = f"Kolmogorov-Smirnov (KS): Estatística = {format_num(stat_ks, 3)}; p-valor = {format_num(p_ks, 3)} — {interpreta(p_ks)}"
-
-        st.write(f"**{txt_sw}**")
-        st.write(f"**{txt_dp}**")
-        st.write(f"**{txt_ks}**")
-
-        # Novo campo para escolha da apresentação do histograma
-        tipo_hist = st.selectbox("Tipo de apresentação do histograma:", ["Frequência Absoluta", "Densidade de Probabilidade"])
-        if tipo_hist == "Densidade de Probabilidade":
-            stat_param = "density"
-        else:
-            stat_param = "count"
-
-        st.header("5. Gráfico de Distribuição")
-        fig1, ax1 = plt.subplots(figsize=(10, 5))
-        sns.histplot(consumo, kde=True, stat=stat_param, color="skyblue", edgecolor="black", bins=12, ax=ax1)
-        x_vals = np.linspace(min(consumo), max(consumo), 1000)
-        # Se o histograma for em frequência absoluta, escalamos a curva normal
-        if stat_param == "count":
-            bin_width = (max(consumo) - min(consumo)) / 12
-            n = len(consumo)
-            normal_curve = norm.pdf(x_vals, loc=media, scale=desvio_padrao) * n * bin_width
-        else:
-            normal_curve = norm.pdf(x_vals, loc=media, scale=desvio_padrao)
-        ax1.plot(x_vals, normal_curve, color='red', linestyle='--', label='Distribuição Normal')
-        ax1.axvline(consumo_ref, color='black', linestyle=':', label=f'{percentil}% ≈ {format_num(consumo_ref, 0)} m³')
-        ax1.set_xlabel("Consumo mensal (m³)")
-        ax1.set_ylabel("Frequência" if stat_param=="count" else "Densidade estimada")
-        ax1.set_title("Distribuição do Consumo com KDE e Normal")
-        ax1.legend()
-        st.pyplot(fig1)
-
-        st.header("6. Funções de Distribuição Acumulada")
-        fig_temp2, ax_temp2 = plt.subplots()
-        kde_plot = sns.kdeplot(consumo, bw_adjust=1, ax=ax_temp2)
-        kde_y2 = kde_plot.get_lines()[0].get_ydata()
-        kde_x2 = kde_plot.get_lines()[0].get_xdata()
-        plt.close(fig_temp2)
-        cdf_kde2 = np.cumsum(kde_y2)
-        cdf_kde2 = cdf_kde2 / cdf_kde2[-1]
-        cdf_norm = norm.cdf(kde_x2, loc=media, scale=desvio_padrao)
-
-        fig2, ax2 = plt.subplots(figsize=(8, 5))
-        ax2.plot(kde_x2, cdf_kde2, label='CDF da KDE', color='blue')
-        ax2.plot(kde_x2, cdf_norm, label='CDF da Normal', color='red', linestyle='--')
-        ax2.set_title("Funções de Distribuição Acumulada (CDF) KDE vs Distribuição Normal")
-        ax2.set_xlabel("Consumo mensal de água (m³)")
-        ax2.set_ylabel("Probabilidade acumulada")
-        ax2.legend()
-        ax2.grid(True)
-        st.pyplot(fig2)
-
-        st.header("Relatório em Word")
-        if st.button("Gerar Relatório Word"):
-            doc = Document()
-            # Ajuste das margens: superior e inferior = 2 cm; esquerda e direita = 2,5 cm
-            for section in doc.sections:
-                section.top_margin = Cm(2)
-                section.bottom_margin = Cm(2)
-                section.left_margin = Cm(2.5)
-                section.right_margin = Cm(2.5)
-            
-            doc.add_heading("Relatório de Consumo Referencial", 0)
-            doc.add_heading("Dados do Projeto", level=1)
-            doc.add_paragraph(f"Nome do Projeto: {nome_projeto}")
-            doc.add_paragraph(f"Técnico Operador: {tecnico_operador}")
-            doc.add_paragraph(f"Tipo de Medição: {tipo_medicao}")
-            doc.add_heading("Parâmetros de Entrada", level=1)
-            doc.add_paragraph(f"Modelo Estatístico: {modelo}")
-            doc.add_paragraph(f"Percentil de Projeto: {percentil}%")
-            doc.add_paragraph(f"Número de dias do mês: {dias_mes}")
-            doc.add_paragraph(f"Número de horas diárias de operação: {horas_operacao}")
-            doc.add_paragraph(f"Tempo diário (s): {tempo_dia}")
-            doc.add_paragraph(f"K1 (máx. diária): {format_num(k1, 2)}")
-            doc.add_paragraph(f"K2 (máx. horária): {format_num(k2, 2)}")
-            doc.add_heading("Resultados", level=1)
-            doc.add_paragraph(f"Consumo Referencial (m³): {format_num(consumo_ref, 0)}")
-            doc.add_paragraph(f"Desvio Padrão (m³): {format_num(desvio_padrao, 2)}")
-            doc.add_paragraph(f"Vazão Média (L/s): {format_num(q_med, 2)}")
-            doc.add_paragraph(f"Vazão Máx. Diária (L/s): {format_num(q_max_dia, 2)}")
-            doc.add_paragraph(f"Vazão Máx. Horária (L/s): {format_num(q_max_hora, 2)}")
-            doc.add_paragraph(f"Vazão Máx. Dia+Hora (L/s): {format_num(q_max_real, 2)}")
-            doc.add_heading("Testes de Normalidade", level=1)
-            doc.add_paragraph(txt_sw)
-            doc.add_paragraph(txt_dp)
-            doc.add_paragraph(txt_ks)
-            img_buffer1 = BytesIO()
-            fig1.savefig(img_buffer1, format="png", dpi=150)
-            img_buffer1.seek(0)
-            doc.add_heading("Gráfico de Distribuição", level=1)
-            doc.add_picture(img_buffer1, width=Inches(6))
-            img_buffer2 = BytesIO()
-            fig2.savefig(img_buffer2, format="png", dpi=150)
-            img_buffer2.seek(0)
-            doc.add_heading("Funções de Distribuição Acumulada", level=1)
-            doc.add_picture(img_buffer2, width=Inches(6))
-            doc_buffer = BytesIO()
-            doc.save(doc_buffer)
-            doc_buffer.seek(0)
+                    from graficos_interativos import especificacao_distribuicao, especificacao_cdf
+                    series_dist = (do_projeto("distribuicao", tipo_hist=tipo_hist)
+                                   or series_distribuicao_em_cache(chave_dados, stat_param, consumo))
+                    st.vega_lite_chart(spec=especificacao_distribuicao(series_dist, consumo_ref, rotulo_ref, stat_param))
+
+            st.header("6. Funções de Distribuição Acumulada")
+            with cronometro.etapa("figura_cdf"):
+                if graficos_imagem:
+                    st.image(fig_cdf_em_cache(chave_dados, consumo))
+                else:
+                    series_acum = do_projeto("cdf") or series_cdf_em_cache(chave_dados, consumo)
+                    st.vega_lite_chart(spec=especificacao_cdf(series_acum))
+
+            st.header("7. Análise de Sensibilidade")
+            if st.checkbox("Calcular a superfície completa (percentil × horas × K1/K2)"):
+                faixa_p = st.slider("Faixa de percentis (%)", 50, 99, (50, 99))
+                faixa_h = st.slider("Faixa de horas diárias de operação", 1, 24, (1, 24))
+                col_k1, col_k2 = st.columns(2)
+                k1_min, k1_max = col_k1.slider("Faixa de K1", 1.0, 3.0, (1.0, 2.0), step=0.1)
+                k2_min, k2_max = col_k2.slider("Faixa de K2", 1.0, 4.0, (1.0, 3.0), step=0.1)
+                k1s = np.round(np.arange(k1_min, k1_max + 0.05, 0.1), 2)
+                k2s = np.round(np.arange(k2_min, k2_max + 0.05, 0.1), 2)
+                with cronometro.etapa("sensibilidade"):
+                    grade = grade_em_cache(chave_dados, modelo, faixa_p, faixa_h, tuple(k1s), tuple(k2s),
+                                           dias_mes, consumo)
+
+                vazao_sel = st.selectbox("Vazão exibida", ["q_max_real", "q_max_dia", "q_max_hora", "q_med"])
+                col_k1, col_k2 = st.columns(2)
+                k1_sel = col_k1.select_slider("K1 do mapa", options=list(k1s), value=k1s[np.abs(k1s - k1).argmin()])
+                k2_sel = col_k2.select_slider("K2 do mapa", options=list(k2s), value=k2s[np.abs(k2s - k2).argmin()])
+                i_k1 = list(k1s).index(k1_sel)
+                i_k2 = list(k2s).index(k2_sel)
+                mapa = pd.DataFrame(
+                    grade[vazao_sel][:, :, i_k1, i_k2],
+                    index=pd.Index(grade["percentil"].astype(int), name="Percentil (%)"),
+                    columns=pd.Index(grade["horas_operacao"].astype(int), name="Horas de operação"),
+                )
+                st.caption(f"{vazao_sel} (L/s) para K1 = {format_num(k1_sel, 1)} e K2 = {format_num(k2_sel, 1)}")
+                st.dataframe(mapa.style.background_gradient(cmap="viridis", axis=None).format("{:.1f}"))
+
+                from calculo import grade_para_tabela
+                csv_grade = grade_para_tabela(grade).to_csv(index=False).encode('utf-8')
+                st.download_button(
+                    label="Baixar Grade de Sensibilidade (CSV)",
+                    data=csv_grade,
+                    file_name="Sensibilidade_Consumo.csv",
+                    mime="text/csv"
+                )
+
+            st.header("Histórico do Projeto")
+            if repositorio is None:
+                st.caption("Repositório de projetos indisponível (sem permissão de escrita para o banco SQLite).")
+            else:
+                if st.button("💾 Salvar projeto"):
+                    with cronometro.etapa("salvar_projeto"):
+                        parametros_projeto = {
+                            "tecnico_operador": tecnico_operador,
+                            "tipo_medicao": tipo_medicao,
+                            "modelo": modelo,
+                            "percentil": percentil,
+                            "dias_mes": dias_mes,
+                            "horas_operacao": horas_operacao,
+                            "k1": k1,
+                            "k2": k2,
+                            "origem_k": origem_k,
+                            "tipo_hist": tipo_hist,
+                        }
+                        if origem_k == "sensor":
+                            parametros_projeto["percentil_k"] = percentil_k
+                        resultados = {"consumo_ref": consumo_ref, "estatisticas": basicas, "vazoes": vazoes,
+                                      "testes": testes}
+                        if testes_corrigidos is not None:
+                            resultados["testes_corrigidos"] = testes_corrigidos
+                        # Séries compactas dos gráficos: reabrir o projeto dispensa a KDE
+                        graficos = {"distribuicao": series_distribuicao_em_cache(chave_dados, stat_param, consumo),
+                                    "cdf": series_cdf_em_cache(chave_dados, consumo)}
+                        id_execucao = repositorio.salvar(nome_projeto, serie, parametros_projeto, resultados, graficos)
+                        st.session_state.execucao_aberta = repositorio.abrir(id_execucao)
+                    st.success(f"Projeto \"{nome_projeto}\" salvo ({len(serie)} meses).")
+
+                with cronometro.etapa("historico_projeto"):
+                    historico_projeto = repositorio.historico(nome_projeto)
+                if historico_projeto.empty:
+                    st.caption("Nenhuma execução salva para este projeto. Salve-o para acompanhar os resultados "
+                               "ao longo do tempo.")
+                else:
+                    nomes_grandezas = {
+                        "consumo_ref": "Consumo Referencial (m³)",
+                        "q_med": "Vazão Média (L/s)",
+                        "q_max_dia": "Vazão Máx. Diária (L/s)",
+                        "q_max_hora": "Vazão Máx. Horária (L/s)",
+                        "q_max_real": "Vazão Máx. Dia+Hora (L/s)",
+                    }
+                    historico_projeto["Data"] = historico_projeto["criada"].map(formatar_data)
+                    colunas_hist = ["Data", "n_meses", "modelo", "percentil", "horas_operacao", "k1", "k2",
+                                    *nomes_grandezas]
+                    st.dataframe(historico_projeto[colunas_hist].rename(columns=nomes_grandezas).style.format(
+                        {nome: "{:,.2f}" for nome in nomes_grandezas.values()} | {"k1": "{:.2f}", "k2": "{:.2f}"}
+                    ), hide_index=True)
+                    if len(historico_projeto) > 1:
+                        grandeza = st.selectbox("Evolução de", list(nomes_grandezas), format_func=nomes_grandezas.get)
+                        st.line_chart(historico_projeto.set_index("criada")[grandeza].rename(nomes_grandezas[grandeza]))
+
+                    # Comparação dos resultados atuais com uma execução salva
+                    id_comparado = st.selectbox("Comparar os resultados atuais com a execução de",
+                                                historico_projeto["id"].iloc[::-1].tolist(),
+                                                format_func=dict(zip(historico_projeto["id"],
+                                                                     historico_projeto["Data"])).get)
+                    comparada = historico_projeto.set_index("id").loc[id_comparado]
+                    atuais = {"consumo_ref": consumo_ref, **vazoes}
+                    colunas_comp = st.columns(3)
+                    for i, (nome, valor) in enumerate(atuais.items()):
+                        casas = 0 if nome == "consumo_ref" else 2
+                        colunas_comp[i % 3].metric(nomes_grandezas[nome], format_num(valor, casas),
+                                                   delta=format_num(valor - comparada[nome], casas),
+                                                   delta_color="off")
+
+            st.header("Relatório em Word")
+            dados_relatorio = {
+                "nome_projeto": nome_projeto,
+                "tecnico_operador": tecnico_operador,
+                "tipo_medicao": tipo_medicao,
+                "modelo": modelo,
+                "percentil": percentil,
+                "dias_mes": dias_mes,
+                "horas_operacao": horas_operacao,
+                "tempo_dia": tempo_dia,
+                "k1": k1,
+                "k2": k2,
+                "consumo_ref": consumo_ref,
+                "desvio_padrao": desvio_padrao,
+                "q_med": q_med,
+                "q_max_dia": q_max_dia,
+                "q_max_hora": q_max_hora,
+                "q_max_real": q_max_real,
+                "textos_testes": [txt_sw, txt_dp, txt_ks] + textos_corrigidos,
+            }
+            from relatorio import chave_relatorio
+            # As figuras do relatório são determinadas pelos dados e pela apresentação do
+            # histograma, de modo que a chave dispensa renderizá-las antes do pedido
+            chave_rel = chave_relatorio({**dados_relatorio, "chave_dados": chave_dados, "stat_param": stat_param})
+            fila = fila_relatorios()
+            # A geração (inclusive a KDE e as figuras) roda no pool de processos; o handle
+            # fica no session_state e o artefato pronto sobrevive a novas interações
+            if st.button("Gerar Relatório Word"):
+                from relatorio import relatorio_com_figuras
+                with cronometro.etapa("relatorio_submissao"):
+                    fila.submeter(chave_rel, dados_relatorio, consumo, media, rotulo_ref, stat_param,
+                                  funcao=relatorio_com_figuras)
+                st.session_state.relatorio_chave = chave_rel
+            if fila.obter(chave_rel) is not None:
+                st.session_state.relatorio_chave = chave_rel
+            if st.session_state.get("relatorio_chave"):
+                painel_relatorio(st.session_state.relatorio_chave, chave_rel)
+
+    # 5) Aba "Gerar Histograma"
+    elif aba == "📊 Gerar Histograma":
+        from gerador import gerar_consumo_mensal, tabela_mensal
+
+        st.title("Gerar Tabela de Consumo Mensal")
+        st.markdown("Informe os dados do projeto para gerar uma planilha de consumo mensal de água tratada.")
+        ano_inicial = st.number_input("Ano Inicial", min_value=2000, max_value=2100, value=2020, step=1)
+        ano_final = st.number_input("Ano Final", min_value=2000, max_value=2100, value=2025, step=1)
+        populacao = st.number_input("População atendida", min_value=1000, value=80000, step=1000)
+        with st.expander("Opções avançadas"):
+            sazonalidade = st.slider("Amplitude sazonal (%)", 0, 50, 0) / 100
+            mes_pico = st.selectbox("Mês de pico", list(range(1, 13)),
+                                    format_func=lambda m: ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun",
+                                                           "Jul", "Ago", "Set", "Out", "Nov", "Dez"][m - 1])
+            tendencia = st.number_input("Tendência anual (%)", min_value=-20.0, max_value=20.0, value=0.0, step=0.5) / 100
+            autocorrelacao = st.slider("Autocorrelação mês a mês (AR(1))", 0.0, 0.95, 0.0, step=0.05)
+            caudas = st.checkbox("Caudas pesadas (t de Student)")
+            graus_liberdade = st.number_input("Graus de liberdade", min_value=2.5, value=4.0, step=0.5) if caudas else None
+            semente = st.number_input("Semente (0 = aleatória)", min_value=0, value=0, step=1)
+        if st.button("Criar Planilha"):
+            if ano_final < ano_inicial:
+                st.error("O Ano Final deve ser maior ou igual ao Ano Inicial.")
+            else:
+                consumo_gerado = gerar_consumo_mensal(
+                    ano_inicial, ano_final, populacao, sazonalidade=sazonalidade, mes_pico=mes_pico,
+                    tendencia=tendencia, autocorrelacao=autocorrelacao, graus_liberdade=graus_liberdade,
+                    semente=int(semente) or None
+                )
+                df_gerado = tabela_mensal(consumo_gerado[0], ano_inicial, ano_final)
+                st.dataframe(df_gerado)
+                csv_gerado = df_gerado.to_csv(index=False).encode('utf-8')
+                st.download_button(
+                    label="Baixar Planilha CSV",
+                    data=csv_gerado,
+                    file_name="Consumo_Mensal_Agua_Tratada.csv",
+                    mime="text/csv"
+                )
+
+    # 6) Aba "ℹ️ Sobre esse App"
+    elif aba == "ℹ️ Sobre esse App":
+        st.title("Sobre esse App")
+        # HTML com estilo unificado (fonte Arial, tamanho 16, espaçamento 1.5)
+        # Adicionado li { margin-bottom: 2em; } para espaçamento duplo entre itens numerados
+        html_content = """
+        <!DOCTYPE html>
+        <html lang="pt-BR">
+        <head>
+          <meta charset="UTF-8" />
+          <title>Sobre esse App</title>
+          <style>
+            body, h1, h2, h3, p, ol, ul, li {
+              font-family: "Arial", sans-serif;
+              font-size: 16px;
+              line-height: 1.5;
+            }
+            li {
+              margin-bottom: 2em; /* Espaçamento duplo entre itens numerados */
+            }
+            .page { 
+              display: none; 
+              margin: 20px; 
+            }
+            .page.active { 
+              display: block; 
+            }
+            .nav-buttons { 
+              margin-top: 20px; 
+            }
+            button { 
+              margin: 5px; 
+              padding: 8px 16px; 
+              cursor: pointer; 
+            }
+            code {
+              background-color: #f5f5f5; 
+              padding: 2px 4px; 
+              font-size: 90%; 
+              border-radius: 4px; 
+              font-family: Consolas, monospace;
+            }
+          </style>
+          <!-- MathJax para renderizar LaTeX -->
+          <script>
+            window.MathJax = {
+              tex: { inlineMath: [['$', '$'], ['\\(', '\\)']] }
+            };
+          </script>
+          <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml.js"></script>
+        </head>
+        <body>
+          <!-- Página 1 -->
+          <div class="page active" id="page1">
+            <h1>Sobre este Aplicativo</h1>
+            <p>
+              Este aplicativo foi desenvolvido em <code>Python</code> utilizando a biblioteca <code>Streamlit</code> 
+              para análise estatística de consumo de água. Ele permite o carregamento de arquivos CSV com dados de consumo, 
+              realiza cálculos estatísticos, gera gráficos e produz relatórios. Além do consumo mensal referencial, 
+              o aplicativo também calcula as vazões médias em função dos dias de operação do sistema, possibilitando 
+              avaliar a variação dessas vazões como uma estimativa preliminar para análise do projetista.
+            </p>
+            <p>
+              Para maior flexibilidade, foi incluído um fator de ajuste baseado no número de horas diárias de operação 
+              do sistema, permitindo ajustar as equações de vazão. Dessa forma, é possível simular diferentes cenários 
+              de operação entre 1 hora e 24 horas diárias.
+            </p>
+            <div class="nav-buttons">
+              <button onclick="showPage(2)">Próxima &raquo;</button>
+            </div>
+          </div>
+
+          <!-- Página 2 -->
+          <div class="page" id="page2">
+            <h2>Estrutura do Código</h2>
+            <ol>
+              <li>
+                <strong>Importações e Configurações:</strong> Importa bibliotecas como 
+                <code>pandas</code>, <code>numpy</code>, <code>matplotlib</code>, <code>scipy</code> 
+                e faz a chamada <code>st.set_page_config</code> logo no início, sendo a primeira instrução de Streamlit.
+              </li>
+              <li>
+                <strong>Session State:</strong> Utiliza <code>st.session_state</code> para manter dados entre interações (a série em arrays compactos) e um banco SQLite para salvar e reabrir projetos.
+              </li>
+              <li>
+                <strong>Menu de Navegação:</strong> Define as funcionalidades do app, como 
+                <em>Cálculo do Consumo</em>, <em>Gerar Histograma</em>, <em>Sobre esse App</em> e 
+                <em>Sobre o Modelo Estatístico</em>.
+              </li>
+              <li>
+                <strong>Cálculo do Consumo:</strong> Permite o upload do CSV, configura parâmetros, incluindo número 
+                de horas diárias de operação, executa cálculos estatísticos e gera gráficos.
+              </li>
+              <li>
+                <strong>Relatório em Word:</strong> Gera um documento com os resultados e gráficos utilizando 
+                a biblioteca <code>python-docx</code>.
+              </li>
+            </ol>
+            <div class="nav-buttons">
+              <button onclick="showPage(1)">&laquo; Anterior</button>
+              <button onclick="showPage(3)">Próxima &raquo;</button>
+            </div>
+          </div>
+
+          <!-- Página 3 -->
+          <div class="page" id="page3">
+            <h2>Cálculos e Equações</h2>
+            <p>
+              Um dos cálculos principais é a determinação do consumo referencial. Para o modelo de distribuição normal, usamos:
+              $$ f(x) = \\frac{1}{\\sigma\\sqrt{2\\pi}} \\exp\\Bigl(-\\frac{(x-\\mu)^2}{2\\sigma^2}\\Bigr). $$
+            </p>
+            <p>
+              Os testes de normalidade: Shapiro-Wilk, D'Agostino-Pearson e Kolmogorov-Smirnov, que verificam se os dados 
+              seguem uma distribuição normal, aceitando a hipótese quando 
+              $$ p\\text{-valor} > 0.05. $$
+            </p>
+            <p>
+              Além disso, o fator de ajuste <em>r</em> é dado por 
+              $$ r = \\frac{24}{t}, $$
+              onde <em>t</em> é o número de horas diárias de operação entre 1 e 24 horas. 
+              Esse fator multiplica as equações de vazão, permitindo avaliar cenários de operação em períodos reduzidos, como 
+              por exemplo, apenas 8 horas por dia ou período integral de 24 horas.
+            </p>
+            <div class="nav-buttons">
+              <button onclick="showPage(2)">&laquo; Anterior</button>
+              <button onclick="showPage(4)">Próxima &raquo;</button>
+            </div>
+          </div>
+
+          <!-- Página 4 -->
+          <div class="page" id="page4">
+            <h2>Equações de Vazão e Variáveis</h2>
+            <p>
+              Para calcular as vazões, definimos inicialmente:
+            </p>
+            <ul>
+              <li><strong>Consumo Referencial</strong>: valor estatístico que representa o consumo mensal alvo (m³).</li>
+              <li><strong>Dias de Operação</strong> (<em>dias_mes</em>): número de dias no mês considerado.</li>
+              <li><strong>Horas de Operação</strong> (<em>t</em>): quantas horas por dia o sistema fica operando.</li>
+              <li><strong>Fator de Ajuste</strong> (<em>r</em>): $$r = \\frac{24}{t}.$$</li>
+              <li><strong>k1</strong>: coeficiente de máxima diária.</li>
+              <li><strong>k2</strong>: coeficiente de máxima horária.</li>
+            </ul>
+            <p>
+              A vazão média básica (<em>q_med_base</em>) é calculada por:
+            </p>
+            <p>
+              $$ q_{\\text{med\\_base}} = \\frac{\\text{Consumo Referencial}}{\\text{dias\\_mes}} 
+              \\times \\frac{1}{\\text{tempo\\_dia}} \\times 1000. $$
+            </p>
+            <p>
+              Em seguida, aplicamos o fator <em>r</em> para obter a vazão média final:
+            </p>
+            <p>
+              $$ q_{\\text{med}} = q_{\\text{med\\_base}} \\times r. $$
+            </p>
+            <p>
+              As demais vazões são:
+            </p>
+            <ul>
+              <li><em>Vazão Máx. Diária</em>: $$ q_{\\text{max\\_dia}} = q_{\\text{med}} \\times k1. $$</li>
+              <li><em>Vazão Máx. Horária</em>: $$ q_{\\text{max\\_hora}} = q_{\\text{med}} \\times k2. $$</li>
+              <li><em>Vazão Máx. Dia+Hora</em>: $$ q_{\\text{max\\_real}} = q_{\\text{med}} \\times k1 \\times k2. $$</li>
+            </ul>
+            <div class="nav-buttons">
+              <button onclick="showPage(3)">&laquo; Anterior</button>
+            </div>
+          </div>
+
+          <script>
+            function showPage(pageNumber) {
+              document.getElementById("page1").classList.remove("active");
+              document.getElementById("page2").classList.remove("active");
+              document.getElementById("page3").classList.remove("active");
+              document.getElementById("page4").classList.remove("active");
+              document.getElementById("page" + pageNumber).classList.add("active");
+            }
+          </script>
+        </body>
+        </html>
+        """
+        st.components.v1.html(html_content, height=800, scrolling=True)
+
+    # 7) Aba "📘 Sobre o Modelo Estatístico"
+    elif aba == "📘 Sobre o Modelo Estatístico":
+        st.title("📘 Sobre o Modelo Estatístico")
+        pdf_file = "03_Estatistica_2025.pdf"
+        if os.path.exists(pdf_file):
+            with open(pdf_file, "rb") as f:
+                pdf_bytes = f.read()
             st.download_button(
-                label="Baixar Relatório Word",
-                data=doc_buffer.getvalue(),
-                file_name="Relatorio_Consumo.docx",
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                label="Baixar Relatório PDF",
+                data=pdf_bytes,
+                file_name="03_Estatistica_2025.pdf",
+                mime="application/pdf"
             )
-
-# 5) Aba "Gerar Histograma"
-elif aba == "📊 Gerar Histograma":
-    st.title("Gerar Tabela de Consumo Mensal")
-    st.markdown("Informe os dados do projeto para gerar uma planilha de consumo mensal de água tratada.")
-    ano_inicial = st.number_input("Ano Inicial", min_value=2000, max_value=2100, value=2020, step=1)
-    ano_final = st.number_input("Ano Final", min_value=2000, max_value=2100, value=2025, step=1)
-    populacao = st.number_input("População atendida", min_value=1000, value=80000, step=1000)
-    if st.button("Criar Planilha"):
-        if ano_final < ano_inicial:
-            st.error("O Ano Final deve ser maior ou igual ao Ano Inicial.")
         else:
-            anos = list(range(int(ano_inicial), int(ano_final) + 1))
-            meses = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun",
-                     "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
-            fator = populacao / 50000.0
-            media_baseline = 300000 * fator
-            std_baseline = 50000 * fator
-            registros = []
-            for ano in anos:
-                for mes in meses:
-                    consumo_val = int(np.random.normal(media_baseline, std_baseline))
-                    mes_ano = f"{mes}/{ano}"
-                    registros.append({"Mês": mes_ano, "Consumo (m³)": consumo_val})
-            df_gerado = pd.DataFrame(registros)
-            st.dataframe(df_gerado)
-            csv_gerado = df_gerado.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Baixar Planilha CSV",
-                data=csv_gerado,
-                file_name="Consumo_Mensal_Agua_Tratada.csv",
-                mime="text/csv"
-            )
-
-# 6) Aba "ℹ️ Sobre esse App"
-elif aba == "ℹ️ Sobre esse App":
-    st.title("Sobre esse App")
-    # HTML com estilo unificado (fonte Arial, tamanho 16, espaçamento 1.5)
-    # Adicionado li { margin-bottom: 2em; } para espaçamento duplo entre itens numerados
-    html_content = """
-    <!DOCTYPE html>
-    <html lang="pt-BR">
-    <head>
-      <meta charset="UTF-8" />
-      <title>Sobre esse App</title>
-      <style>
-        body, h1, h2, h3, p, ol, ul, li {
-          font-family: "Arial", sans-serif;
-          font-size: 16px;
-          line-height: 1.5;
-        }
-        li {
-          margin-bottom: 2em; /* Espaçamento duplo entre itens numerados */
-        }
-        .page { 
-          display: none; 
-          margin: 20px; 
-        }
-        .page.active { 
-          display: block; 
-        }
-        .nav-buttons { 
-          margin-top: 20px; 
-        }
-        button { 
-          margin: 5px; 
-          padding: 8px 16px; 
-          cursor: pointer; 
-        }
-        code {
-          background-color: #f5f5f5; 
-          padding: 2px 4px; 
-          font-size: 90%; 
-          border-radius: 4px; 
-          font-family: Consolas, monospace;
-        }
-      </style>
-      <!-- MathJax para renderizar LaTeX -->
-      <script>
-        window.MathJax = {
-          tex: { inlineMath: [['$', '$'], ['\\(', '\\)']] }
-        };
-      </script>
-      <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml.js"></script>
-    </head>
-    <body>
-      <!-- Página 1 -->
-      <div class="page active" id="page1">
-        <h1>Sobre este Aplicativo</h1>
-        <p>
-          Este aplicativo foi desenvolvido em <code>Python</code> utilizando a biblioteca <code>Streamlit</code> 
-          para análise estatística de consumo de água. Ele permite o carregamento de arquivos CSV com dados de consumo, 
-          realiza cálculos estatísticos, gera gráficos e produz relatórios. Além do consumo mensal referencial, 
-          o aplicativo também calcula as vazões médias em função dos dias de operação do sistema, possibilitando 
-          avaliar a variação dessas vazões como uma estimativa preliminar para análise do projetista.
-        </p>
-        <p>
-          Para maior flexibilidade, foi incluído um fator de ajuste baseado no número de horas diárias de operação 
-          do sistema, permitindo ajustar as equações de vazão. Dessa forma, é possível simular diferentes cenários 
-          de operação entre 1 hora e 24 horas diárias.
-        </p>
-        <div class="nav-buttons">
-          <button onclick="showPage(2)">Próxima &raquo;</button>
-        </div>
-      </div>
-
-      <!-- Página 2 -->
-      <div class="page" id="page2">
-        <h2>Estrutura do Código</h2>
-        <ol>
-          <li>
-            <strong>Importações e Configurações:</strong> Importa bibliotecas como 
-            <code>pandas</code>, <code>numpy</code>, <code>matplotlib</code>, <code>seaborn</code> 
-            e faz a chamada <code>st.set_page_config</code> logo no início, sendo a primeira instrução de Streamlit.
-          </li>
-          <li>
-            <strong>Session State:</strong> Utiliza <code>st.session_state</code> para manter dados entre interações.
-          </li>
-          <li>
-            <strong>Menu de Navegação:</strong> Define as funcionalidades do app, como 
-            <em>Cálculo do Consumo</em>, <em>Gerar Histograma</em>, <em>Sobre esse App</em> e 
-            <em>Sobre o Modelo Estatístico</em>.
-          </li>
-          <li>
-            <strong>Cálculo do Consumo:</strong> Permite o upload do CSV, configura parâmetros, incluindo número 
-            de horas diárias de operação, executa cálculos estatísticos e gera gráficos.
-          </li>
-          <li>
-            <strong>Relatório em Word:</strong> Gera um documento com os resultados e gráficos utilizando 
-            a biblioteca <code>python-docx</code>.
-          </li>
-        </ol>
-        <div class="nav-buttons">
-          <button onclick="showPage(1)">&laquo; Anterior</button>
-          <button onclick="showPage(3)">Próxima &raquo;</button>
-        </div>
-      </div>
-
-      <!-- Página 3 -->
-      <div class="page" id="page3">
-        <h2>Cálculos e Equações</h2>
-        <p>
-          Um dos cálculos principais é a determinação do consumo referencial. Para o modelo de distribuição normal, usamos:
-          $$ f(x) = \\frac{1}{\\sigma\\sqrt{2\\pi}} \\exp\\Bigl(-\\frac{(x-\\mu)^2}{2\\sigma^2}\\Bigr). $$
-        </p>
-        <p>
-          Os testes de normalidade: Shapiro-Wilk, D'Agostino-Pearson e Kolmogorov-Smirnov, que verificam se os dados 
-          seguem uma distribuição normal, aceitando a hipótese quando 
-          $$ p\\text{-valor} > 0.05. $$
-        </p>
-        <p>
-          Além disso, o fator de ajuste <em>r</em> é dado por 
-          $$ r = \\frac{24}{t}, $$
-          onde <em>t</em> é o número de horas diárias de operação entre 1 e 24 horas. 
-          Esse fator multiplica as equações de vazão, permitindo avaliar cenários de operação em períodos reduzidos, como 
-          por exemplo, apenas 8 horas por dia ou período integral de 24 horas.
-        </p>
-        <div class="nav-buttons">
-          <button onclick="showPage(2)">&laquo; Anterior</button>
-          <button onclick="showPage(4)">Próxima &raquo;</button>
-        </div>
-      </div>
-
-      <!-- Página 4 -->
-      <div class="page" id="page4">
-        <h2>Equações de Vazão e Variáveis</h2>
-        <p>
-          Para calcular as vazões, definimos inicialmente:
-        </p>
-        <ul>
-          <li><strong>Consumo Referencial</strong>: valor estatístico que representa o consumo mensal alvo (m³).</li>
-          <li><strong>Dias de Operação</strong> (<em>dias_mes</em>): número de dias no mês considerado.</li>
-          <li><strong>Horas de Operação</strong> (<em>t</em>): quantas horas por dia o sistema fica operando.</li>
-          <li><strong>Fator de Ajuste</strong> (<em>r</em>): $$r = \\frac{24}{t}.$$</li>
-          <li><strong>k1</strong>: coeficiente de máxima diária.</li>
-          <li><strong>k2</strong>: coeficiente de máxima horária.</li>
-        </ul>
-        <p>
-          A vazão média básica (<em>q_med_base</em>) é calculada por:
-        </p>
-        <p>
-          $$ q_{\\text{med\\_base}} = \\frac{\\text{Consumo Referencial}}{\\text{dias\\_mes}} 
-          \\times \\frac{1}{\\text{tempo\\_dia}} \\times 1000. $$
-        </p>
-        <p>
-          Em seguida, aplicamos o fator <em>r</em> para obter a vazão média final:
-        </p>
-        <p>
-          $$ q_{\\text{med}} = q_{\\text{med\\_base}} \\times r. $$
-        </p>
-        <p>
-          As demais vazões são:
-        </p>
-        <ul>
-          <li><em>Vazão Máx. Diária</em>: $$ q_{\\text{max\\_dia}} = q_{\\text{med}} \\times k1. $$</li>
-          <li><em>Vazão Máx. Horária</em>: $$ q_{\\text{max\\_hora}} = q_{\\text{med}} \\times k2. $$</li>
-          <li><em>Vazão Máx. Dia+Hora</em>: $$ q_{\\text{max\\_real}} = q_{\\text{med}} \\times k1 \\times k2. $$</li>
-        </ul>
-        <div class="nav-buttons">
-          <button onclick="showPage(3)">&laquo; Anterior</button>
-        </div>
-      </div>
-
-      <script>
-        function showPage(pageNumber) {
-          document.getElementById("page1").classList.remove("active");
-          document.getElementById("page2").classList.remove("active");
-          document.getElementById("page3").classList.remove("active");
-          document.getElementById("page4").classList.remove("active");
-          document.getElementById("page" + pageNumber).classList.add("active");
-        }
-      </script>
-    </body>
-    </html>
-    """
-    st.components.v1.html(html_content, height=800, scrolling=True)
-
-# 7) Aba "📘 Sobre o Modelo Estatístico"
-elif aba == "📘 Sobre o Modelo Estatístico":
-    st.title("📘 Sobre o Modelo Estatístico")
-    pdf_file = "03_Estatistica_2025.pdf"
-    if os.path.exists(pdf_file):
-        with open(pdf_file, "rb") as f:
-            pdf_bytes = f.read()
-        st.download_button(
-            label="Baixar Relatório PDF",
-            data=pdf_bytes,
-            file_name="03_Estatistica_2025.pdf",
-            mime="application/pdf"
-        )
-    else:
-        st.warning(f"Arquivo PDF '{pdf_file}' não encontrado no diretório atual.")
-
+            st.warning(f"Arquivo PDF '{pdf_file}' não encontrado no diretório atual.")
+finally:
+    # 8) Registro das métricas desta execução, mesmo quando interrompida (st.rerun, st.stop ou erro)
+    if perfilador is not None:
+        import io
+        import pstats
+        import tempfile
+        perfilador.disable()
+        texto = io.StringIO()
+        pstats.Stats(perfilador, stream=texto).sort_stats("cumulative").print_stats(40)
+        with tempfile.NamedTemporaryFile(suffix=".prof") as arquivo_prof:
+            perfilador.dump_stats(arquivo_prof.name)
+            st.session_state.perfil_execucao = (arquivo_prof.read(), texto.getvalue())
+
+    historico = st.session_state.historico_metricas
+    historico.adicionar(METRICAS.registrar(st.session_state.sessao_id, cronometro, historico.contador + 1))
+
+# Painel de desempenho (opcional)
+if st.sidebar.checkbox("🛠️ Painel de desempenho"):
+    with st.sidebar.expander("Desempenho", expanded=True):
+        st.caption(f"Execução nº {historico.contador} — {cronometro.total() * 1000:.0f} ms no total")
+        st.table({nome: f"{segundos * 1000:.1f} ms" for nome, segundos in cronometro.etapas})
+        st.caption("Sessão (média / máximo)")
+        st.table({nome: f"{r['media'] * 1000:.1f} / {r['max'] * 1000:.1f} ms"
+                  for nome, r in historico.resumo().items()})
+        st.download_button("Baixar métricas da sessão (JSONL)", historico.jsonl(),
+                           file_name="metricas_sessao.jsonl", mime="application/x-ndjson")
+        st.download_button("Baixar métricas do processo (Prometheus)", METRICAS.prometheus(),
+                           file_name="metricas.prom", mime="text/plain")
+        st.button("Perfilar a próxima execução (cProfile)",
+                  on_click=lambda: st.session_state.update(perfilar_proxima=True))
+        if st.session_state.get("perfil_execucao"):
+            dados_prof, resumo_prof = st.session_state.perfil_execucao
+            st.download_button("Baixar perfil (.prof)", dados_prof, file_name="execucao.prof",
+                               mime="application/octet-stream")
+            with st.popover("Resumo do perfil"):
+                st.code(resumo_prof)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Teste de estresse da renderização de figuras com muitas sessões simultâneas.
+#
+# Cada "sessão" é uma thread (como as do Streamlit) que desenha repetidamente as
+# duas figuras do app para a sua própria série, em rodadas. O script verifica que:
+#   - cada PNG é idêntico ao desenhado isoladamente para a mesma série (sem
+#     mistura de elementos entre figuras de sessões diferentes);
+#   - nenhuma figura fica registrada no pyplot;
+#   - a memória residente (RSS) não cresce além de `--limite-mb` depois das rodadas
+#     de aquecimento (as primeiras rodadas enchem os caches de fontes e do alocador).
+# Termina com código 1 se alguma verificação falhar.
+#
+# Uso:
+#   python benchmarks/estresse_figuras.py --sessoes 32 --rodadas 10
+#   CONSUMO_RENDER_WORKERS=4 python benchmarks/estresse_figuras.py --limite-mb 30
+
+import argparse
+import gc
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from estatistica import ajustar_kde  # noqa: E402
+from gerador import gerar_consumo_mensal  # noqa: E402
+from graficos import RENDER_WORKERS, figura_cdf, figura_distribuicao, figura_png, renderizar_png  # noqa: E402
+
+
+def memoria_residente_mb():
+    """RSS atual do processo (Linux: /proc; nos demais, o pico informado por `resource`)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 2 ** 20 if sys.platform == "darwin" else pico / 2 ** 10
+
+
+def _entradas(sessoes, meses, semente):
+    consumos = gerar_consumo_mensal(2000, 2000 + meses // 12 - 1, n_sistemas=sessoes, semente=semente)
+    entradas = []
+    for consumo in consumos:
+        kde = ajustar_kde(consumo)
+        media, desvio = float(np.mean(consumo)), float(np.std(consumo))
+        ref = kde.quantil(0.95)
+        entradas.append(((figura_distribuicao, consumo, kde, media, desvio, ref, f"95% ≈ {ref:,.0f} m³"),
+                         (figura_cdf, kde, media, desvio)))
+    return entradas
+
+
+def _sessao(entrada):
+    return tuple(renderizar_png(construir, *args) for construir, *args in entrada)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estresse da renderização de figuras em sessões simultâneas.")
+    parser.add_argument("--sessoes", type=int, default=32, help="Sessões (threads) simultâneas")
+    parser.add_argument("--rodadas", type=int, default=8, help="Rodadas de renderização por sessão")
+    parser.add_argument("--meses", type=int, default=72, help="Meses de cada série")
+    parser.add_argument("--aquecimento", type=int, default=2, help="Rodadas iniciais fora da medição de memória")
+    parser.add_argument("--limite-mb", type=float, default=15.0,
+                        help="Crescimento máximo do RSS após o aquecimento (MB)")
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.rodadas <= args.aquecimento:
+        parser.error("--rodadas deve ser maior que --aquecimento.")
+
+    entradas = _entradas(args.sessoes, args.meses, args.semente)
+    # Referência: cada sessão desenhada isoladamente, sem concorrência
+    referencia = [tuple(figura_png(construir(*a)) for construir, *a in entrada) for entrada in entradas]
+
+    falhas = []
+    memoria = []
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessoes) as sessoes:
+        for rodada in range(1, args.rodadas + 1):
+            resultados = list(sessoes.map(_sessao, entradas))
+            divergentes = sum(r != ref for r, ref in zip(resultados, referencia))
+            if divergentes:
+                falhas.append(f"rodada {rodada}: {divergentes} sessões com figuras diferentes da referência")
+            del resultados
+            gc.collect()
+            memoria.append(memoria_residente_mb())
+            print(f"rodada {rodada:>3}: RSS {memoria[-1]:8.1f} MB")
+    duracao = time.perf_counter() - inicio
+
+    if "matplotlib.pyplot" in sys.modules:
+        from matplotlib import _pylab_helpers
+        if _pylab_helpers.Gcf.get_num_fig_managers():
+            falhas.append(f"{_pylab_helpers.Gcf.get_num_fig_managers()} figuras abertas no pyplot")
+    crescimento = max(memoria[args.aquecimento:]) - memoria[args.aquecimento - 1 if args.aquecimento else 0]
+    if crescimento > args.limite_mb:
+        falhas.append(f"RSS cresceu {crescimento:.1f} MB após o aquecimento (limite {args.limite_mb} MB)")
+
+    figuras = 2 * args.sessoes * args.rodadas
+    print(f"{figuras} figuras em {duracao:.1f} s ({figuras / duracao:.1f} figuras/s, "
+          f"{RENDER_WORKERS} threads de renderização); crescimento do RSS: {crescimento:+.1f} MB")
+    for falha in falhas:
+        print(f"FALHA: {falha}", file=sys.stderr)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Benchmarks das etapas da aba "🧮 Cálculo", isoladas e em vários tamanhos de dados.
+#
+# Para cada etapa e tamanho mede o tempo de parede (mediana das repetições) e o pico
+# de memória alocada (tracemalloc). Os resultados podem ser gravados como linha de
+# base e comparados depois: qualquer etapa mais lenta que a base além do limiar
+# faz o script terminar com código 1.
+#
+# Uso:
+#   python benchmarks/executar.py --salvar-base            # grava benchmarks/base.json
+#   python benchmarks/executar.py --limiar 0.25            # compara com a base (falha se >25% mais lento)
+#   python benchmarks/executar.py --tamanhos 12 72 100000 --etapas kde testes --json resultado.json
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from calculo import ler_consumo_csv, testes_normalidade  # noqa: E402
+from estatistica import ajustar_kde  # noqa: E402
+from gerador import gerar_consumo_mensal, tabela_mensal  # noqa: E402
+
+BASE_PADRAO = Path(__file__).resolve().parent / "base.json"
+TAMANHOS_PADRAO = (12, 72, 1_000, 10_000, 100_000)
+
+
+def _dados(n, semente=0):
+    """Série sintética com `n` pontos (os meses excedentes de uma série anual são descartados)."""
+    anos = -(-n // 12)
+    consumo = gerar_consumo_mensal(2000, 2000 + anos - 1, sazonalidade=0.1, autocorrelacao=0.3,
+                                   semente=semente)[0][:n]
+    return consumo
+
+
+def _preparar(n):
+    """Entradas de cada etapa, calculadas fora da medição."""
+    consumo = _dados(n)
+    anos = -(-n // 12)
+    csv = tabela_mensal(_dados(anos * 12), 2000, 2000 + anos - 1).iloc[:n].to_csv(index=False)
+    return {"consumo": consumo, "csv": csv}
+
+
+def _figuras(consumo):
+    from graficos import figura_distribuicao, figura_cdf, figura_png
+
+    kde = ajustar_kde(consumo)
+    media, desvio = float(np.mean(consumo)), float(np.std(consumo))
+    ref = kde.quantil(0.95)
+    png1 = figura_png(figura_distribuicao(consumo, kde, media, desvio, ref, "95%"))
+    png2 = figura_png(figura_cdf(kde, media, desvio))
+    return png1, png2
+
+
+def _series(consumo):
+    from graficos_interativos import especificacao_cdf, especificacao_distribuicao, series_cdf, series_distribuicao
+
+    kde = ajustar_kde(consumo)
+    media, desvio = float(np.mean(consumo)), float(np.std(consumo))
+    ref = kde.quantil(0.95)
+    spec1 = especificacao_distribuicao(series_distribuicao(consumo, kde, media, desvio), ref, "95%")
+    spec2 = especificacao_cdf(series_cdf(kde, media, desvio))
+    return json.dumps(spec1), json.dumps(spec2)
+
+
+def _etapa_relatorio(entradas):
+    from calculo import textos_testes
+    from relatorio import gerar_relatorio
+
+    if "pngs" not in entradas:
+        entradas["pngs"] = _figuras(entradas["consumo"])
+    consumo = entradas["consumo"]
+    dados = {
+        "nome_projeto": "Benchmark", "tecnico_operador": "", "tipo_medicao": "Micromedição - Hidrômetros",
+        "modelo": "KDE", "percentil": 95, "dias_mes": 30, "horas_operacao": 24, "k1": 1.4, "k2": 2.0,
+        "consumo_ref": float(np.percentile(consumo, 95)), "desvio_padrao": float(np.std(consumo)),
+        "q_med": 1.0, "q_max_dia": 1.4, "q_max_hora": 2.0, "q_max_real": 2.8,
+        "textos_testes": textos_testes({"shapiro": (1.0, 0.5), "dagostino": (1.0, 0.5), "ks": (0.1, 0.5)}),
+    }
+    return lambda: gerar_relatorio(dados, *entradas["pngs"])
+
+
+# Cada etapa recebe as entradas preparadas e devolve a função a ser medida
+ETAPAS = {
+    "csv": lambda e: (lambda: ler_consumo_csv(StringIO(e["csv"]))),
+    "kde": lambda e: (lambda: ajustar_kde(e["consumo"]).quantil(0.95)),
+    "percentil": lambda e: (lambda: np.percentile(e["consumo"], 95)),
+    "testes": lambda e: (lambda: testes_normalidade(e["consumo"])),
+    "figuras": lambda e: (lambda: _figuras(e["consumo"])),
+    "series": lambda e: (lambda: _series(e["consumo"])),
+    "relatorio": _etapa_relatorio,
+}
+
+
+def medir(funcao, repeticoes):
+    funcao()  # aquecimento (imports preguiçosos, caches do sistema)
+    tempos = []
+    for _ in range(repeticoes):
+        gc.collect()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    gc.collect()
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"segundos": statistics.median(tempos), "pico_mb": pico / 2 ** 20}
+
+
+def executar(tamanhos, etapas, repeticoes, registrar=print):
+    resultados = {}
+    for n in tamanhos:
+        entradas = _preparar(n)
+        for etapa in etapas:
+            chave = f"{etapa}/{n}"
+            resultados[chave] = medir(ETAPAS[etapa](entradas), repeticoes)
+            registrar(f"{chave:<22} {resultados[chave]['segundos'] * 1000:10.2f} ms "
+                      f"{resultados[chave]['pico_mb']:10.2f} MB")
+    return resultados
+
+
+def comparar(resultados, base, limiar, tolerancia_s=0.001):
+    """Lista as etapas mais lentas que a base por mais de `limiar` (fração).
+
+    Diferenças absolutas menores que `tolerancia_s` são ignoradas (ruído de medição
+    nas etapas de poucos microssegundos).
+    """
+    regressoes = []
+    for chave, medida in resultados.items():
+        anterior = base.get(chave)
+        if anterior is None:
+            continue
+        razao = medida["segundos"] / anterior["segundos"] if anterior["segundos"] > 0 else 1.0
+        if razao > 1 + limiar and medida["segundos"] - anterior["segundos"] > tolerancia_s:
+            regressoes.append((chave, anterior["segundos"], medida["segundos"], razao))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks das etapas do cálculo do consumo referencial.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=list(TAMANHOS_PADRAO))
+    parser.add_argument("--etapas", nargs="+", choices=list(ETAPAS), default=list(ETAPAS))
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--base", default=str(BASE_PADRAO), help="Arquivo JSON da linha de base")
+    parser.add_argument("--salvar-base", action="store_true", help="Grava os resultados como nova linha de base")
+    parser.add_argument("--limiar", type=float, default=0.25, help="Piora relativa tolerada (0.25 = 25%%)")
+    parser.add_argument("--tolerancia-ms", type=float, default=1.0, help="Diferença absoluta ignorada (ms)")
+    parser.add_argument("--json", default=None, help="Grava os resultados neste arquivo JSON")
+    args = parser.parse_args(argv)
+
+    resultados = executar(args.tamanhos, args.etapas, args.repeticoes)
+    documento = {
+        "ambiente": {"python": platform.python_version(), "plataforma": platform.platform(),
+                     "numpy": np.__version__},
+        "resultados": resultados,
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(documento, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.salvar_base:
+        Path(args.base).write_text(json.dumps(documento, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Linha de base gravada em {args.base}")
+        return 0
+
+    if not Path(args.base).exists():
+        print(f"Sem linha de base em {args.base}; use --salvar-base para criá-la.")
+        return 0
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))["resultados"]
+    regressoes = comparar(resultados, base, args.limiar, args.tolerancia_ms / 1000)
+    for chave, antes, depois, razao in regressoes:
+        print(f"REGRESSÃO {chave}: {antes * 1000:.2f} ms -> {depois * 1000:.2f} ms ({razao:.2f}x)", file=sys.stderr)
+    if regressoes:
+        return 1
+    print(f"Nenhuma regressão acima de {args.limiar:.0%} em relação à linha de base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
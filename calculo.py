@@ -0,0 +1,175 @@
+# coding: utf-8
+
+# Etapas do cálculo do Consumo Referencial, sem dependência do Streamlit.
+#
+# Cada etapa recebe apenas os parâmetros de que realmente depende, o que permite
+# que o app (e outros consumidores) façam cache etapa a etapa. As dependências
+# pesadas (scipy e o motor da KDE) são importadas apenas pelas etapas que as usam.
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+TEMPO_DIA = 86400  # Segundos em um dia
+COLUNAS = ['Mês', 'Consumo (m³)']
+
+
+def ler_consumo_csv(arquivo):
+    """Lê um CSV de consumo mensal (caminho ou arquivo aberto) no formato do app."""
+    df = pd.read_csv(arquivo)
+    if df.shape[1] < 2:
+        raise ValueError("O arquivo precisa ter pelo menos duas colunas.")
+    df = df.iloc[:, :2]
+    df.columns = COLUNAS
+    return df
+
+
+# Função para formatação numérica: ponto para milhar e vírgula para decimal
+def format_num(value, decimals=2):
+    fmt = f",.{decimals}f" if decimals > 0 else f",.0f"
+    return f"{value:{fmt}}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def interpreta(p):
+    return "✔️ Aceita a hipótese de normalidade." if p > 0.05 else "❌ Rejeita a hipótese de normalidade."
+
+
+def textos_testes(testes):
+    """Frases (Shapiro-Wilk, D'Agostino-Pearson, KS e os testes corrigidos) exibidas no app e no relatório."""
+    nomes = {
+        "shapiro": "Shapiro-Wilk",
+        "dagostino": "D'Agostino e Pearson",
+        "ks": "Kolmogorov-Smirnov (KS)",
+        "lilliefors": "Kolmogorov-Smirnov corrigido (Lilliefors, desvio com n − 1, Monte Carlo)",
+        "anderson": "Anderson-Darling (Monte Carlo)",
+    }
+    return [
+        f"{nomes[chave]}: Estatística = {format_num(stat, 3)}; p-valor = {format_num(p, 3)} — {interpreta(p)}"
+        for chave, (stat, p) in testes.items()
+    ]
+
+
+def hash_dados(consumo):
+    """Hash de conteúdo da série de consumo (chave de cache por conjunto de dados)."""
+    x = np.ascontiguousarray(np.asarray(consumo, dtype=float))
+    return hashlib.sha1(x.tobytes()).hexdigest()
+
+
+def consumo_referencial(consumo, modelo, percentil, kde=None):
+    if modelo == "KDE":
+        if kde is None:
+            from estatistica import ajustar_kde
+            kde = ajustar_kde(consumo, bw_adjust=1)
+        return kde.quantil(percentil / 100)
+    return float(np.percentile(consumo, percentil))
+
+
+def calcular_vazoes(consumo_ref, dias_mes, horas_operacao, k1, k2, tempo_dia=TEMPO_DIA):
+    # Fator de ajuste (r = 24 / t)
+    r = 24 / horas_operacao
+    q_med_base = (consumo_ref / dias_mes) / tempo_dia * 1000
+    q_med = q_med_base * r
+    return {
+        "q_med": q_med,
+        "q_max_dia": q_med * k1,
+        "q_max_hora": q_med * k2,
+        "q_max_real": q_med * k1 * k2,
+    }
+
+
+def estatisticas_basicas(consumo):
+    return {"media": float(np.mean(consumo)), "desvio_padrao": float(np.std(consumo))}
+
+
+def testes_normalidade(consumo):
+    from scipy.stats import shapiro, normaltest, kstest
+
+    media = np.mean(consumo)
+    desvio_padrao = np.std(consumo)
+    stat_sw, p_sw = shapiro(consumo)
+    stat_dp, p_dp = normaltest(consumo)
+    stat_ks, p_ks = kstest(consumo, 'norm', args=(media, desvio_padrao))
+    return {
+        "shapiro": (float(stat_sw), float(p_sw)),
+        "dagostino": (float(stat_dp), float(p_dp)),
+        "ks": (float(stat_ks), float(p_ks)),
+    }
+
+
+def calcular_projeto(consumo, modelo="KDE", percentil=95, dias_mes=30, horas_operacao=24,
+                     k1=1.4, k2=2.0, tempo_dia=TEMPO_DIA, kde=None):
+    """Cálculo completo da aba Cálculo, em um dicionário plano de resultados (`kde` já ajustada é opcional)."""
+    consumo = np.asarray(consumo, dtype=float)
+    consumo_ref = consumo_referencial(consumo, modelo, percentil, kde=kde)
+    resultado = {"n_meses": int(consumo.size), "consumo_ref": consumo_ref}
+    resultado.update(calcular_vazoes(consumo_ref, dias_mes, horas_operacao, k1, k2, tempo_dia))
+    resultado.update(estatisticas_basicas(consumo))
+    for nome, (estatistica, p_valor) in testes_normalidade(consumo).items():
+        resultado[f"{nome}_estatistica"] = estatistica
+        resultado[f"{nome}_p_valor"] = p_valor
+    return resultado
+
+
+def grade_sensibilidade(consumo, modelo, percentis, horas, k1s, k2s, dias_mes=30,
+                        tempo_dia=TEMPO_DIA, kde=None):
+    """Vazões sobre toda a grade percentil x horas x K1 x K2, em uma única passada.
+
+    Os quantis são obtidos em uma chamada vetorizada e as fórmulas de vazão são
+    propagadas por broadcasting. Os arrays devolvidos têm forma
+    (len(percentis), len(horas), len(k1s), len(k2s)).
+    """
+    percentis = np.asarray(percentis, dtype=float)
+    horas = np.asarray(horas, dtype=float)
+    k1s = np.asarray(k1s, dtype=float)
+    k2s = np.asarray(k2s, dtype=float)
+    if modelo == "KDE":
+        if kde is None:
+            from estatistica import ajustar_kde
+            kde = ajustar_kde(consumo, bw_adjust=1)
+        refs = np.asarray(kde.quantil(percentis / 100))
+    else:
+        refs = np.percentile(consumo, percentis)
+
+    forma = (percentis.size, horas.size, k1s.size, k2s.size)
+    ref = refs[:, None, None, None]
+    r = 24 / horas[None, :, None, None]
+    k1 = k1s[None, None, :, None]
+    k2 = k2s[None, None, None, :]
+    q_med = (ref / dias_mes) / tempo_dia * 1000 * r
+    return {
+        "percentil": percentis,
+        "horas_operacao": horas,
+        "k1": k1s,
+        "k2": k2s,
+        "consumo_ref": refs,
+        "q_med": np.broadcast_to(q_med, forma),
+        "q_max_dia": np.broadcast_to(q_med * k1, forma),
+        "q_max_hora": np.broadcast_to(q_med * k2, forma),
+        "q_max_real": q_med * k1 * k2,
+    }
+
+
+def grade_para_tabela(grade):
+    """Converte o resultado de `grade_sensibilidade` em uma tabela longa (uma linha por cenário)."""
+    eixos = np.meshgrid(grade["percentil"], grade["horas_operacao"], grade["k1"], grade["k2"], indexing="ij")
+    tabela = {nome: eixo.ravel() for nome, eixo in zip(("percentil", "horas_operacao", "k1", "k2"), eixos)}
+    tabela["consumo_ref"] = np.broadcast_to(grade["consumo_ref"][:, None, None, None], eixos[0].shape).ravel()
+    for nome in ("q_med", "q_max_dia", "q_max_hora", "q_max_real"):
+        tabela[nome] = grade[nome].ravel()
+    return pd.DataFrame(tabela)
+
+
+def intervalos_bootstrap(replicas, dias_mes, horas_operacao, k1, k2, nivel=0.95, tempo_dia=TEMPO_DIA):
+    """Intervalos de confiança do consumo referencial e de cada vazão derivada das réplicas."""
+    from estatistica import intervalo_confianca
+
+    replicas = np.asarray(replicas, dtype=float)
+    series = {"consumo_ref": replicas}
+    series.update(calcular_vazoes(replicas, dias_mes, horas_operacao, k1, k2, tempo_dia))
+    linhas = []
+    for nome, valores in series.items():
+        inf, sup = intervalo_confianca(valores, nivel)
+        linhas.append({"grandeza": nome, "inferior": inf, "superior": sup,
+                       "erro_padrao": float(np.std(valores, ddof=1))})
+    return pd.DataFrame(linhas)
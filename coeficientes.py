@@ -0,0 +1,68 @@
+# coding: utf-8
+
+# Estimativa empírica dos coeficientes K1 (máx. diária) e K2 (máx. horária).
+#
+# Parte dos volumes horários (ver `ingestao.AgregadorLeituras.horario`) e usa apenas
+# operações vetorizadas de reamostragem/agrupamento do pandas, sem laços por dia:
+#   K1 de um dia = volume do dia / volume diário médio do seu ano
+#   K2 de um dia = maior volume horário do dia / volume horário médio do dia
+# Horas com cobertura incompleta são descartadas, e dias com alguma hora descartada
+# ficam fora das duas estimativas.
+
+import numpy as np
+import pandas as pd
+
+PERCENTIS_RELATORIO = (50, 75, 90, 95, 99, 100)
+
+
+def razoes_diarias(volume_horario, cobertura=None, cobertura_min=0.95):
+    """DataFrame diário com o volume do dia e as razões K1 e K2 de cada dia completo."""
+    volume_horario = volume_horario.asfreq("h")
+    completa = volume_horario.notna()
+    if cobertura is not None:
+        completa &= cobertura.reindex(volume_horario.index).fillna(0) >= cobertura_min
+    horas_completas = completa.resample("D").sum()
+    dias_completos = horas_completas[horas_completas == 24].index
+
+    por_dia = volume_horario.resample("D")
+    diario = pd.DataFrame({
+        "volume": por_dia.sum(),
+        "max_hora": por_dia.max(),
+        "media_hora": por_dia.mean(),
+    }).loc[dias_completos]
+    if diario.empty:
+        return diario.assign(k1=pd.Series(dtype=float), k2=pd.Series(dtype=float))
+    media_anual = diario["volume"].groupby(diario.index.year).transform("mean")
+    diario["k1"] = diario["volume"] / media_anual
+    diario["k2"] = diario["max_hora"] / diario["media_hora"]
+    return diario
+
+
+def estimar_k1_k2(volume_horario, cobertura=None, percentil=100, cobertura_min=0.95,
+                  percentis=PERCENTIS_RELATORIO):
+    """Estima K1 e K2 como o `percentil` das razões diárias (100 = definição clássica, o máximo).
+
+    Devolve um dicionário com as estimativas, o número de dias usados, os K1 anuais
+    (máx. dia / dia médio de cada ano) e uma tabela com os percentis das distribuições.
+    """
+    diario = razoes_diarias(volume_horario, cobertura, cobertura_min)
+    diario = diario.replace([np.inf, -np.inf], np.nan).dropna(subset=["k1", "k2"])
+    if diario.empty:
+        raise ValueError("Não há dias completos suficientes para estimar K1 e K2.")
+    percentis = sorted(set(percentis) | {percentil})
+    distribuicao = pd.DataFrame({
+        "K1": np.percentile(diario["k1"], percentis),
+        "K2": np.percentile(diario["k2"], percentis),
+    }, index=pd.Index(percentis, name="Percentil (%)"))
+    return {
+        "k1": float(distribuicao.loc[percentil, "K1"]),
+        "k2": float(distribuicao.loc[percentil, "K2"]),
+        "dias": int(len(diario)),
+        "k1_anual": diario["k1"].groupby(diario.index.year).max(),
+        "distribuicao": distribuicao,
+    }
+
+
+def estimar_de_agregador(agregador, percentil=100, cobertura_min=0.95):
+    horario = agregador.horario()
+    return estimar_k1_k2(horario["volume"], horario["cobertura"], percentil, cobertura_min)
@@ -0,0 +1,260 @@
+# coding: utf-8
+
+# Motor estatístico do Consumo Referencial, independente do Streamlit e do Matplotlib.
+#
+# A KDE gaussiana é ajustada uma única vez por conjunto de dados e fornece, sem
+# desenhar nenhuma figura: o quantil (consumo referencial), a grade da CDF e a
+# densidade usadas pelos gráficos e pelo relatório.
+
+from typing import NamedTuple
+
+import numpy as np
+from scipy.special import ndtr
+
+# Número máximo de elementos avaliados de uma vez no método exato (controla a memória)
+_BLOCO_MAX = 2_000_000
+# Acima deste custo (pontos x amostras) o modo "auto" usa o método por binning + FFT
+_LIMIAR_BINNING = 5_000_000
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+
+def largura_banda(consumo, bw_adjust=1.0):
+    """Largura de banda pela regra de Scott (mesma convenção do seaborn/scipy)."""
+    x = np.asarray(consumo, dtype=float).ravel()
+    if x.size < 2:
+        raise ValueError("A KDE precisa de pelo menos dois valores de consumo.")
+    desvio = np.std(x, ddof=1)
+    if not np.isfinite(desvio) or desvio <= 0:
+        raise ValueError("A KDE precisa de valores de consumo não constantes.")
+    return float(desvio * x.size ** (-1 / 5) * bw_adjust)
+
+
+def _convolver_fft(a, b):
+    # Convolução linear completa via FFT real (evita importar scipy.signal, de carga lenta)
+    n = a.size + b.size - 1
+    tamanho = 1 << (n - 1).bit_length()
+    return np.fft.irfft(np.fft.rfft(a, tamanho) * np.fft.rfft(b, tamanho), tamanho)[:n]
+
+
+class KDE:
+    """KDE gaussiana unidimensional com CDF em forma fechada.
+
+    `pontos` define a resolução da grade (densidade e CDF para os gráficos) e
+    `metodo` escolhe entre a soma exata ("exato"), o binning linear com
+    convolução por FFT ("binning") ou a escolha automática pelo custo ("auto").
+    Com `pesos`, cada valor entra na mistura com o peso dado (ex.: itens de um
+    sketch de quantis); nesse caso a largura de banda `h` deve ser informada.
+    """
+
+    def __init__(self, consumo, bw_adjust=1.0, pontos=512, corte=3.0, metodo="auto", pesos=None, h=None):
+        self.dados = np.asarray(consumo, dtype=float).ravel()
+        self.pesos = None
+        if pesos is not None:
+            pesos = np.asarray(pesos, dtype=float).ravel()
+            if pesos.shape != self.dados.shape or h is None:
+                raise ValueError("A KDE ponderada exige um peso por valor e a largura de banda.")
+            self.pesos = pesos / pesos.sum()
+        self.h = float(h) if h is not None else largura_banda(self.dados, bw_adjust)
+        self.bw_adjust = bw_adjust
+        if metodo == "auto":
+            metodo = "binning" if self.dados.size * pontos > _LIMIAR_BINNING else "exato"
+        if metodo not in ("exato", "binning"):
+            raise ValueError(f"Método de KDE desconhecido: {metodo}")
+        self.metodo = metodo
+        self.grade = np.linspace(self.dados.min() - corte * self.h,
+                                 self.dados.max() + corte * self.h, int(pontos))
+        if metodo == "binning":
+            self.densidade, self.cdf_grade = self._avaliar_binning()
+        else:
+            self.densidade = self.pdf(self.grade)
+            self.cdf_grade = self.cdf(self.grade)
+
+    # -- avaliação exata, em blocos para limitar a memória --------------------------
+    def _somar_kernel(self, x, kernel):
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        saida = np.empty(x.shape, dtype=float)
+        plano = x.ravel()
+        res = saida.ravel()
+        passo = max(1, _BLOCO_MAX // self.dados.size)
+        for ini in range(0, plano.size, passo):
+            z = (plano[ini:ini + passo, None] - self.dados[None, :]) / self.h
+            res[ini:ini + passo] = kernel(z).mean(axis=1) if self.pesos is None else kernel(z) @ self.pesos
+        return saida
+
+    def cdf(self, x):
+        return self._somar_kernel(x, ndtr)
+
+    def pdf(self, x):
+        return self._somar_kernel(x, lambda z: np.exp(-0.5 * z * z) * _INV_SQRT_2PI) / self.h
+
+    # -- avaliação aproximada: binning linear + convolução por FFT ------------------
+    def _avaliar_binning(self):
+        g = self.grade
+        m = g.size
+        passo = g[1] - g[0]
+        pos = (self.dados - g[0]) / passo
+        i0 = np.clip(np.floor(pos).astype(int), 0, m - 2)
+        frac = pos - i0
+        w = self.pesos if self.pesos is not None else np.full(self.dados.size, 1.0 / self.dados.size)
+        pesos = np.bincount(i0, weights=w * (1.0 - frac), minlength=m)
+        pesos += np.bincount(i0 + 1, weights=w * frac, minlength=m)
+        desloc = np.arange(-(m - 1), m) * passo / self.h
+        densidade = _convolver_fft(pesos, np.exp(-0.5 * desloc ** 2) * _INV_SQRT_2PI / self.h)[m - 1:2 * m - 1]
+        cdf = _convolver_fft(pesos, ndtr(desloc))[m - 1:2 * m - 1]
+        return np.clip(densidade, 0.0, None), np.clip(cdf, 0.0, 1.0)
+
+    def quantil(self, p, tol=1e-6, max_iter=50):
+        """Inverte a CDF da KDE para a(s) probabilidade(s) `p` (0 < p < 1).
+
+        No método exato a inversão é refinada por Newton protegido por bissecção
+        até `tol` (relativo à largura de banda); no método por binning usa-se a
+        interpolação linear sobre a grade.
+        """
+        p = np.asarray(p, dtype=float)
+        if np.any((p <= 0) | (p >= 1)):
+            raise ValueError("O percentil deve estar entre 0 e 100 (exclusive).")
+        escalar = p.ndim == 0
+        p = np.atleast_1d(p)
+        x = np.interp(p, self.cdf_grade, self.grade)
+        if self.metodo == "exato":
+            idx = np.searchsorted(self.cdf_grade, p)
+            folga = 10 * self.h
+            lo = np.where(idx > 0, self.grade[np.clip(idx - 1, 0, None)], self.grade[0] - folga)
+            hi = np.where(idx < self.grade.size, self.grade[np.clip(idx, None, self.grade.size - 1)],
+                          self.grade[-1] + folga)
+            for _ in range(max_iter):
+                f = self.cdf(x) - p
+                lo = np.where(f < 0, x, lo)
+                hi = np.where(f >= 0, x, hi)
+                dens = self.pdf(x)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    novo = x - f / dens
+                fora = ~np.isfinite(novo) | (novo <= lo) | (novo >= hi)
+                novo = np.where(fora, 0.5 * (lo + hi), novo)
+                convergiu = np.all(np.abs(novo - x) < tol * self.h)
+                x = novo
+                if convergiu:
+                    break
+        return float(x[0]) if escalar else x
+
+
+class ResultadoKDE(NamedTuple):
+    quantil: float
+    grade: np.ndarray
+    cdf: np.ndarray
+    densidade: np.ndarray
+
+
+def ajustar_kde(consumo, bw_adjust=1.0, pontos=512, metodo="auto"):
+    return KDE(consumo, bw_adjust=bw_adjust, pontos=pontos, metodo=metodo)
+
+
+def kde_quantile(consumo, p, bw=1.0, pontos=512, metodo="auto", tol=1e-6):
+    """Quantil `p` (0-1) da KDE do consumo, com a grade da CDF e a densidade."""
+    kde = ajustar_kde(consumo, bw_adjust=bw, pontos=pontos, metodo=metodo)
+    return ResultadoKDE(kde.quantil(p, tol=tol), kde.grade, kde.cdf_grade, kde.densidade)
+
+
+# -- Bootstrap do consumo referencial ---------------------------------------------
+
+def percentil_linhas(ordenada, n, p):
+    """Percentil `p` (0-1) de cada linha de uma matriz já ordenada com `n` valores válidos por
+    linha (os demais, NaN, ao final), com a interpolação linear de `np.percentile`."""
+    pos = p * (n - 1)
+    i0 = np.clip(np.floor(pos).astype(int), 0, None)
+    i1 = np.minimum(i0 + 1, np.maximum(n - 1, 0))
+    v0 = np.take_along_axis(ordenada, i0[:, None], axis=1)[:, 0]
+    v1 = np.take_along_axis(ordenada, i1[:, None], axis=1)[:, 0]
+    return v0 + (pos - i0) * (v1 - v0)
+
+
+def _quantil_kde_lote(amostras, p, bw_adjust=1.0, tol=1e-6, max_iter=60):
+    """Quantil `p` da KDE de cada linha de `amostras` (réplicas x n), todas de uma vez.
+
+    Linhas com menos valores (séries de tamanhos diferentes) podem ser completadas
+    com NaN; os NaN ficam fora da KDE da linha.
+    """
+    amostras = np.asarray(amostras, dtype=float)
+    validos = ~np.isnan(amostras)
+    pesos = None
+    if validos.all():
+        n = np.full(amostras.shape[0], amostras.shape[1])
+        h = np.std(amostras, axis=1, ddof=1)
+        x = np.percentile(amostras, p * 100, axis=1)
+        minimo, maximo = amostras.min(axis=1), amostras.max(axis=1)
+    else:
+        n = validos.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            h = np.sqrt(np.nansum((amostras - np.nanmean(amostras, axis=1, keepdims=True)) ** 2, axis=1) / (n - 1))
+            pesos = validos / n[:, None]
+        ordenada = np.sort(amostras, axis=1)
+        x = percentil_linhas(ordenada, n, p)
+        minimo, maximo = ordenada[:, 0], np.take_along_axis(ordenada, (n - 1)[:, None], axis=1)[:, 0]
+        # Posições vazias recebem peso zero (e um valor finito qualquer)
+        amostras = np.where(validos, amostras, 0.0)
+    # Réplicas degeneradas (todos os valores iguais) não têm KDE: o quantil é o próprio valor
+    h = h * n ** (-1 / 5) * bw_adjust
+    h = np.where(h > 0, h, np.nan)
+    lo = minimo - 10 * np.nan_to_num(h)
+    hi = maximo + 10 * np.nan_to_num(h)
+    for _ in range(max_iter):
+        z = (x[:, None] - amostras) / h[:, None]
+        cdf, kernel = ndtr(z), np.exp(-0.5 * z * z) * _INV_SQRT_2PI
+        if pesos is None:
+            f = cdf.mean(axis=1) - p
+            dens = kernel.mean(axis=1) / h
+        else:
+            f = (cdf * pesos).sum(axis=1) - p
+            dens = (kernel * pesos).sum(axis=1) / h
+        lo = np.where(f < 0, x, lo)
+        hi = np.where(f >= 0, x, hi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            novo = x - f / dens
+        fora = ~np.isfinite(novo) | (novo <= lo) | (novo >= hi)
+        novo = np.where(fora, 0.5 * (lo + hi), novo)
+        novo = np.where(np.isnan(h), x, novo)
+        convergiu = np.all(np.abs(novo - x) < tol * np.nan_to_num(h, nan=1.0))
+        x = novo
+        if convergiu:
+            break
+    return x
+
+
+def _quantil_lote(amostras, p, modelo, bw_adjust=1.0, bloco=2000):
+    if modelo != "KDE":
+        return np.percentile(amostras, p * 100, axis=1)
+    # Em blocos de réplicas para limitar a memória das matrizes (réplicas x n)
+    return np.concatenate([_quantil_kde_lote(amostras[i:i + bloco], p, bw_adjust)
+                           for i in range(0, amostras.shape[0], bloco)])
+
+
+def bootstrap_consumo_ref(consumo, percentil, modelo="KDE", n_replicas=10_000, semente=None,
+                          bw_adjust=1.0, workers=1):
+    """Réplicas bootstrap do consumo referencial (percentil em %).
+
+    As reamostragens são sorteadas de uma vez como uma matriz (réplicas x n) a partir
+    de `semente`, de modo que o resultado não depende de `workers`. Com `workers` > 1
+    e o modelo KDE, os blocos de réplicas são resolvidos em processos separados.
+    """
+    x = np.asarray(consumo, dtype=float).ravel()
+    rng = np.random.default_rng(semente)
+    amostras = x[rng.integers(0, x.size, size=(int(n_replicas), x.size))]
+    p = percentil / 100
+    if modelo == "KDE" and workers and workers > 1 and len(amostras) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Nunca mais blocos que réplicas: um bloco vazio não tem quantil
+        n_partes = min(workers, len(amostras))
+        partes = np.array_split(amostras, n_partes)
+        with ProcessPoolExecutor(max_workers=n_partes) as pool:
+            resultados = pool.map(_quantil_lote, partes, [p] * n_partes, [modelo] * n_partes,
+                                  [bw_adjust] * n_partes)
+            return np.concatenate(list(resultados))
+    return _quantil_lote(amostras, p, modelo, bw_adjust)
+
+
+def intervalo_confianca(replicas, nivel=0.95):
+    """Intervalo percentil (inferior, superior) das réplicas bootstrap."""
+    alfa = (1 - nivel) / 2
+    inf, sup = np.percentile(replicas, [100 * alfa, 100 * (1 - alfa)], axis=0)
+    return inf, sup
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Gerador de dados sintéticos de consumo, para testes de carga e benchmarks.
+#
+# Todo o ruído de um conjunto é sorteado de uma vez (matriz sistemas x meses) e
+# modelado por sazonalidade anual, tendência, autocorrelação AR(1) e caudas
+# pesadas (t de Student). Com os valores padrão o resultado equivale ao gerador
+# original da aba "📊 Gerar Histograma": normal em torno de 300.000 m³ por
+# 50.000 habitantes. Conjuntos grandes e séries de sensores em alta frequência
+# são gravados em blocos, sem manter tudo em memória.
+#
+# Uso:
+#   python gerador.py mensal --sistemas 5000 --anos 2015 2024 --saida sistemas.parquet
+#   python gerador.py sensor --inicio 2020-01-01 --fim 2024-12-31 --freq 1min --saida leituras.csv.gz
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MESES = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+
+def _ruido(rng, forma, autocorrelacao=0.0, graus_liberdade=None, estado=None):
+    """Ruído de variância unitária ao longo do último eixo; devolve (ruído, estado AR final)."""
+    if graus_liberdade:
+        # t de Student reescalada para variância 1 (exige gl > 2)
+        e = rng.standard_t(graus_liberdade, size=forma) * np.sqrt((graus_liberdade - 2) / graus_liberdade)
+    else:
+        e = rng.standard_normal(size=forma)
+    if not autocorrelacao:
+        return e, None
+    from scipy.signal import lfilter
+
+    phi = autocorrelacao
+    e = e * np.sqrt(1 - phi ** 2)
+    if estado is None:
+        # Estado inicial estacionário: primeiro valor com variância 1
+        estado = rng.standard_normal(size=forma[:-1]) * phi
+    y, zf = lfilter([1.0], [1.0, -phi], e, axis=-1, zi=np.asarray(estado)[..., None])
+    return y, zf[..., 0]
+
+
+def gerar_consumo_mensal(ano_inicial=2020, ano_final=2025, populacao=80000, n_sistemas=1,
+                         sazonalidade=0.0, mes_pico=1, tendencia=0.0, autocorrelacao=0.0,
+                         graus_liberdade=None, cv=1 / 6, semente=None):
+    """Matriz (n_sistemas x meses) de consumo mensal (m³), gerada em um único sorteio.
+
+    `populacao` pode ser um escalar ou um array com a população de cada sistema;
+    `sazonalidade` é a amplitude relativa da variação anual (pico em `mes_pico`,
+    1 = Jan), `tendencia` a taxa de crescimento anual e `cv` o coeficiente de
+    variação do ruído (1/6 = 50.000 / 300.000, como no gerador original).
+    """
+    if not -1 < autocorrelacao < 1:
+        raise ValueError("A autocorrelação deve estar entre -1 e 1 (exclusive).")
+    if graus_liberdade is not None and graus_liberdade <= 2:
+        raise ValueError("As caudas pesadas exigem mais de 2 graus de liberdade.")
+    rng = np.random.default_rng(semente)
+    n_meses = (int(ano_final) - int(ano_inicial) + 1) * 12
+    populacao = np.broadcast_to(np.asarray(populacao, dtype=float), (n_sistemas,))
+    media = (300000 * populacao / 50000.0)[:, None]
+    t = np.arange(n_meses)
+    nivel = (1 + sazonalidade * np.cos(2 * np.pi * (t % 12 - (mes_pico - 1)) / 12)) * (1 + tendencia) ** (t / 12)
+    ruido, _ = _ruido(rng, (n_sistemas, n_meses), autocorrelacao, graus_liberdade)
+    return media * nivel[None, :] * (1 + cv * ruido)
+
+
+def rotulos_meses(ano_inicial, ano_final):
+    return [f"{mes}/{ano}" for ano in range(int(ano_inicial), int(ano_final) + 1) for mes in MESES]
+
+
+def tabela_mensal(consumo, ano_inicial, ano_final):
+    """DataFrame no formato do app (`Mês`, `Consumo (m³)`) para uma série de um sistema."""
+    return pd.DataFrame({"Mês": rotulos_meses(ano_inicial, ano_final),
+                         "Consumo (m³)": np.asarray(consumo).astype(int)})
+
+
+class _Escritor:
+    """Grava DataFrames em sequência em um CSV (compactado ou não) ou em um Parquet."""
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self.parquet = self.caminho.suffix.lower() == ".parquet"
+        self._arquivo = None
+
+    def escrever(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            if self._arquivo is None:
+                self._arquivo = pq.ParquetWriter(self.caminho, tabela.schema)
+            self._arquivo.write_table(tabela)
+        else:
+            primeiro = self._arquivo is None
+            if primeiro:
+                compressao = "gzip" if self.caminho.suffix.lower() == ".gz" else None
+                if compressao:
+                    import gzip
+                    self._arquivo = gzip.open(self.caminho, "wt", newline="", encoding="utf-8")
+                else:
+                    self._arquivo = open(self.caminho, "w", newline="", encoding="utf-8")
+            df.to_csv(self._arquivo, index=False, header=primeiro)
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+
+
+def escrever_sistemas(caminho, n_sistemas, ano_inicial=2020, ano_final=2025, populacao=(10000, 500000),
+                      bloco=1000, semente=None, **opcoes):
+    """Grava `n_sistemas` séries mensais em formato longo (`sistema, Mês, Consumo (m³)`).
+
+    `populacao` é um intervalo (mín., máx.) sorteado uniformemente por sistema. Os
+    sistemas são gerados e gravados em blocos de `bloco`.
+    """
+    rng = np.random.default_rng(semente)
+    rotulos = np.array(rotulos_meses(ano_inicial, ano_final))
+    escritor = _Escritor(caminho)
+    try:
+        for ini in range(0, n_sistemas, bloco):
+            n = min(bloco, n_sistemas - ini)
+            pops = rng.uniform(populacao[0], populacao[1], size=n)
+            consumo = gerar_consumo_mensal(ano_inicial, ano_final, pops, n, semente=rng, **opcoes)
+            escritor.escrever(pd.DataFrame({
+                "sistema": np.repeat(np.arange(ini, ini + n), rotulos.size),
+                "Mês": np.tile(rotulos, n),
+                "Consumo (m³)": consumo.ravel().astype(np.int64),
+            }))
+    finally:
+        escritor.fechar()
+
+
+def gerar_leituras_sensor(inicio, fim, freq="1min", vazao_media_ls=100.0, amplitude_diaria=0.4,
+                          sazonalidade=0.1, ruido=0.05, autocorrelacao=0.9, graus_liberdade=None,
+                          bloco=1_000_000, semente=None):
+    """Itera sobre blocos de leituras de vazão (L/s) com perfil diário, sazonal e ruído AR(1).
+
+    Cada bloco é um DataFrame `data_hora, valor` (formato aceito por `ingestao.py`);
+    o estado do ruído é mantido entre blocos, de modo que a série é contínua.
+    """
+    rng = np.random.default_rng(semente)
+    indice = pd.date_range(inicio, fim, freq=freq)
+    estado = None
+    for ini in range(0, len(indice), bloco):
+        tempo = indice[ini:ini + bloco]
+        hora = (tempo.hour + tempo.minute / 60).to_numpy()
+        dia_ano = tempo.dayofyear.to_numpy()
+        # Pico diário por volta das 12h e pico sazonal no verão (janeiro)
+        perfil = (1 - amplitude_diaria * np.cos(2 * np.pi * hora / 24)) \
+            * (1 + sazonalidade * np.cos(2 * np.pi * (dia_ano - 15) / 365.25))
+        e, estado = _ruido(rng, (1, len(tempo)), autocorrelacao, graus_liberdade, estado)
+        vazao = np.clip(vazao_media_ls * perfil * (1 + ruido * e[0]), 0.0, None)
+        yield pd.DataFrame({"data_hora": tempo, "valor": vazao})
+
+
+def escrever_leituras(caminho, inicio, fim, **opcoes):
+    escritor = _Escritor(caminho)
+    try:
+        for bloco in gerar_leituras_sensor(inicio, fim, **opcoes):
+            escritor.escrever(bloco)
+    finally:
+        escritor.fechar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gerador de dados sintéticos de consumo.")
+    sub = parser.add_subparsers(dest="modo", required=True)
+
+    mensal = sub.add_parser("mensal", help="Séries mensais de muitos sistemas (formato longo)")
+    mensal.add_argument("--sistemas", type=int, default=1000)
+    mensal.add_argument("--anos", type=int, nargs=2, default=(2020, 2025), metavar=("INICIAL", "FINAL"))
+    mensal.add_argument("--populacao", type=float, nargs=2, default=(10000, 500000), metavar=("MIN", "MAX"))
+    mensal.add_argument("--sazonalidade", type=float, default=0.0, help="Amplitude relativa anual (ex.: 0.15)")
+    mensal.add_argument("--tendencia", type=float, default=0.0, help="Crescimento anual (ex.: 0.02)")
+    mensal.add_argument("--autocorrelacao", type=float, default=0.0, help="Coeficiente AR(1) mês a mês")
+    mensal.add_argument("--gl", type=float, default=None, help="Graus de liberdade da t (caudas pesadas)")
+    mensal.add_argument("--bloco", type=int, default=1000, help="Sistemas por bloco gravado")
+
+    sensor = sub.add_parser("sensor", help="Leituras de vazão em alta frequência de um sistema")
+    sensor.add_argument("--inicio", default="2020-01-01")
+    sensor.add_argument("--fim", default="2024-12-31 23:59")
+    sensor.add_argument("--freq", default="1min")
+    sensor.add_argument("--vazao-media", type=float, default=100.0, help="Vazão média (L/s)")
+    sensor.add_argument("--autocorrelacao", type=float, default=0.9)
+    sensor.add_argument("--gl", type=float, default=None, help="Graus de liberdade da t (caudas pesadas)")
+    sensor.add_argument("--bloco", type=int, default=1_000_000, help="Leituras por bloco gravado")
+
+    for sp in (mensal, sensor):
+        sp.add_argument("--semente", type=int, default=None)
+        sp.add_argument("--saida", required=True, help="Arquivo de saída (.csv, .csv.gz ou .parquet)")
+    args = parser.parse_args(argv)
+
+    if args.modo == "mensal":
+        escrever_sistemas(args.saida, args.sistemas, args.anos[0], args.anos[1], tuple(args.populacao),
+                          bloco=args.bloco, semente=args.semente, sazonalidade=args.sazonalidade,
+                          tendencia=args.tendencia, autocorrelacao=args.autocorrelacao,
+                          graus_liberdade=args.gl)
+    else:
+        escrever_leituras(args.saida, args.inicio, args.fim, freq=args.freq, vazao_media_ls=args.vazao_media,
+                          autocorrelacao=args.autocorrelacao, graus_liberdade=args.gl, bloco=args.bloco,
+                          semente=args.semente)
+    print(f"Dados sintéticos gravados em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# coding: utf-8
+
+# Figuras do Consumo Referencial (histograma e CDFs).
+#
+# As funções recebem resultados já calculados (KDE, média, desvio) e devolvem a
+# figura; `figura_png` a converte em PNG e libera a memória do Matplotlib.
+#
+# As figuras usam a API orientada a objetos (`matplotlib.figure.Figure`), sem o
+# estado global do pyplot, que não é seguro entre as threads das sessões do
+# Streamlit. `renderizar_png` desenha em um pool limitado de threads, o que
+# também limita quantas figuras existem em memória ao mesmo tempo.
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+from matplotlib.figure import Figure
+from scipy.stats import norm
+
+DPI_PADRAO = 150
+# Renderizações simultâneas no processo (CONSUMO_RENDER_WORKERS)
+RENDER_WORKERS = int(os.environ.get("CONSUMO_RENDER_WORKERS", 2))
+
+
+def figura_distribuicao(consumo, kde, media, desvio_padrao, consumo_ref, rotulo_ref, stat_param="count"):
+    fig1 = Figure(figsize=(10, 5))
+    ax1 = fig1.subplots()
+    ax1.hist(consumo, bins=12, density=stat_param == "density", color="skyblue", edgecolor="black", alpha=0.75)
+    x_vals = np.linspace(min(consumo), max(consumo), 1000)
+    # Se o histograma for em frequência absoluta, escalamos as curvas de densidade
+    if stat_param == "count":
+        bin_width = (max(consumo) - min(consumo)) / 12
+        n = len(consumo)
+        escala = n * bin_width
+    else:
+        escala = 1.0
+    normal_curve = norm.pdf(x_vals, loc=media, scale=desvio_padrao) * escala
+    # Curva KDE restrita ao intervalo dos dados (como no histplot do seaborn)
+    no_intervalo = (kde.grade >= min(consumo)) & (kde.grade <= max(consumo))
+    ax1.plot(kde.grade[no_intervalo], kde.densidade[no_intervalo] * escala, color='skyblue', label='KDE')
+    ax1.plot(x_vals, normal_curve, color='red', linestyle='--', label='Distribuição Normal')
+    ax1.axvline(consumo_ref, color='black', linestyle=':', label=rotulo_ref)
+    ax1.set_xlabel("Consumo mensal (m³)")
+    ax1.set_ylabel("Frequência" if stat_param == "count" else "Densidade estimada")
+    ax1.set_title("Distribuição do Consumo com KDE e Normal")
+    ax1.legend()
+    return fig1
+
+
+def figura_cdf(kde, media, desvio_padrao):
+    cdf_norm = norm.cdf(kde.grade, loc=media, scale=desvio_padrao)
+    fig2 = Figure(figsize=(8, 5))
+    ax2 = fig2.subplots()
+    ax2.plot(kde.grade, kde.cdf_grade, label='CDF da KDE', color='blue')
+    ax2.plot(kde.grade, cdf_norm, label='CDF da Normal', color='red', linestyle='--')
+    ax2.set_title("Funções de Distribuição Acumulada (CDF) KDE vs Distribuição Normal")
+    ax2.set_xlabel("Consumo mensal de água (m³)")
+    ax2.set_ylabel("Probabilidade acumulada")
+    ax2.legend()
+    ax2.grid(True)
+    return fig2
+
+
+def figura_png(fig, dpi=DPI_PADRAO):
+    buffer = BytesIO()
+    try:
+        fig.savefig(buffer, format="png", dpi=dpi)
+    finally:
+        # Sem pyplot não há registro global a fechar: basta desfazer os artistas
+        fig.clear()
+    return buffer.getvalue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _pool_render():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+        return _pool
+
+
+def _construir_png(construir, args, kwargs, dpi):
+    return figura_png(construir(*args, **kwargs), dpi)
+
+
+def renderizar_png(construir, *args, dpi=DPI_PADRAO, **kwargs):
+    """Constrói a figura com `construir(*args, **kwargs)` e devolve o PNG, no pool de renderização."""
+    return _pool_render().submit(_construir_png, construir, args, kwargs, dpi).result()
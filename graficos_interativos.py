@@ -0,0 +1,152 @@
+# coding: utf-8
+
+# Gráficos interativos leves do Consumo Referencial (histograma e CDFs).
+#
+# Em vez de rasterizar uma figura no servidor, calcula apenas séries compactas
+# (contagens por classe, curvas KDE/Normal e CDFs reduzidas a poucas centenas de
+# pontos) e monta especificações Vega-Lite desenhadas no navegador. O tamanho
+# enviado não depende do número de meses: as classes do histograma crescem
+# devagar com n e as curvas são reduzidas por LTTB. O Matplotlib (`graficos.py`)
+# fica reservado às figuras do relatório Word.
+
+import numpy as np
+from scipy.special import ndtr
+
+# Pontos máximos por curva e classes máximas do histograma enviados ao navegador
+MAX_PONTOS = 200
+MAX_CLASSES = 60
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+
+def reduzir_lttb(x, y, max_pontos=MAX_PONTOS):
+    """Reduz uma curva a `max_pontos` preservando a forma (Largest-Triangle-Three-Buckets)."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = x.size
+    if n <= max_pontos or max_pontos < 3:
+        return x, y
+    # Primeiro e último pontos fixos; os demais divididos em (max_pontos - 2) baldes
+    bordas = np.linspace(1, n - 1, max_pontos - 1).astype(int)
+    escolhidos = np.empty(max_pontos, dtype=int)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    a = 0
+    for i in range(max_pontos - 2):
+        ini, fim = bordas[i], bordas[i + 1]
+        prox = slice(bordas[i + 1], bordas[i + 2]) if i + 2 < bordas.size else slice(n - 1, n)
+        cx, cy = x[prox].mean(), y[prox].mean()
+        area = np.abs((x[a] - cx) * (y[ini:fim] - y[a]) - (x[a] - x[ini:fim]) * (cy - y[a]))
+        a = ini + int(np.argmax(area))
+        escolhidos[i + 1] = a
+    return x[escolhidos], y[escolhidos]
+
+
+def numero_classes(n):
+    """12 classes (como na figura original) até ~2.000 meses; depois cresce pela regra de Sturges."""
+    return int(np.clip(np.ceil(np.log2(max(n, 1))) + 1, 12, MAX_CLASSES))
+
+
+def _arredondar(v, digitos=6):
+    """Arredonda a `digitos` significativos em relação ao maior valor (JSON mais curto)."""
+    v = np.asarray(v, dtype=float)
+    maior = np.abs(v).max() if v.size else 0.0
+    if maior == 0 or not np.isfinite(maior):
+        return v
+    return np.round(v, int(digitos - 1 - np.floor(np.log10(maior))))
+
+
+def _registros(**colunas):
+    colunas = {nome: (_arredondar(c) if np.asarray(c).dtype.kind == "f" else c) for nome, c in colunas.items()}
+    nomes = list(colunas)
+    return [dict(zip(nomes, valores)) for valores in zip(*(np.asarray(c).tolist() for c in colunas.values()))]
+
+
+def series_distribuicao(consumo, kde, media, desvio_padrao, stat_param="count", max_pontos=MAX_PONTOS):
+    """Classes do histograma e curvas KDE/Normal (na mesma escala), como listas de registros."""
+    consumo = np.asarray(consumo, dtype=float)
+    contagens, bordas = np.histogram(consumo, bins=numero_classes(consumo.size))
+    largura = bordas[1] - bordas[0]
+    if stat_param == "count":
+        valores = contagens
+        escala = consumo.size * largura
+    else:
+        valores = contagens / (consumo.size * largura)
+        escala = 1.0
+    # Curvas restritas ao intervalo dos dados (como no histplot do seaborn)
+    no_intervalo = (kde.grade >= consumo.min()) & (kde.grade <= consumo.max())
+    grade = kde.grade[no_intervalo]
+    x_kde, y_kde = reduzir_lttb(grade, kde.densidade[no_intervalo] * escala, max_pontos)
+    x_vals = np.linspace(consumo.min(), consumo.max(), max_pontos)
+    z = (x_vals - media) / desvio_padrao
+    y_normal = np.exp(-0.5 * z * z) * _INV_SQRT_2PI / desvio_padrao * escala
+    return {
+        "classes": _registros(inicio=bordas[:-1], fim=bordas[1:], valor=valores),
+        "curvas": (_registros(x=x_kde, y=y_kde, curva=["KDE"] * x_kde.size)
+                   + _registros(x=x_vals, y=y_normal, curva=["Distribuição Normal"] * x_vals.size)),
+    }
+
+
+def series_cdf(kde, media, desvio_padrao, max_pontos=MAX_PONTOS):
+    """CDFs da KDE e da Normal sobre a grade da KDE, reduzidas a `max_pontos` cada."""
+    x_kde, y_kde = reduzir_lttb(kde.grade, kde.cdf_grade, max_pontos)
+    x_vals = np.linspace(kde.grade[0], kde.grade[-1], max_pontos)
+    y_normal = ndtr((x_vals - media) / desvio_padrao)
+    return (_registros(x=x_kde, y=y_kde, curva=["CDF da KDE"] * x_kde.size)
+            + _registros(x=x_vals, y=y_normal, curva=["CDF da Normal"] * x_vals.size))
+
+
+def _camada_curvas(valores, nomes, cores, titulo_x, titulo_y):
+    return {
+        "data": {"values": valores},
+        "mark": {"type": "line"},
+        "encoding": {
+            "x": {"field": "x", "type": "quantitative", "title": titulo_x},
+            "y": {"field": "y", "type": "quantitative", "title": titulo_y},
+            "color": {"field": "curva", "type": "nominal", "title": None,
+                      "scale": {"domain": nomes, "range": cores}},
+            "strokeDash": {"field": "curva", "type": "nominal", "legend": None,
+                           "scale": {"domain": nomes, "range": [[1, 0], [6, 4]]}},
+            "tooltip": [{"field": "curva", "title": "Curva"},
+                        {"field": "x", "title": "Consumo (m³)", "format": ",.0f"},
+                        {"field": "y", "title": titulo_y, "format": ".4g"}],
+        },
+    }
+
+
+def especificacao_distribuicao(series, consumo_ref, rotulo_ref, stat_param="count"):
+    """Especificação Vega-Lite do histograma com as curvas KDE e Normal e o consumo referencial."""
+    titulo_y = "Frequência" if stat_param == "count" else "Densidade estimada"
+    titulo_x = "Consumo mensal (m³)"
+    return {
+        "title": "Distribuição do Consumo com KDE e Normal",
+        "layer": [
+            {
+                "data": {"values": series["classes"]},
+                "mark": {"type": "bar", "color": "skyblue", "stroke": "black", "strokeWidth": 0.5},
+                "encoding": {
+                    "x": {"field": "inicio", "type": "quantitative", "title": titulo_x},
+                    "x2": {"field": "fim"},
+                    "y": {"field": "valor", "type": "quantitative", "title": titulo_y},
+                    "tooltip": [{"field": "inicio", "title": "De", "format": ",.0f"},
+                                {"field": "fim", "title": "Até", "format": ",.0f"},
+                                {"field": "valor", "title": titulo_y, "format": ".4g"}],
+                },
+            },
+            _camada_curvas(series["curvas"], ["KDE", "Distribuição Normal"], ["steelblue", "red"],
+                           titulo_x, titulo_y),
+            {
+                "data": {"values": [{"x": float(consumo_ref), "rotulo": rotulo_ref}]},
+                "mark": {"type": "rule", "color": "black", "strokeDash": [2, 2]},
+                "encoding": {"x": {"field": "x", "type": "quantitative"},
+                             "tooltip": [{"field": "rotulo", "title": "Consumo referencial"}]},
+            },
+        ],
+    }
+
+
+def especificacao_cdf(series):
+    """Especificação Vega-Lite das CDFs da KDE e da Normal."""
+    return {
+        "title": "Funções de Distribuição Acumulada (CDF) KDE vs Distribuição Normal",
+        "layer": [_camada_curvas(series, ["CDF da KDE", "CDF da Normal"], ["blue", "red"],
+                                 "Consumo mensal de água (m³)", "Probabilidade acumulada")],
+    }
@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Estatísticas incrementais do consumo: novos meses (ou leituras agregadas) são
+# acrescentados a um resumo do projeto sem reprocessar a série inteira.
+#
+# O resumo guarda os momentos (média e variância pelo algoritmo de Welford, na
+# forma de combinação de Chan para blocos) e um sketch de quantis do tipo KLL,
+# ambos combináveis e serializáveis em JSON. Com eles o consumo referencial e as
+# vazões são atualizados em O(dados novos): enquanto a série couber no sketch
+# (até `k` valores) o resultado é exatamente o do cálculo completo; acima disso
+# o erro de posto é da ordem de 1/k.
+#
+# Uso:
+#   python incremental.py atualizar resumo.json novos_meses.csv --percentil 95
+#   python incremental.py mesclar total.json fonte_a.json fonte_b.json
+#   python incremental.py calcular resumo.json --modelo KDE --percentil 95 --horas 24
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from calculo import TEMPO_DIA, calcular_vazoes
+
+VERSAO = 1
+
+
+class Momentos:
+    """Contagem, média, soma dos quadrados dos desvios (M2), mínimo e máximo."""
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    def atualizar(self, valores):
+        x = np.asarray(valores, dtype=float).ravel()
+        if x.size == 0:
+            return self
+        bloco = Momentos()
+        bloco.n = int(x.size)
+        bloco.media = float(x.mean())
+        bloco.m2 = float(((x - bloco.media) ** 2).sum())
+        bloco.minimo, bloco.maximo = float(x.min()), float(x.max())
+        return self.combinar(bloco)
+
+    def combinar(self, outro):
+        """Acrescenta os momentos de `outro` (combinação de Chan et al.)."""
+        if outro.n == 0:
+            return self
+        n = self.n + outro.n
+        delta = outro.media - self.media
+        self.media += delta * outro.n / n
+        self.m2 += outro.m2 + delta * delta * self.n * outro.n / n
+        self.n = n
+        self.minimo = min(self.minimo, outro.minimo)
+        self.maximo = max(self.maximo, outro.maximo)
+        return self
+
+    def variancia(self, ddof=0):
+        return self.m2 / (self.n - ddof) if self.n > ddof else float("nan")
+
+    def desvio_padrao(self, ddof=0):
+        return float(np.sqrt(self.variancia(ddof)))
+
+    def para_dict(self):
+        return {"n": self.n, "media": self.media, "m2": self.m2,
+                "minimo": self.minimo if self.n else None, "maximo": self.maximo if self.n else None}
+
+    @classmethod
+    def de_dict(cls, d):
+        m = cls()
+        m.n, m.media, m.m2 = int(d["n"]), float(d["media"]), float(d["m2"])
+        if m.n:
+            m.minimo, m.maximo = float(d["minimo"]), float(d["maximo"])
+        return m
+
+
+def _moeda(*chaves):
+    """Bit pseudoaleatório reprodutível a partir de inteiros (mistura do splitmix64)."""
+    h = 0x9E3779B97F4A7C15
+    for c in chaves:
+        h = ((h ^ int(c)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        h ^= h >> 31
+    return h & 1
+
+
+class SketchQuantis:
+    """Sketch de quantis KLL: níveis de compactadores, o nível `i` com itens de peso 2**i.
+
+    O nível do topo guarda até `k` itens e cada nível abaixo 2/3 do anterior. Um
+    nível cheio é ordenado e metade dos itens (os de posição par ou ímpar, por um
+    sorteio determinístico a partir do estado do sketch) sobe para o nível seguinte
+    com o dobro do peso, de modo que o peso total é sempre igual ao número de
+    valores acrescentados e o mesmo fluxo de dados produz sempre o mesmo sketch.
+    """
+
+    def __init__(self, k=200):
+        if k < 8:
+            raise ValueError("O parâmetro k do sketch deve ser pelo menos 8.")
+        self.k = int(k)
+        self.n = 0
+        self.niveis = [np.empty(0)]
+
+    def _capacidade(self, nivel):
+        altura = len(self.niveis)
+        return max(2, int(np.ceil(self.k * (2 / 3) ** (altura - nivel - 1))))
+
+    def _compactar(self):
+        nivel = 0
+        while nivel < len(self.niveis):
+            itens = self.niveis[nivel]
+            if itens.size > self._capacidade(nivel):
+                if nivel + 1 == len(self.niveis):
+                    self.niveis.append(np.empty(0))
+                itens = np.sort(itens)
+                # Com número ímpar de itens, o maior permanece no nível
+                fica = itens[-1:] if itens.size % 2 else itens[:0]
+                pares = itens[:itens.size - fica.size]
+                sobe = pares[_moeda(self.n, nivel, itens.size)::2]
+                self.niveis[nivel] = fica
+                self.niveis[nivel + 1] = np.concatenate([self.niveis[nivel + 1], sobe])
+            nivel += 1
+
+    def atualizar(self, valores):
+        x = np.asarray(valores, dtype=float).ravel()
+        x = x[np.isfinite(x)]
+        if x.size:
+            self.n += int(x.size)
+            self.niveis[0] = np.concatenate([self.niveis[0], x])
+            self._compactar()
+        return self
+
+    def combinar(self, outro):
+        """Acrescenta os itens de `outro` nível a nível e recompacta."""
+        if outro.k != self.k:
+            raise ValueError("Só é possível combinar sketches com o mesmo parâmetro k.")
+        while len(self.niveis) < len(outro.niveis):
+            self.niveis.append(np.empty(0))
+        for nivel, itens in enumerate(outro.niveis):
+            self.niveis[nivel] = np.concatenate([self.niveis[nivel], itens])
+        self.n += outro.n
+        self._compactar()
+        return self
+
+    def itens(self):
+        """Valores retidos (ordenados) e os respectivos pesos."""
+        valores = np.concatenate(self.niveis)
+        pesos = np.concatenate([np.full(itens.size, 2.0 ** nivel) for nivel, itens in enumerate(self.niveis)])
+        ordem = np.argsort(valores, kind="stable")
+        return valores[ordem], pesos[ordem]
+
+    @property
+    def exato(self):
+        """Verdadeiro enquanto nenhum valor foi compactado (todos com peso 1)."""
+        return len(self.niveis) == 1
+
+    def quantil(self, p):
+        """Quantil(is) `p` (0-1) com interpolação linear, como `np.percentile` no caso exato."""
+        if self.n == 0:
+            raise ValueError("O sketch de quantis está vazio.")
+        valores, pesos = self.itens()
+        # Posição central de cada item na série ordenada (0 a n-1)
+        posicao = np.cumsum(pesos) - (pesos + 1) / 2
+        return np.interp(np.asarray(p, dtype=float) * (self.n - 1), posicao, valores)
+
+    def para_dict(self):
+        return {"k": self.k, "n": self.n, "niveis": [itens.tolist() for itens in self.niveis]}
+
+    @classmethod
+    def de_dict(cls, d):
+        s = cls(d["k"])
+        s.n = int(d["n"])
+        s.niveis = [np.asarray(itens, dtype=float) for itens in d["niveis"]]
+        return s
+
+
+class ResumoConsumo:
+    """Resumo incremental da série de consumo de um projeto (momentos + sketch + meses)."""
+
+    def __init__(self, k=200):
+        self.momentos = Momentos()
+        self.sketch = SketchQuantis(k)
+        self.meses = []
+
+    @property
+    def n(self):
+        return self.momentos.n
+
+    def adicionar(self, consumo, meses=None):
+        """Acrescenta novos valores mensais; meses já presentes no resumo são recusados."""
+        consumo = np.asarray(consumo, dtype=float).ravel()
+        if not np.all(np.isfinite(consumo)):
+            raise ValueError("Os novos valores de consumo devem ser numéricos.")
+        if meses is not None:
+            meses = [str(m) for m in meses]
+            if len(meses) != consumo.size:
+                raise ValueError("Informe um rótulo de mês para cada valor de consumo.")
+            repetidos = sorted(set(meses) & set(self.meses))
+            if repetidos:
+                raise ValueError(f"Meses já incluídos no resumo: {', '.join(repetidos)}")
+            self.meses.extend(meses)
+        self.momentos.atualizar(consumo)
+        self.sketch.atualizar(consumo)
+        return self
+
+    def combinar(self, outro):
+        """Junta o resumo de outra fonte (os meses são concatenados)."""
+        self.momentos.combinar(outro.momentos)
+        self.sketch.combinar(outro.sketch)
+        self.meses.extend(outro.meses)
+        return self
+
+    @classmethod
+    def da_serie(cls, consumo, meses=None, k=200):
+        return cls(k).adicionar(consumo, meses)
+
+    def estatisticas_basicas(self):
+        return {"media": self.momentos.media, "desvio_padrao": self.momentos.desvio_padrao()}
+
+    def kde(self, bw_adjust=1.0):
+        """KDE ponderada sobre os itens do sketch, com a largura de banda da série completa."""
+        from estatistica import KDE
+
+        if self.n < 2 or not self.momentos.desvio_padrao(ddof=1) > 0:
+            raise ValueError("A KDE precisa de pelo menos dois valores de consumo não constantes.")
+        valores, pesos = self.sketch.itens()
+        h = self.momentos.desvio_padrao(ddof=1) * self.n ** (-1 / 5) * bw_adjust
+        return KDE(valores, pesos=pesos, h=h)
+
+    def consumo_referencial(self, modelo, percentil, bw_adjust=1.0):
+        if modelo == "KDE":
+            return self.kde(bw_adjust).quantil(percentil / 100)
+        return float(self.sketch.quantil(percentil / 100))
+
+    def calcular(self, modelo="KDE", percentil=95, dias_mes=30, horas_operacao=24, k1=1.4, k2=2.0,
+                 tempo_dia=TEMPO_DIA):
+        """Consumo referencial, vazões e estatísticas básicas a partir do resumo."""
+        consumo_ref = self.consumo_referencial(modelo, percentil)
+        resultado = {"n_meses": self.n, "consumo_ref": consumo_ref}
+        resultado.update(calcular_vazoes(consumo_ref, dias_mes, horas_operacao, k1, k2, tempo_dia))
+        resultado.update(self.estatisticas_basicas())
+        return resultado
+
+    def para_dict(self):
+        return {"versao": VERSAO, "momentos": self.momentos.para_dict(), "sketch": self.sketch.para_dict(),
+                "meses": list(self.meses)}
+
+    @classmethod
+    def de_dict(cls, d):
+        if d.get("versao") != VERSAO:
+            raise ValueError(f"Versão de resumo não suportada: {d.get('versao')}")
+        r = cls(d["sketch"]["k"])
+        r.momentos = Momentos.de_dict(d["momentos"])
+        r.sketch = SketchQuantis.de_dict(d["sketch"])
+        r.meses = list(d["meses"])
+        return r
+
+    def para_json(self):
+        return json.dumps(self.para_dict(), ensure_ascii=False)
+
+    @classmethod
+    def de_json(cls, texto):
+        return cls.de_dict(json.loads(texto))
+
+
+def carregar_resumo(caminho, k=200):
+    """Lê um resumo em JSON; um arquivo inexistente corresponde a um resumo vazio."""
+    caminho = Path(caminho)
+    if not caminho.exists():
+        return ResumoConsumo(k)
+    return ResumoConsumo.de_json(caminho.read_text(encoding="utf-8"))
+
+
+def salvar_resumo(resumo, caminho):
+    Path(caminho).write_text(resumo.para_json(), encoding="utf-8")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumo incremental do consumo mensal.")
+    sub = parser.add_subparsers(dest="modo", required=True)
+
+    atualizar = sub.add_parser("atualizar", help="Acrescenta os meses de um CSV ao resumo (cria se não existir)")
+    atualizar.add_argument("resumo", help="Arquivo JSON do resumo")
+    atualizar.add_argument("csv", help="CSV com os novos meses (colunas: Mês, Consumo (m³))")
+    atualizar.add_argument("--k", type=int, default=200, help="Tamanho do sketch de quantis (novo resumo)")
+
+    mesclar = sub.add_parser("mesclar", help="Combina resumos de várias fontes")
+    mesclar.add_argument("saida", help="Arquivo JSON do resumo combinado")
+    mesclar.add_argument("resumos", nargs="+", help="Resumos JSON a combinar")
+
+    calcular = sub.add_parser("calcular", help="Calcula o consumo referencial e as vazões de um resumo")
+    calcular.add_argument("resumo", help="Arquivo JSON do resumo")
+
+    for sp in (atualizar, mesclar, calcular):
+        sp.add_argument("--modelo", choices=["KDE", "Distribuição Normal"], default="KDE")
+        sp.add_argument("--percentil", type=int, default=95)
+        sp.add_argument("--dias-mes", type=int, default=30)
+        sp.add_argument("--horas", type=int, default=24, help="Horas diárias de operação (1 a 24)")
+        sp.add_argument("--k1", type=float, default=1.4)
+        sp.add_argument("--k2", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    if args.modo == "atualizar":
+        from calculo import ler_consumo_csv
+
+        resumo = carregar_resumo(args.resumo, args.k)
+        try:
+            df = ler_consumo_csv(args.csv)
+            resumo.adicionar(df["Consumo (m³)"].to_numpy(dtype=float), df["Mês"])
+        except ValueError as e:
+            print(f"Erro: {e}", file=sys.stderr)
+            return 1
+        salvar_resumo(resumo, args.resumo)
+    elif args.modo == "mesclar":
+        resumo = carregar_resumo(args.resumos[0])
+        for caminho in args.resumos[1:]:
+            resumo.combinar(carregar_resumo(caminho))
+        salvar_resumo(resumo, args.saida)
+    else:
+        resumo = carregar_resumo(args.resumo)
+    if resumo.n == 0:
+        print("Resumo vazio.")
+        return 1
+
+    resultado = resumo.calcular(args.modelo, args.percentil, args.dias_mes, args.horas, args.k1, args.k2)
+    for nome, valor in resultado.items():
+        print(f"{nome:<14} {valor:,.2f}" if isinstance(valor, float) else f"{nome:<14} {valor}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Ingestão de leituras brutas de macromedição (sensores de vazão) com agregação mensal.
+#
+# As leituras são lidas em blocos (CSV, CSV compactado ou Parquet) e acumuladas hora a
+# hora, de modo que a memória depende do tamanho do bloco e da extensão do histórico,
+# não do número de leituras. O resultado é a série mensal `Mês, Consumo (m³)` usada pelo
+# cálculo, acompanhada da contabilidade de lacunas e outliers.
+#
+# Uso:
+#   python ingestao.py leituras.csv.gz --tempo data_hora --valor vazao_ls --saida mensal.csv
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MESES = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+# Tipos de leitura aceitos e como cada par de leituras consecutivas vira volume (m³)
+TIPOS_LEITURA = {
+    "vazao_ls": "Vazão instantânea (L/s)",
+    "vazao_m3h": "Vazão instantânea (m³/h)",
+    "volume_m3": "Volume no intervalo (m³)",
+    "totalizador_m3": "Totalizador acumulado (m³)",
+}
+
+
+def _formato(fonte, formato=None):
+    if formato:
+        return formato
+    nome = str(getattr(fonte, "name", fonte)).lower()
+    return "parquet" if nome.endswith((".parquet", ".pq")) else "csv"
+
+
+def ler_em_blocos(fonte, coluna_tempo, coluna_valor, tamanho_bloco=500_000, formato=None):
+    """Itera sobre a fonte em DataFrames de até `tamanho_bloco` linhas (colunas tempo e valor)."""
+    if _formato(fonte, formato) == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("A leitura de arquivos Parquet requer o pacote 'pyarrow'.") from e
+        arquivo = pq.ParquetFile(fonte)
+        for lote in arquivo.iter_batches(batch_size=tamanho_bloco, columns=[coluna_tempo, coluna_valor]):
+            yield lote.to_pandas()
+    else:
+        nome = str(getattr(fonte, "name", fonte)).lower()
+        compressao = "gzip" if nome.endswith(".gz") else "infer"
+        yield from pd.read_csv(fonte, usecols=[coluna_tempo, coluna_valor], chunksize=tamanho_bloco,
+                               compression=compressao)
+
+
+class AgregadorLeituras:
+    """Acumula leituras em ordem cronológica, hora a hora, e produz as séries agregadas.
+
+    Cada par de leituras consecutivas define um intervalo atribuído à hora do seu
+    início. Intervalos maiores que `lacuna_max_min` contam como lacuna (sem volume);
+    volumes negativos, não numéricos ou com vazão acima de `vazao_max_ls` contam
+    como outliers e também são descartados. A memória ocupada é proporcional ao
+    número de horas do histórico, não ao número de leituras.
+    """
+
+    def __init__(self, tipo="vazao_ls", lacuna_max_min=60.0, vazao_max_ls=None):
+        if tipo not in TIPOS_LEITURA:
+            raise ValueError(f"Tipo de leitura desconhecido: {tipo}")
+        self.tipo = tipo
+        self.lacuna_max_s = lacuna_max_min * 60.0
+        self.vazao_max_ls = vazao_max_ls
+        self._ultima = None  # (tempo em ns, valor) da última leitura do bloco anterior
+        self._parciais = []  # acumulados por hora de cada bloco
+        self.leituras = 0
+        self.descartadas = 0
+
+    def adicionar(self, bloco, coluna_tempo, coluna_valor):
+        tempo = pd.to_datetime(bloco[coluna_tempo], errors="coerce")
+        valor = pd.to_numeric(bloco[coluna_valor], errors="coerce").to_numpy(dtype=float)
+        validas = tempo.notna().to_numpy()
+        self.leituras += len(bloco)
+        self.descartadas += int((~validas).sum())
+        t = tempo.to_numpy()[validas].astype("datetime64[ns]").astype(np.int64)
+        v = valor[validas]
+        ordem = np.argsort(t, kind="stable")
+        t, v = t[ordem], v[ordem]
+        if self._ultima is not None:
+            # Leituras anteriores à última já processada (fora de ordem entre blocos) são descartadas
+            atrasadas = t <= self._ultima[0]
+            self.descartadas += int(atrasadas.sum())
+            t = np.concatenate(([self._ultima[0]], t[~atrasadas]))
+            v = np.concatenate(([self._ultima[1]], v[~atrasadas]))
+        if t.size == 0:
+            return
+        self._ultima = (t[-1], v[-1])
+        if t.size < 2:
+            return
+
+        inicio = t[:-1]
+        dt = np.diff(t) / 1e9
+        if self.tipo == "vazao_ls":
+            volume = v[:-1] * dt / 1000.0
+        elif self.tipo == "vazao_m3h":
+            volume = v[:-1] * dt / 3600.0
+        elif self.tipo == "volume_m3":
+            volume = v[1:]
+        else:
+            volume = np.diff(v)
+
+        lacuna = dt > self.lacuna_max_s
+        with np.errstate(divide="ignore", invalid="ignore"):
+            outlier = ~np.isfinite(volume) | (volume < 0)
+            if self.vazao_max_ls is not None:
+                outlier |= volume / dt * 1000.0 > self.vazao_max_ls
+        outlier &= ~lacuna
+        ok = ~lacuna & ~outlier
+
+        hora = inicio.astype("datetime64[ns]").astype("datetime64[h]").astype(np.int64)
+        codigos, idx = np.unique(hora, return_inverse=True)
+        n = codigos.size
+        self._parciais.append(pd.DataFrame({
+            "volume": np.bincount(idx, weights=np.where(ok, volume, 0.0), minlength=n),
+            "segundos": np.bincount(idx, weights=np.where(ok, dt, 0.0), minlength=n),
+            "leituras": np.bincount(idx, minlength=n),
+            "lacunas": np.bincount(idx, weights=lacuna, minlength=n).astype(int),
+            "segundos_lacuna": np.bincount(idx, weights=np.where(lacuna, dt, 0.0), minlength=n),
+            "outliers": np.bincount(idx, weights=outlier, minlength=n).astype(int),
+        }, index=pd.Index(codigos, name="hora")))
+        # Consolida periodicamente para manter a memória proporcional ao número de horas
+        if len(self._parciais) >= 32:
+            self._parciais = [self._consolidar()]
+
+    def _consolidar(self):
+        if not self._parciais:
+            return pd.DataFrame(columns=["volume", "segundos", "leituras", "lacunas",
+                                         "segundos_lacuna", "outliers"])
+        return pd.concat(self._parciais).groupby(level=0).sum()
+
+    def horario(self):
+        """Volumes por hora (m³), indexados por data/hora, com a cobertura de cada hora (0-1)."""
+        df = self._consolidar()
+        df.index = pd.DatetimeIndex(np.asarray(df.index, dtype=np.int64).astype("datetime64[h]"), name="hora")
+        df["cobertura"] = df["segundos"] / 3600.0
+        return df
+
+    def resultado(self, corrigir_lacunas=False):
+        """Série mensal; com `corrigir_lacunas` o volume é extrapolado pela cobertura do mês."""
+        horario = self.horario()
+        colunas = ["Mês", "Consumo (m³)", "Leituras", "Lacunas", "Horas sem dados", "Outliers", "Cobertura (%)"]
+        if horario.empty:
+            return pd.DataFrame(columns=colunas)
+        mensal = horario.drop(columns="cobertura").groupby(horario.index.to_period("M")).sum()
+        cobertura = mensal["segundos"] / (mensal.index.days_in_month * 86400.0)
+        consumo = mensal["volume"]
+        if corrigir_lacunas:
+            consumo = consumo.where(cobertura <= 0, consumo / cobertura)
+        return pd.DataFrame({
+            "Mês": [f"{MESES[p.month - 1]}/{p.year}" for p in mensal.index],
+            "Consumo (m³)": consumo.to_numpy(),
+            "Leituras": mensal["leituras"].to_numpy(),
+            "Lacunas": mensal["lacunas"].to_numpy(),
+            "Horas sem dados": mensal["segundos_lacuna"].to_numpy() / 3600.0,
+            "Outliers": mensal["outliers"].to_numpy(),
+            "Cobertura (%)": 100.0 * cobertura.to_numpy(),
+        }, columns=colunas)
+
+
+def agregar_leituras(fonte, coluna_tempo, coluna_valor, tipo="vazao_ls", lacuna_max_min=60.0,
+                     vazao_max_ls=None, tamanho_bloco=500_000, formato=None):
+    """Lê toda a fonte em blocos e devolve o `AgregadorLeituras` preenchido."""
+    agregador = AgregadorLeituras(tipo, lacuna_max_min, vazao_max_ls)
+    for bloco in ler_em_blocos(fonte, coluna_tempo, coluna_valor, tamanho_bloco, formato):
+        agregador.adicionar(bloco, coluna_tempo, coluna_valor)
+    return agregador
+
+
+def agregar_mensal(fonte, coluna_tempo, coluna_valor, tipo="vazao_ls", lacuna_max_min=60.0,
+                   vazao_max_ls=None, corrigir_lacunas=False, tamanho_bloco=500_000, formato=None):
+    agregador = agregar_leituras(fonte, coluna_tempo, coluna_valor, tipo, lacuna_max_min,
+                                 vazao_max_ls, tamanho_bloco, formato)
+    return agregador.resultado(corrigir_lacunas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agrega leituras de sensores de vazão em consumo mensal.")
+    parser.add_argument("arquivo", help="Leituras brutas (.csv, .csv.gz ou .parquet)")
+    parser.add_argument("--tempo", default="data_hora", help="Coluna de data/hora")
+    parser.add_argument("--valor", default="valor", help="Coluna da leitura")
+    parser.add_argument("--tipo", choices=sorted(TIPOS_LEITURA), default="vazao_ls")
+    parser.add_argument("--lacuna-max", type=float, default=60.0, help="Intervalo máximo sem lacuna (min)")
+    parser.add_argument("--vazao-max", type=float, default=None, help="Vazão máxima plausível (L/s)")
+    parser.add_argument("--corrigir-lacunas", action="store_true", help="Extrapola o volume pela cobertura")
+    parser.add_argument("--bloco", type=int, default=500_000, help="Linhas por bloco de leitura")
+    parser.add_argument("--saida", default=None, help="CSV mensal de saída (padrão: <arquivo>_mensal.csv)")
+    args = parser.parse_args(argv)
+
+    df = agregar_mensal(args.arquivo, args.tempo, args.valor, args.tipo, args.lacuna_max,
+                        args.vazao_max, args.corrigir_lacunas, args.bloco)
+    saida = args.saida or str(Path(args.arquivo).name).split(".")[0] + "_mensal.csv"
+    df.to_csv(saida, index=False)
+    print(f"{len(df)} meses agregados -> {saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+# coding: utf-8
+
+# Instrumentação do app: tempo de cada etapa por execução do script, por sessão e
+# agregado no processo, exportável em JSON lines e no formato texto do Prometheus.
+#
+# O módulo não depende do Streamlit. O app cria um `Cronometro` por execução, mede
+# as etapas com `with cronometro.etapa("nome"):` e, ao final, registra a execução
+# em `METRICAS` (agregado do processo) e no histórico da sessão.
+#
+# Exportação:
+#   - CONSUMO_METRICAS_JSONL=/caminho/metricas.jsonl  grava uma linha por etapa medida;
+#   - CONSUMO_METRICAS_PORTA=9108  expõe /metrics (Prometheus) em um servidor HTTP local
+#     (127.0.0.1); CONSUMO_METRICAS_HOST=0.0.0.0 o abre às demais interfaces de rede,
+#     para a coleta a partir de outra máquina.
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites dos buckets do histograma de duração (segundos)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Cronometro:
+    """Mede as etapas de uma execução do script."""
+
+    def __init__(self):
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        self.etapas = []  # (nome, segundos)
+
+    @contextmanager
+    def etapa(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas.append((nome, time.perf_counter() - inicio))
+
+    def registrar(self, nome, segundos):
+        self.etapas.append((nome, segundos))
+
+    def total(self):
+        return time.perf_counter() - self._t0
+
+
+class AgregadorMetricas:
+    """Contagem, soma e histograma das durações por etapa, para todo o processo."""
+
+    def __init__(self, arquivo_jsonl=None):
+        self._lock = threading.Lock()
+        self._contagem = defaultdict(int)
+        self._soma = defaultdict(float)
+        self._buckets = defaultdict(lambda: [0] * len(BUCKETS))
+        self.arquivo_jsonl = arquivo_jsonl
+
+    def _acumular(self, nome, segundos):
+        self._contagem[nome] += 1
+        self._soma[nome] += segundos
+        for i, limite in enumerate(BUCKETS):
+            if segundos <= limite:
+                self._buckets[nome][i] += 1
+
+    def _gravar(self, linhas):
+        if self.arquivo_jsonl:
+            with open(self.arquivo_jsonl, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(linha, ensure_ascii=False) + "\n" for linha in linhas)
+
+    def registrar(self, sessao, cronometro, execucao):
+        """Registra todas as etapas de uma execução; devolve as linhas (dicts) gravadas."""
+        linhas = []
+        etapas = list(cronometro.etapas) + [("execucao_total", cronometro.total())]
+        with self._lock:
+            for nome, segundos in etapas:
+                self._acumular(nome, segundos)
+                linhas.append({"ts": cronometro.inicio, "sessao": sessao, "execucao": execucao,
+                               "etapa": nome, "segundos": round(segundos, 6)})
+            self._gravar(linhas)
+        return linhas
+
+    def registrar_etapa(self, nome, segundos, sessao=None):
+        """Registra uma etapa medida fora da execução do script (ex.: trabalhos em segundo plano)."""
+        linha = {"ts": time.time(), "sessao": sessao, "execucao": None, "etapa": nome,
+                 "segundos": round(segundos, 6)}
+        with self._lock:
+            self._acumular(nome, segundos)
+            self._gravar([linha])
+        return linha
+
+    def prometheus(self):
+        """Texto no formato de exposição do Prometheus (histograma por etapa)."""
+        saida = [
+            "# HELP consumo_etapa_segundos Duração das etapas do app Consumo Referencial.",
+            "# TYPE consumo_etapa_segundos histogram",
+        ]
+        with self._lock:
+            for nome in sorted(self._contagem):
+                for limite, n in zip(BUCKETS, self._buckets[nome]):
+                    saida.append(f'consumo_etapa_segundos_bucket{{etapa="{nome}",le="{limite}"}} {n}')
+                saida.append(f'consumo_etapa_segundos_bucket{{etapa="{nome}",le="+Inf"}} {self._contagem[nome]}')
+                saida.append(f'consumo_etapa_segundos_sum{{etapa="{nome}"}} {self._soma[nome]:.6f}')
+                saida.append(f'consumo_etapa_segundos_count{{etapa="{nome}"}} {self._contagem[nome]}')
+        return "\n".join(saida) + "\n"
+
+
+class HistoricoSessao:
+    """Últimas execuções de uma sessão (lista de etapas por execução)."""
+
+    def __init__(self, max_execucoes=200):
+        self.execucoes = deque(maxlen=max_execucoes)
+        self.contador = 0
+
+    def adicionar(self, linhas):
+        self.contador += 1
+        self.execucoes.append(linhas)
+
+    def jsonl(self):
+        return "".join(json.dumps(linha, ensure_ascii=False) + "\n"
+                       for linhas in self.execucoes for linha in linhas)
+
+    def resumo(self):
+        """Por etapa: número de medições, média e máximo (segundos) nesta sessão."""
+        acumulado = defaultdict(list)
+        for linhas in self.execucoes:
+            for linha in linhas:
+                acumulado[linha["etapa"]].append(linha["segundos"])
+        return {nome: {"n": len(v), "media": sum(v) / len(v), "max": max(v)}
+                for nome, v in acumulado.items()}
+
+
+METRICAS = AgregadorMetricas(os.environ.get("CONSUMO_METRICAS_JSONL"))
+
+
+def iniciar_servidor_metricas(porta, agregador=METRICAS, host="127.0.0.1"):
+    """Serve `/metrics` (Prometheus) em uma thread daemon; devolve o servidor.
+
+    Por padrão escuta apenas na interface local; informe `host` (ex.: "0.0.0.0")
+    para aceitar a coleta de outras máquinas.
+    """
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            corpo = agregador.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, int(porta)), _Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
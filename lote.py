@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Processamento em lote: aplica o cálculo da aba "🧮 Cálculo" a todos os CSVs de
+# consumo mensal de um diretório, em paralelo, e grava uma tabela consolidada.
+#
+# Uso:
+#   python lote.py dados/ --saida resultados.csv --workers 8 --percentil 95
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from calculo import TEMPO_DIA, ler_consumo_csv, calcular_projeto
+
+
+def processar_arquivo(caminho, parametros, dir_relatorios=None):
+    """Calcula um arquivo; devolve (resultado, erro) — exatamente um deles é None.
+
+    Com `dir_relatorios`, grava também o relatório Word do projeto nesse diretório.
+    """
+    try:
+        df = ler_consumo_csv(caminho)
+        consumo = pd.to_numeric(df['Consumo (m³)'], errors="raise").to_numpy(dtype=float)
+        kde = None
+        if dir_relatorios is not None:
+            from estatistica import ajustar_kde
+
+            # A mesma KDE serve ao cálculo e às figuras do relatório
+            kde = ajustar_kde(consumo, bw_adjust=1)
+        calculado = calcular_projeto(consumo, kde=kde, **parametros)
+        resultado = {"arquivo": str(caminho)}
+        resultado.update(calculado)
+        if dir_relatorios is not None:
+            from relatorio import relatorio_projeto
+
+            dados_projeto = {"nome_projeto": Path(caminho).stem, "tecnico_operador": "",
+                             "tipo_medicao": "Micromedição - Hidrômetros"}
+            destino = Path(dir_relatorios) / f"{Path(caminho).stem}.docx"
+            destino.write_bytes(relatorio_projeto(consumo, parametros, dados_projeto, resultado=calculado, kde=kde))
+            resultado["relatorio"] = str(destino)
+        return resultado, None
+    except Exception as e:
+        return None, {"arquivo": str(caminho), "erro": type(e).__name__, "mensagem": str(e)}
+
+
+def salvar_tabela(df, caminho):
+    caminho = Path(caminho)
+    if caminho.suffix.lower() == ".parquet":
+        df.to_parquet(caminho, index=False)  # requer pyarrow ou fastparquet
+    else:
+        df.to_csv(caminho, index=False)
+
+
+def processar_diretorio(diretorio, parametros, padrao="*.csv", workers=None, progresso=None,
+                        dir_relatorios=None):
+    """Processa todos os arquivos de `diretorio`; devolve (resultados, erros) como DataFrames."""
+    arquivos = sorted(Path(diretorio).glob(padrao))
+    if dir_relatorios is not None:
+        Path(dir_relatorios).mkdir(parents=True, exist_ok=True)
+    resultados, erros = [], []
+    if not arquivos:
+        return pd.DataFrame(resultados), pd.DataFrame(erros)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = [pool.submit(processar_arquivo, caminho, parametros, dir_relatorios) for caminho in arquivos]
+        for feitos, futuro in enumerate(as_completed(futuros), start=1):
+            resultado, erro = futuro.result()
+            if resultado is not None:
+                resultados.append(resultado)
+            else:
+                erros.append(erro)
+            if progresso is not None:
+                progresso(feitos, len(arquivos), len(erros))
+    colunas_erro = ["arquivo", "erro", "mensagem"]
+    df_resultados = pd.DataFrame(resultados)
+    if not df_resultados.empty:
+        df_resultados = df_resultados.sort_values("arquivo", ignore_index=True)
+    return df_resultados, pd.DataFrame(erros, columns=colunas_erro)
+
+
+def _progresso_stderr(feitos, total, n_erros):
+    sys.stderr.write(f"\r{feitos}/{total} arquivos processados ({n_erros} com erro)")
+    if feitos == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cálculo do Consumo Referencial em lote.")
+    parser.add_argument("diretorio", help="Diretório com os CSVs (colunas: Mês, Consumo (m³))")
+    parser.add_argument("--padrao", default="*.csv", help="Padrão glob dos arquivos (padrão: *.csv)")
+    parser.add_argument("--saida", default="resultados_consumo.csv", help="Tabela consolidada (.csv ou .parquet)")
+    parser.add_argument("--erros", default=None, help="CSV com os erros por arquivo (padrão: <saida>_erros.csv)")
+    parser.add_argument("--workers", type=int, default=None, help="Número de processos (padrão: nº de CPUs)")
+    parser.add_argument("--modelo", choices=["KDE", "Distribuição Normal"], default="KDE")
+    parser.add_argument("--percentil", type=int, default=95)
+    parser.add_argument("--dias-mes", type=int, default=30)
+    parser.add_argument("--horas", type=int, default=24, help="Horas diárias de operação (1 a 24)")
+    parser.add_argument("--k1", type=float, default=1.4)
+    parser.add_argument("--k2", type=float, default=2.0)
+    parser.add_argument("--relatorios", default=None, help="Diretório onde gravar um relatório Word por arquivo")
+    parser.add_argument("--silencioso", action="store_true", help="Não exibe o progresso")
+    args = parser.parse_args(argv)
+
+    if not 50 <= args.percentil <= 99:
+        parser.error("--percentil deve estar entre 50 e 99.")
+    if not 1 <= args.horas <= 24:
+        parser.error("--horas deve estar entre 1 e 24.")
+
+    parametros = {
+        "modelo": args.modelo,
+        "percentil": args.percentil,
+        "dias_mes": args.dias_mes,
+        "horas_operacao": args.horas,
+        "k1": args.k1,
+        "k2": args.k2,
+        "tempo_dia": TEMPO_DIA,
+    }
+    inicio = time.perf_counter()
+    df_resultados, df_erros = processar_diretorio(
+        args.diretorio, parametros, args.padrao, args.workers,
+        None if args.silencioso else _progresso_stderr, args.relatorios,
+    )
+    salvar_tabela(df_resultados, args.saida)
+    caminho_erros = args.erros or str(Path(args.saida).with_suffix("")) + "_erros.csv"
+    df_erros.to_csv(caminho_erros, index=False)
+    print(f"{len(df_resultados)} arquivos calculados, {len(df_erros)} com erro, "
+          f"em {time.perf_counter() - inicio:.1f} s -> {args.saida}")
+    return 1 if df_erros.shape[0] and df_resultados.empty else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Mede o custo de importação (partida a frio) de cada perfil de uso do app.
+#
+# Cada perfil é importado em um interpretador novo com `python -X importtime`, o
+# que reproduz o que um contêiner recém-criado paga antes da primeira renderização.
+#
+# Uso:
+#   python medir_inicializacao.py                 # tabela por perfil
+#   python medir_inicializacao.py --json          # saída estruturada
+#   python medir_inicializacao.py --limite 2.5    # falha se algum perfil passar de 2,5 s
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+DIRETORIO = Path(__file__).resolve().parent
+
+# Módulos carregados por cada aba/etapa do app (ver os imports locais em app.py)
+PERFIS = {
+    "Abas informativas (Sobre)": ["streamlit"],
+    "Cálculo (antes do upload)": ["streamlit", "numpy", "pandas", "calculo", "projetos"],
+    "Cálculo (resultados e gráficos)": ["streamlit", "numpy", "pandas", "calculo", "projetos", "estatistica",
+                                        "scipy.stats", "graficos_interativos"],
+    "Gráficos como imagens (Matplotlib)": ["streamlit", "numpy", "pandas", "calculo", "estatistica",
+                                           "scipy.stats", "graficos"],
+    "Relatório Word": ["streamlit", "numpy", "pandas", "calculo", "relatorio", "docx"],
+    "Importação completa (referência)": ["streamlit", "numpy", "pandas", "calculo", "estatistica",
+                                         "scipy.stats", "graficos", "graficos_interativos", "relatorio",
+                                         "docx", "ingestao", "coeficientes", "incremental", "setores",
+                                         "projetos"],
+}
+
+
+def medir_perfil(modulos, top=5):
+    """Importa `modulos` em um processo novo; devolve o tempo total (s) e os maiores custos."""
+    codigo = "; ".join(f"import {m}" for m in modulos)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=DIRETORIO,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    total_us = 0
+    raizes = []
+    for linha in proc.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, cumulativo, nome = (parte.strip() for parte in linha[len("import time:"):].split("|"))
+        total_us += int(proprio)
+        # Pacotes de primeiro nível aparecem sem recuo no nome
+        if not nome.startswith(" ") and "." not in nome:
+            raizes.append((nome, int(cumulativo)))
+    raizes.sort(key=lambda item: item[1], reverse=True)
+    return {
+        "segundos": total_us / 1e6,
+        "maiores": [{"modulo": nome, "segundos": us / 1e6} for nome, us in raizes[:top]],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Custo de importação por perfil de uso do app.")
+    parser.add_argument("--json", action="store_true", help="Imprime o resultado em JSON")
+    parser.add_argument("--limite", type=float, default=None, help="Tempo máximo aceito por perfil (s)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Medições por perfil (usa a mediana)")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for perfil, modulos in PERFIS.items():
+        medidas = sorted((medir_perfil(modulos) for _ in range(args.repeticoes)), key=lambda m: m["segundos"])
+        resultados[perfil] = medidas[len(medidas) // 2]
+
+    if args.json:
+        print(json.dumps(resultados, ensure_ascii=False, indent=2))
+    else:
+        for perfil, medida in resultados.items():
+            maiores = ", ".join(f"{m['modulo']} {m['segundos']:.2f}s" for m in medida["maiores"])
+            print(f"{perfil:<36} {medida['segundos']:6.2f} s   ({maiores})")
+
+    if args.limite is not None:
+        excedidos = [p for p, m in resultados.items()
+                     if m["segundos"] > args.limite and p != "Importação completa (referência)"]
+        if excedidos:
+            print(f"Perfis acima de {args.limite:.2f} s: {', '.join(excedidos)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
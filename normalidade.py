@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Testes de normalidade com parâmetros estimados da própria amostra (Lilliefors).
+#
+# O KS "clássico" com média e desvio calculados dos mesmos dados produz p-valores
+# otimistas. Aqui as estatísticas de Kolmogorov-Smirnov e de Anderson-Darling são
+# comparadas com a distribuição nula simulada por Monte Carlo para o mesmo n
+# (amostras normais padronizadas pelos próprios momentos, em lotes vetorizados).
+#
+# As distribuições nulas dependem só de n: ficam em memória e em disco (um .npz
+# por n em `CONSUMO_NULAS_DIR`, padrão `tabelas_normalidade/`), de modo que um
+# n já visto custa apenas uma busca. As tabelas de uma faixa de n podem ser
+# pré-calculadas usando todos os núcleos:
+#
+#   python normalidade.py --faixa 12 240 --replicas 100000
+#   python normalidade.py --valores 300 360 480 600 --workers 8
+
+import argparse
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from scipy.special import log_ndtr, ndtr
+
+DIRETORIO_PADRAO = Path(os.environ.get("CONSUMO_NULAS_DIR", Path(__file__).resolve().parent / "tabelas_normalidade"))
+REPLICAS_PADRAO = 20_000
+SEMENTE_PADRAO = 20240501
+# Número máximo de elementos (réplicas x n) simulados por lote
+_BLOCO_MAX = 4_000_000
+
+
+class DistribuicaoNula(NamedTuple):
+    n: int
+    ks: np.ndarray  # estatísticas D simuladas, ordenadas
+    ad: np.ndarray  # estatísticas A² simuladas, ordenadas
+
+
+def estatisticas(amostras):
+    """Estatísticas D (KS) e A² (Anderson-Darling) de cada linha, com média e desvio (ddof=1) da linha."""
+    x = np.sort(np.atleast_2d(np.asarray(amostras, dtype=float)), axis=1)
+    n = x.shape[1]
+    media = x.mean(axis=1, keepdims=True)
+    desvio = x.std(axis=1, ddof=1, keepdims=True)
+    z = (x - media) / desvio
+    cdf = ndtr(z)
+    i = np.arange(1, n + 1)
+    ks = np.maximum((i / n - cdf).max(axis=1), (cdf - (i - 1) / n).max(axis=1))
+    # log F(z_i) + log(1 - F(z_{n+1-i})), com log_ndtr para estabilidade nas caudas
+    soma = ((2 * i - 1) * (log_ndtr(z) + log_ndtr(-z[:, ::-1]))).sum(axis=1)
+    ad = -n - soma / n
+    return ks, ad
+
+
+def simular_nula(n, replicas=REPLICAS_PADRAO, semente=SEMENTE_PADRAO):
+    """Simula a distribuição nula das estatísticas para amostras normais de tamanho n."""
+    if n < 3:
+        raise ValueError("Os testes de normalidade precisam de pelo menos 3 valores.")
+    rng = np.random.default_rng([semente, n])
+    bloco = max(1, _BLOCO_MAX // n)
+    ks, ad = [], []
+    for ini in range(0, replicas, bloco):
+        d, a = estatisticas(rng.standard_normal((min(bloco, replicas - ini), n)))
+        ks.append(d)
+        ad.append(a)
+    return DistribuicaoNula(n, np.sort(np.concatenate(ks)).astype(np.float32),
+                            np.sort(np.concatenate(ad)).astype(np.float32))
+
+
+def _arquivo(diretorio, n, replicas, semente):
+    return Path(diretorio) / f"nula_n{n}_r{replicas}_s{semente}.npz"
+
+
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def distribuicao_nula(n, replicas=REPLICAS_PADRAO, semente=SEMENTE_PADRAO, diretorio=None, persistir=True):
+    """Distribuição nula para n: memória, depois disco, e só então simulação (gravada em disco)."""
+    chave = (int(n), int(replicas), int(semente))
+    with _LOCK:
+        nula = _CACHE.get(chave)
+    if nula is not None:
+        return nula
+    caminho = _arquivo(diretorio or DIRETORIO_PADRAO, *chave)
+    if caminho.exists():
+        with np.load(caminho) as dados:
+            nula = DistribuicaoNula(int(n), dados["ks"], dados["ad"])
+    else:
+        nula = simular_nula(*chave)
+        if persistir:
+            try:
+                caminho.parent.mkdir(parents=True, exist_ok=True)
+                temporario = caminho.with_suffix(f".{os.getpid()}.tmp.npz")
+                np.savez(temporario, ks=nula.ks, ad=nula.ad)
+                os.replace(temporario, caminho)
+            except OSError:
+                pass  # Sem permissão de escrita: a tabela fica só em memória
+    with _LOCK:
+        _CACHE[chave] = nula
+    return nula
+
+
+def p_valor(nula_ordenada, estatistica):
+    """Proporção (com correção +1) das estatísticas nulas maiores ou iguais à observada."""
+    maiores = nula_ordenada.size - np.searchsorted(nula_ordenada, np.float32(estatistica), side="left")
+    return float((maiores + 1) / (nula_ordenada.size + 1))
+
+
+def testes_corrigidos(consumo, replicas=REPLICAS_PADRAO, semente=SEMENTE_PADRAO, diretorio=None):
+    """KS com correção de Lilliefors e Anderson-Darling, com p-valores da nula simulada para o n da série."""
+    x = np.asarray(consumo, dtype=float).ravel()
+    nula = distribuicao_nula(x.size, replicas, semente, diretorio)
+    ks, ad = estatisticas(x)
+    return {
+        "lilliefors": (float(ks[0]), p_valor(nula.ks, ks[0])),
+        "anderson": (float(ad[0]), p_valor(nula.ad, ad[0])),
+    }
+
+
+def _precomputar(n, replicas, semente, diretorio):
+    distribuicao_nula(n, replicas, semente, diretorio)
+    return n
+
+
+def precomputar(valores_n, replicas=REPLICAS_PADRAO, semente=SEMENTE_PADRAO, diretorio=None, workers=None,
+                progresso=None):
+    """Grava as tabelas dos `valores_n` ainda ausentes em disco, em paralelo; devolve os n calculados."""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    diretorio = diretorio or DIRETORIO_PADRAO
+    pendentes = [n for n in sorted(set(valores_n)) if not _arquivo(diretorio, n, replicas, semente).exists()]
+    if not pendentes:
+        return []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        # Os maiores n primeiro, para equilibrar a carga entre os processos
+        futuros = [pool.submit(_precomputar, n, replicas, semente, diretorio) for n in reversed(pendentes)]
+        for feitos, futuro in enumerate(as_completed(futuros), start=1):
+            futuro.result()
+            if progresso is not None:
+                progresso(feitos, len(pendentes))
+    return pendentes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-cálculo das distribuições nulas dos testes de normalidade.")
+    parser.add_argument("--faixa", type=int, nargs=2, metavar=("N_MIN", "N_MAX"), default=None,
+                        help="Faixa de tamanhos de amostra (inclusive)")
+    parser.add_argument("--valores", type=int, nargs="+", default=[], help="Tamanhos de amostra avulsos")
+    parser.add_argument("--replicas", type=int, default=REPLICAS_PADRAO)
+    parser.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    parser.add_argument("--diretorio", default=str(DIRETORIO_PADRAO))
+    parser.add_argument("--workers", type=int, default=None, help="Número de processos (padrão: nº de CPUs)")
+    args = parser.parse_args(argv)
+
+    valores = list(args.valores)
+    if args.faixa:
+        valores += list(range(args.faixa[0], args.faixa[1] + 1))
+    if not valores:
+        parser.error("Informe --faixa e/ou --valores.")
+    if min(valores) < 3:
+        parser.error("Os tamanhos de amostra devem ser pelo menos 3.")
+
+    def _progresso(feitos, total):
+        sys.stderr.write(f"\r{feitos}/{total} tabelas calculadas")
+        if feitos == total:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+    calculados = precomputar(valores, args.replicas, args.semente, args.diretorio, args.workers, _progresso)
+    print(f"{len(calculados)} tabelas novas em {args.diretorio} "
+          f"({len(set(valores)) - len(calculados)} já existiam).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
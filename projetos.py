@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Repositório persistente de projetos (SQLite) e representação compacta das séries.
+#
+# Cada execução salva guarda o nome do projeto, a data, os parâmetros e os
+# resultados calculados (JSON), além das séries dos gráficos interativos (JSON
+# comprimido). Os dados de consumo ficam em uma tabela à parte, endereçados pelo
+# hash do conteúdo (o mesmo `hash_dados` das chaves de cache do app) e gravados
+# em colunas compactas (npz comprimido com float32): execuções da mesma série com
+# parâmetros diferentes não duplicam os dados. Reabrir um projeto devolve os
+# resultados prontos, sem recalcular, e o histórico permite comparar as execuções
+# de um projeto ao longo do tempo.
+#
+# O banco fica em `CONSUMO_PROJETOS_DB` (padrão `projetos.sqlite3`). Uso:
+#   python projetos.py listar
+#   python projetos.py historico "Projeto 1" --saida historico.csv
+#   python projetos.py exportar 12 --saida serie.csv
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import zlib
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from calculo import COLUNAS, hash_dados
+
+BANCO_PADRAO = Path(os.environ.get("CONSUMO_PROJETOS_DB", Path(__file__).resolve().parent / "projetos.sqlite3"))
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    chave TEXT PRIMARY KEY,
+    n INTEGER NOT NULL,
+    dados BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    projeto TEXT NOT NULL,
+    criada TEXT NOT NULL,
+    chave_dados TEXT NOT NULL REFERENCES series (chave),
+    chave_parametros TEXT NOT NULL,
+    parametros TEXT NOT NULL,
+    resultados TEXT NOT NULL,
+    graficos BLOB,
+    UNIQUE (projeto, chave_dados, chave_parametros)
+);
+CREATE INDEX IF NOT EXISTS execucoes_projeto ON execucoes (projeto, criada);
+"""
+
+
+class SerieConsumo:
+    """Série mensal guardada em arrays compactos: rótulos dos meses, consumo em float32 e colunas extras.
+
+    Os rótulos ficam em bytes UTF-8 (`rotulos` os devolve como texto) e o float32
+    representa exatamente consumos inteiros até 16.777.216 m³; o `DataFrame`
+    exibido no app é montado apenas quando necessário (`tabela`).
+    """
+
+    def __init__(self, meses, consumo, extras=None):
+        meses = np.asarray(meses)
+        self.meses = meses if meses.dtype.kind == "S" else np.char.encode(meses.astype(str), "utf-8")
+        self.consumo = np.asarray(consumo, dtype=np.float32)
+        self.extras = dict(extras or {})
+        if self.meses.shape != self.consumo.shape:
+            raise ValueError("Os rótulos dos meses e os valores de consumo têm tamanhos diferentes.")
+
+    @classmethod
+    def da_tabela(cls, df):
+        """Converte um DataFrame (`Mês`, `Consumo (m³)` e colunas numéricas opcionais)."""
+        import pandas as pd
+
+        consumo = pd.to_numeric(df[COLUNAS[1]], errors="raise").to_numpy(dtype=np.float32)
+        extras = {}
+        for coluna in df.columns.drop(COLUNAS, errors="ignore"):
+            valores = df[coluna].to_numpy()
+            if valores.dtype.kind == "f":
+                extras[coluna] = valores.astype(np.float32)
+            elif valores.dtype.kind in "iu":
+                extras[coluna] = valores.astype(np.int32)
+        return cls(df[COLUNAS[0]].astype(str).to_numpy(), consumo, extras)
+
+    def tabela(self):
+        import pandas as pd
+
+        return pd.DataFrame({COLUNAS[0]: self.rotulos, COLUNAS[1]: self.consumo, **self.extras})
+
+    def acrescentar(self, df_novos):
+        """Nova série com os meses de `df_novos` ao final (as colunas extras não se aplicam)."""
+        novos = SerieConsumo.da_tabela(df_novos[COLUNAS])
+        return SerieConsumo(np.concatenate([self.meses, novos.meses]), np.concatenate([self.consumo, novos.consumo]))
+
+    @property
+    def rotulos(self):
+        return np.char.decode(self.meses, "utf-8")
+
+    @property
+    def valores(self):
+        """Consumo em float64, para os cálculos (cópia temporária, fora do session_state)."""
+        return self.consumo.astype(float)
+
+    @property
+    def chave(self):
+        return hash_dados(self.consumo)
+
+    @property
+    def nbytes(self):
+        return self.meses.nbytes + self.consumo.nbytes + sum(v.nbytes for v in self.extras.values())
+
+    def __len__(self):
+        return self.consumo.size
+
+    def para_bytes(self):
+        buffer = BytesIO()
+        np.savez_compressed(buffer, meses=self.meses, consumo=self.consumo,
+                            **{f"extra:{nome}": valores for nome, valores in self.extras.items()})
+        return buffer.getvalue()
+
+    @classmethod
+    def de_bytes(cls, dados):
+        with np.load(BytesIO(dados), allow_pickle=False) as npz:
+            extras = {nome.split(":", 1)[1]: npz[nome] for nome in npz.files if nome.startswith("extra:")}
+            return cls(npz["meses"], npz["consumo"], extras)
+
+
+class Execucao(NamedTuple):
+    id: int
+    projeto: str
+    criada: str  # ISO 8601 (UTC)
+    chave_dados: str
+    parametros: dict
+    resultados: dict
+    graficos: dict
+    serie: SerieConsumo
+
+    def resultado(self, nome, **parametros):
+        """Resultado salvo `nome`, se os `parametros` informados forem os desta execução; senão None."""
+        if any(self.parametros.get(chave) != valor for chave, valor in parametros.items()):
+            return None
+        valor = self.resultados.get(nome)
+        return self.graficos.get(nome) if valor is None else valor
+
+
+def _nativo(valor):
+    return valor.item() if isinstance(valor, np.generic) else valor.tolist()
+
+
+def _json(obj):
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=_nativo)
+
+
+def formatar_data(criada):
+    """Data de uma execução (ISO 8601 ou datetime) no fuso local, como dd/mm/aaaa hh:mm."""
+    criada = datetime.fromisoformat(criada if isinstance(criada, str) else criada.isoformat())
+    return criada.astimezone().strftime("%d/%m/%Y %H:%M")
+
+
+def _escalares(dados):
+    """Valores numéricos e textos de um dicionário, incluindo os de dicionários aninhados (um nível)."""
+    planos = {}
+    for nome, valor in dados.items():
+        if isinstance(valor, dict):
+            planos.update(_escalares({k: v for k, v in valor.items() if not isinstance(v, dict)}))
+        elif isinstance(valor, (int, float, str)) and not isinstance(valor, bool):
+            planos[nome] = valor
+    return planos
+
+
+def chave_parametros(parametros):
+    return hashlib.sha1(_json(parametros).encode()).hexdigest()
+
+
+class RepositorioProjetos:
+    """Projetos salvos em um banco SQLite (uma conexão por operação, segura entre threads e processos)."""
+
+    def __init__(self, caminho=None):
+        self.caminho = Path(caminho or BANCO_PADRAO)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        con = self._conectar()
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(_ESQUEMA)
+        finally:
+            con.close()
+
+    def _conectar(self):
+        con = sqlite3.connect(self.caminho, timeout=30)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def _executar(self, sql, parametros=()):
+        con = self._conectar()
+        try:
+            with con:
+                return con.execute(sql, parametros).fetchall()
+        finally:
+            con.close()
+
+    def salvar(self, projeto, serie, parametros, resultados, graficos=None):
+        """Grava (ou atualiza a data de) uma execução; devolve o id. A série só é gravada se for nova."""
+        chave = serie.chave
+        agora = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        blob_graficos = zlib.compress(_json(graficos or {}).encode()) if graficos else None
+        con = self._conectar()
+        try:
+            with con:
+                con.execute("INSERT OR IGNORE INTO series (chave, n, dados) VALUES (?, ?, ?)",
+                            (chave, len(serie), serie.para_bytes()))
+                return con.execute(
+                    "INSERT INTO execucoes (projeto, criada, chave_dados, chave_parametros, parametros, resultados, "
+                    "graficos) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (projeto, chave_dados, chave_parametros) DO UPDATE SET "
+                    "criada = excluded.criada, resultados = excluded.resultados, "
+                    "graficos = coalesce(excluded.graficos, graficos) RETURNING id",
+                    (projeto, agora, chave, chave_parametros(parametros), _json(parametros), _json(resultados),
+                     blob_graficos),
+                ).fetchone()[0]
+        finally:
+            con.close()
+
+    def projetos(self):
+        """Nome, data da última execução e número de execuções de cada projeto (mais recentes primeiro)."""
+        return [tuple(linha) for linha in self._executar(
+            "SELECT projeto, max(criada), count(*) FROM execucoes GROUP BY projeto ORDER BY max(criada) DESC")]
+
+    def execucoes(self, projeto):
+        """(id, data) das execuções de um projeto, das mais recentes às mais antigas."""
+        return [tuple(linha) for linha in self._executar(
+            "SELECT id, criada FROM execucoes WHERE projeto = ? ORDER BY criada DESC, id DESC", (projeto,))]
+
+    def abrir(self, id_execucao=None, projeto=None):
+        """Execução completa (com a série) pelo id ou a mais recente do projeto; None se não existir."""
+        sql = "SELECT e.*, s.dados FROM execucoes e JOIN series s ON s.chave = e.chave_dados WHERE "
+        if id_execucao is not None:
+            linhas = self._executar(sql + "e.id = ?", (int(id_execucao),))
+        else:
+            linhas = self._executar(sql + "e.projeto = ? ORDER BY e.criada DESC, e.id DESC LIMIT 1", (projeto,))
+        if not linhas:
+            return None
+        linha = linhas[0]
+        graficos = json.loads(zlib.decompress(linha["graficos"])) if linha["graficos"] else {}
+        return Execucao(linha["id"], linha["projeto"], linha["criada"], linha["chave_dados"],
+                        json.loads(linha["parametros"]), json.loads(linha["resultados"]), graficos,
+                        SerieConsumo.de_bytes(linha["dados"]))
+
+    def historico(self, projeto):
+        """Tabela (uma linha por execução, da mais antiga à mais recente) com parâmetros e resultados.
+
+        Lê apenas as colunas JSON: as séries e os gráficos não são carregados.
+        """
+        import pandas as pd
+
+        linhas = self._executar(
+            "SELECT e.id, e.criada, s.n, e.parametros, e.resultados FROM execucoes e "
+            "JOIN series s ON s.chave = e.chave_dados WHERE e.projeto = ? ORDER BY e.criada, e.id", (projeto,))
+        registros = []
+        for linha in linhas:
+            registro = {"id": linha["id"], "criada": pd.Timestamp(linha["criada"]), "n_meses": linha["n"]}
+            registro.update(_escalares(json.loads(linha["parametros"])))
+            registro.update(_escalares(json.loads(linha["resultados"])))
+            registros.append(registro)
+        return pd.DataFrame(registros)
+
+    def excluir(self, id_execucao):
+        """Remove uma execução e a sua série, se nenhuma outra execução a usar."""
+        con = self._conectar()
+        try:
+            with con:
+                con.execute("DELETE FROM execucoes WHERE id = ?", (int(id_execucao),))
+                con.execute("DELETE FROM series WHERE chave NOT IN (SELECT chave_dados FROM execucoes)")
+        finally:
+            con.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta ao repositório de projetos salvos.")
+    parser.add_argument("--banco", default=str(BANCO_PADRAO), help="Arquivo SQLite do repositório")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("listar", help="Projetos salvos, com a data da última execução")
+    p_hist = sub.add_parser("historico", help="Execuções de um projeto (parâmetros e resultados)")
+    p_hist.add_argument("projeto")
+    p_hist.add_argument("--saida", default=None, help="Grava a tabela (.csv ou .parquet) em vez de exibi-la")
+    p_exp = sub.add_parser("exportar", help="Série de consumo de uma execução em CSV")
+    p_exp.add_argument("id", type=int)
+    p_exp.add_argument("--saida", default="serie.csv")
+    args = parser.parse_args(argv)
+
+    repositorio = RepositorioProjetos(args.banco)
+    if args.comando == "listar":
+        for projeto, ultima, total in repositorio.projetos():
+            print(f"{projeto}\t{ultima}\t{total} execuções")
+    elif args.comando == "historico":
+        tabela = repositorio.historico(args.projeto)
+        if tabela.empty:
+            print(f"Erro: projeto não encontrado: {args.projeto}", file=sys.stderr)
+            return 1
+        if args.saida:
+            from lote import salvar_tabela
+            salvar_tabela(tabela, args.saida)
+            print(f"{len(tabela)} execuções -> {args.saida}")
+        else:
+            print(tabela.to_string(index=False))
+    else:
+        execucao = repositorio.abrir(args.id)
+        if execucao is None:
+            print(f"Erro: execução não encontrada: {args.id}", file=sys.stderr)
+            return 1
+        execucao.serie.tabela().to_csv(args.saida, index=False)
+        print(f"{len(execucao.serie)} meses -> {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
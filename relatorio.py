@@ -0,0 +1,241 @@
+# coding: utf-8
+
+# Relatório em Word (.docx) do Consumo Referencial.
+#
+# `gerar_relatorio` é uma função pura (dados + PNGs das figuras -> bytes do .docx), o
+# que permite executá-la fora do script do Streamlit. O app submete
+# `relatorio_com_figuras` (a série e os resultados, sem as figuras): a KDE e a
+# rasterização das figuras, a parte mais lenta, rodam também no processo de
+# trabalho. `FilaRelatorios` distribui os pedidos em um pool de processos e guarda
+# os artefatos prontos, indexados pelo hash das entradas, para que um novo pedido
+# com as mesmas entradas seja imediato.
+
+import hashlib
+import json
+import multiprocessing
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from io import BytesIO
+
+from calculo import TEMPO_DIA, format_num
+
+MIME_DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def gerar_relatorio(dados, png_distribuicao, png_cdf):
+    """Monta o relatório a partir do dicionário `dados` e devolve os bytes do .docx."""
+    # python-docx só é carregado quando um relatório é de fato gerado
+    from docx import Document
+    from docx.shared import Inches, Cm
+
+    doc = Document()
+    # Ajuste das margens: superior e inferior = 2 cm; esquerda e direita = 2,5 cm
+    for section in doc.sections:
+        section.top_margin = Cm(2)
+        section.bottom_margin = Cm(2)
+        section.left_margin = Cm(2.5)
+        section.right_margin = Cm(2.5)
+
+    doc.add_heading("Relatório de Consumo Referencial", 0)
+    doc.add_heading("Dados do Projeto", level=1)
+    doc.add_paragraph(f"Nome do Projeto: {dados['nome_projeto']}")
+    doc.add_paragraph(f"Técnico Operador: {dados['tecnico_operador']}")
+    doc.add_paragraph(f"Tipo de Medição: {dados['tipo_medicao']}")
+    doc.add_heading("Parâmetros de Entrada", level=1)
+    doc.add_paragraph(f"Modelo Estatístico: {dados['modelo']}")
+    doc.add_paragraph(f"Percentil de Projeto: {dados['percentil']}%")
+    doc.add_paragraph(f"Número de dias do mês: {dados['dias_mes']}")
+    doc.add_paragraph(f"Número de horas diárias de operação: {dados['horas_operacao']}")
+    doc.add_paragraph(f"Tempo diário (s): {dados.get('tempo_dia', TEMPO_DIA)}")
+    doc.add_paragraph(f"K1 (máx. diária): {format_num(dados['k1'], 2)}")
+    doc.add_paragraph(f"K2 (máx. horária): {format_num(dados['k2'], 2)}")
+    doc.add_heading("Resultados", level=1)
+    doc.add_paragraph(f"Consumo Referencial (m³): {format_num(dados['consumo_ref'], 0)}")
+    doc.add_paragraph(f"Desvio Padrão (m³): {format_num(dados['desvio_padrao'], 2)}")
+    doc.add_paragraph(f"Vazão Média (L/s): {format_num(dados['q_med'], 2)}")
+    doc.add_paragraph(f"Vazão Máx. Diária (L/s): {format_num(dados['q_max_dia'], 2)}")
+    doc.add_paragraph(f"Vazão Máx. Horária (L/s): {format_num(dados['q_max_hora'], 2)}")
+    doc.add_paragraph(f"Vazão Máx. Dia+Hora (L/s): {format_num(dados['q_max_real'], 2)}")
+    doc.add_heading("Testes de Normalidade", level=1)
+    for texto in dados["textos_testes"]:
+        doc.add_paragraph(texto)
+    # As figuras chegam já rasterizadas (PNG)
+    doc.add_heading("Gráfico de Distribuição", level=1)
+    doc.add_picture(BytesIO(png_distribuicao), width=Inches(6))
+    doc.add_heading("Funções de Distribuição Acumulada", level=1)
+    doc.add_picture(BytesIO(png_cdf), width=Inches(6))
+    doc_buffer = BytesIO()
+    doc.save(doc_buffer)
+    return doc_buffer.getvalue()
+
+
+def _figuras(consumo, kde, media, desvio_padrao, consumo_ref, rotulo_ref, stat_param="count"):
+    from graficos import figura_distribuicao, figura_cdf, figura_png
+
+    return (figura_png(figura_distribuicao(consumo, kde, media, desvio_padrao, consumo_ref, rotulo_ref, stat_param)),
+            figura_png(figura_cdf(kde, media, desvio_padrao)))
+
+
+def relatorio_com_figuras(dados, consumo, media, rotulo_ref, stat_param="count"):
+    """Ajusta a KDE, desenha as figuras e monta o relatório (executado no pool de `FilaRelatorios`)."""
+    from estatistica import ajustar_kde
+
+    kde = ajustar_kde(consumo, bw_adjust=1)
+    return gerar_relatorio(dados, *_figuras(consumo, kde, media, dados["desvio_padrao"], dados["consumo_ref"],
+                                            rotulo_ref, stat_param))
+
+
+def relatorio_projeto(consumo, parametros, dados_projeto, resultado=None, kde=None):
+    """Desenha as figuras e monta o relatório de um projeto (usado no modo em lote).
+
+    `resultado` (de `calcular_projeto`) e `kde` já calculados são reaproveitados;
+    sem eles, o cálculo é feito aqui.
+    """
+    import numpy as np
+    from calculo import calcular_projeto, textos_testes
+    from estatistica import ajustar_kde
+
+    consumo = np.asarray(consumo, dtype=float)
+    # Uma única KDE para o consumo referencial e para as figuras
+    if kde is None:
+        kde = ajustar_kde(consumo, bw_adjust=1)
+    if resultado is None:
+        resultado = calcular_projeto(consumo, kde=kde, **parametros)
+    rotulo_ref = f"{parametros['percentil']}% ≈ {format_num(resultado['consumo_ref'], 0)} m³"
+    pngs = _figuras(consumo, kde, resultado["media"], resultado["desvio_padrao"], resultado["consumo_ref"],
+                    rotulo_ref)
+    dados = dict(dados_projeto)
+    dados.update(parametros)
+    dados.update(resultado)
+    # Os testes já estão em `resultado`: apenas as frases são montadas
+    dados["textos_testes"] = textos_testes({
+        nome: (resultado[f"{nome}_estatistica"], resultado[f"{nome}_p_valor"])
+        for nome in ("shapiro", "dagostino", "ks")
+    })
+    return gerar_relatorio(dados, *pngs)
+
+
+def chave_relatorio(dados, png_distribuicao=None, png_cdf=None):
+    """Hash das entradas do relatório (chave do artefato em cache).
+
+    As figuras podem ser omitidas quando `dados` já as determina (ex.: inclui o
+    hash dos dados de consumo e a apresentação do histograma).
+    """
+    h = hashlib.sha1(json.dumps(dados, sort_keys=True, default=str).encode("utf-8"))
+    for png in (png_distribuicao, png_cdf):
+        if png is not None:
+            h.update(hashlib.sha1(png).digest())
+    return h.hexdigest()
+
+
+# Guarda a troca de `sys.modules["__main__"]` entre as filas de um mesmo processo
+_LOCK_MAIN = threading.Lock()
+
+
+@contextmanager
+def _main_neutro():
+    """Troca temporariamente o `__main__` por um módulo vazio.
+
+    Com "spawn", cada processo de trabalho reimporta o `__main__` do processo pai;
+    no Streamlit ele é o app.py, que seria executado de novo em cada worker (e,
+    por exemplo, tentaria abrir outra vez a porta do servidor de métricas). Sem
+    `__file__` nem `__spec__`, o worker não tem o que reimportar.
+    """
+    with _LOCK_MAIN:
+        original = sys.modules.get("__main__")
+        neutro = types.ModuleType("__main__")
+        sys.modules["__main__"] = neutro
+        try:
+            yield
+        finally:
+            # Não desfaz um `__main__` instalado por outra thread nesse intervalo
+            if sys.modules.get("__main__") is neutro:
+                sys.modules["__main__"] = original
+
+
+class FilaRelatorios:
+    """Gera relatórios em segundo plano e mantém os `max_artefatos` mais recentes.
+
+    `submeter` devolve um `Future` (o handle do pedido); pedidos com a mesma chave
+    reaproveitam o trabalho já feito ou em andamento. Pedidos que falharam são
+    refeitos na submissão seguinte. Por padrão os argumentos são os de
+    `gerar_relatorio`; com `funcao=relatorio_com_figuras` as figuras são
+    desenhadas no processo de trabalho. Se um processo de trabalho morrer, o pool
+    é recriado e os pedidos interrompidos são submetidos de novo.
+    """
+
+    def __init__(self, workers=2, max_artefatos=64, ao_concluir=None):
+        self._workers = workers
+        self._executor = self._novo_executor()
+        self._pedidos = OrderedDict()
+        # (funcao, args) de cada pedido, para refazê-lo se o pool quebrar
+        self._entradas = {}
+        self._max_artefatos = max_artefatos
+        self._lock = threading.Lock()
+        # Chamado com (chave, segundos desde a submissão) quando um relatório fica pronto
+        self._ao_concluir = ao_concluir
+
+    def _novo_executor(self):
+        # "spawn" evita copiar por fork o estado do servidor (threads, sockets)
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _recriar_executor(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._novo_executor()
+
+    def _submit(self, funcao, args):
+        # Os workers são criados sob demanda nas submissões: o `__main__` fica neutro durante elas
+        with _main_neutro():
+            try:
+                return self._executor.submit(funcao, *args)
+            except BrokenProcessPool:
+                self._recriar_executor()
+                return self._executor.submit(funcao, *args)
+
+    def _enfileirar(self, chave, funcao, args):
+        futuro = self._submit(funcao, args)
+        if self._ao_concluir is not None:
+            inicio = time.perf_counter()
+
+            def _concluido(f):
+                if f.exception() is None:
+                    self._ao_concluir(chave, time.perf_counter() - inicio)
+
+            futuro.add_done_callback(_concluido)
+        self._pedidos[chave] = futuro
+        self._entradas[chave] = (funcao, args)
+        return futuro
+
+    def submeter(self, chave, *args, funcao=gerar_relatorio):
+        with self._lock:
+            futuro = self._pedidos.get(chave)
+            if futuro is not None and not (futuro.done() and futuro.exception() is not None):
+                self._pedidos.move_to_end(chave)
+                return futuro
+            futuro = self._enfileirar(chave, funcao, args)
+            self._descartar_antigos()
+            return futuro
+
+    def _descartar_antigos(self):
+        # Só descarta artefatos concluídos; pedidos em andamento permanecem
+        excesso = len(self._pedidos) - self._max_artefatos
+        for chave in [c for c, f in self._pedidos.items() if f.done()][:max(excesso, 0)]:
+            del self._pedidos[chave]
+            del self._entradas[chave]
+
+    def obter(self, chave):
+        with self._lock:
+            futuro = self._pedidos.get(chave)
+            if futuro is not None and futuro.done() and isinstance(futuro.exception(), BrokenProcessPool):
+                # O pedido não falhou por si: o pool quebrou (`_submit` o recria) e o pedido é refeito
+                futuro = self._enfileirar(chave, *self._entradas[chave])
+            return futuro
+
+    def encerrar(self, esperar=True):
+        self._executor.shutdown(wait=esperar)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Cálculo simultâneo de vários setores de medição a partir de um único arquivo.
+#
+# Aceita o formato longo (colunas setor, mês, consumo) ou o largo (coluna Mês e
+# uma coluna por setor). As séries são dispostas em uma matriz setores x meses
+# (completada com NaN) e todas as estatísticas, quantis (percentil ou KDE) e
+# vazões são calculados de uma só vez, sem laço em Python por setor.
+#
+# Uso:
+#   python setores.py setores.csv --saida comparacao.csv --modelo KDE --percentil 95
+
+import argparse
+import hashlib
+import sys
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from calculo import COLUNAS, TEMPO_DIA, calcular_vazoes
+
+COLUNAS_LONGO = ["setor", "Mês", "Consumo (m³)"]
+
+
+def _normalizar(nome):
+    sem_acento = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode()
+    return sem_acento.strip().lower()
+
+
+def para_formato_longo(df):
+    """Converte um DataFrame longo ou largo para as colunas `setor, Mês, Consumo (m³)`.
+
+    O formato longo é reconhecido pelas colunas cujo nome começa por "setor", "mes"
+    e "consumo" (sem diferenciar acentos e maiúsculas); nos demais casos a primeira
+    coluna é o mês e cada uma das outras é um setor.
+    """
+    nomes = {_normalizar(c): c for c in df.columns}
+
+    def achar(prefixo):
+        return next((c for n, c in nomes.items() if n.startswith(prefixo)), None)
+
+    col_setor, col_mes, col_consumo = achar("setor"), achar("mes"), achar("consumo")
+    if col_setor is not None and col_mes is not None and col_consumo is not None:
+        longo = df[[col_setor, col_mes, col_consumo]].copy()
+        longo.columns = COLUNAS_LONGO
+    else:
+        if df.shape[1] < 2:
+            raise ValueError("O arquivo deve ter as colunas setor, mês e consumo, ou uma coluna Mês "
+                             "seguida de uma coluna por setor.")
+        longo = df.melt(id_vars=df.columns[0], var_name="setor", value_name="Consumo (m³)")
+        longo = longo.rename(columns={df.columns[0]: "Mês"})[COLUNAS_LONGO]
+    longo["setor"] = longo["setor"].astype(str)
+    longo["Consumo (m³)"] = pd.to_numeric(longo["Consumo (m³)"], errors="coerce")
+    # Células vazias do formato largo (setores com séries mais curtas) são descartadas
+    return longo.dropna(subset=["Consumo (m³)"]).reset_index(drop=True)
+
+
+def ler_setores(arquivo):
+    df = pd.read_csv(arquivo)
+    longo = para_formato_longo(df)
+    if longo.empty:
+        raise ValueError("Nenhum valor de consumo numérico encontrado no arquivo.")
+    return longo
+
+
+def hash_setores(longo):
+    """Hash de conteúdo do conjunto de setores (chave de cache)."""
+    return hashlib.sha1(pd.util.hash_pandas_object(longo, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def serie_setor(longo, setor):
+    """Série de um setor no formato da aba Cálculo (`Mês`, `Consumo (m³)`)."""
+    return longo.loc[longo["setor"] == setor, COLUNAS].reset_index(drop=True)
+
+
+def matriz_setores(longo):
+    """Setores (na ordem de aparição) e a matriz setores x meses, completada com NaN."""
+    codigos, setores = pd.factorize(longo["setor"], sort=False)
+    posicao = longo.groupby(codigos).cumcount().to_numpy()
+    matriz = np.full((setores.size, posicao.max() + 1 if posicao.size else 0), np.nan)
+    matriz[codigos, posicao] = longo["Consumo (m³)"].to_numpy(dtype=float)
+    return setores, matriz
+
+
+def calcular_setores(longo, modelo="KDE", percentil=95, dias_mes=30, horas_operacao=24, k1=1.4, k2=2.0,
+                     tempo_dia=TEMPO_DIA):
+    """Tabela comparativa (um setor por linha) com estatísticas, consumo referencial e vazões."""
+    from estatistica import _quantil_kde_lote, percentil_linhas
+
+    setores, matriz = matriz_setores(longo)
+    n = (~np.isnan(matriz)).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = np.nanmean(matriz, axis=1)
+        desvio = np.sqrt(np.nansum((matriz - media[:, None]) ** 2, axis=1) / n)
+    ordenada = np.sort(matriz, axis=1)
+    if modelo == "KDE":
+        consumo_ref = _quantil_kde_lote(matriz, percentil / 100)
+    else:
+        consumo_ref = percentil_linhas(ordenada, n, percentil / 100)
+    tabela = pd.DataFrame({
+        "n_meses": n,
+        "media": media,
+        "desvio_padrao": desvio,
+        "minimo": ordenada[:, 0],
+        "maximo": np.take_along_axis(ordenada, (n - 1)[:, None], axis=1)[:, 0],
+        "consumo_ref": consumo_ref,
+    }, index=pd.Index(setores, name="setor"))
+    for nome, valores in calcular_vazoes(consumo_ref, dias_mes, horas_operacao, k1, k2, tempo_dia).items():
+        tabela[nome] = valores
+    # Participação de cada setor na vazão máxima total
+    tabela["participacao_q_max_real"] = tabela["q_max_real"] / tabela["q_max_real"].sum()
+    return tabela
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consumo referencial de vários setores em um único arquivo.")
+    parser.add_argument("arquivo", help="CSV no formato longo (setor, mês, consumo) ou largo (Mês + um setor por coluna)")
+    parser.add_argument("--saida", default="comparacao_setores.csv", help="Tabela comparativa (.csv ou .parquet)")
+    parser.add_argument("--modelo", choices=["KDE", "Distribuição Normal"], default="KDE")
+    parser.add_argument("--percentil", type=int, default=95)
+    parser.add_argument("--dias-mes", type=int, default=30)
+    parser.add_argument("--horas", type=int, default=24, help="Horas diárias de operação (1 a 24)")
+    parser.add_argument("--k1", type=float, default=1.4)
+    parser.add_argument("--k2", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    if not 50 <= args.percentil <= 99:
+        parser.error("--percentil deve estar entre 50 e 99.")
+    if not 1 <= args.horas <= 24:
+        parser.error("--horas deve estar entre 1 e 24.")
+
+    from lote import salvar_tabela
+
+    tabela = calcular_setores(ler_setores(args.arquivo), args.modelo, args.percentil, args.dias_mes,
+                              args.horas, args.k1, args.k2)
+    salvar_tabela(tabela.reset_index(), args.saida)
+    print(f"{len(tabela)} setores calculados -> {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
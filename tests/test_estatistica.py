@@ -0,0 +1,18 @@
+# coding: utf-8
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from estatistica import bootstrap_consumo_ref  # noqa: E402
+
+
+def test_bootstrap_com_menos_replicas_que_workers():
+    consumo = np.random.default_rng(0).gamma(4.0, 250.0, size=48)
+    paralelo = bootstrap_consumo_ref(consumo, 95, n_replicas=3, semente=1, workers=4)
+    serial = bootstrap_consumo_ref(consumo, 95, n_replicas=3, semente=1, workers=1)
+    assert paralelo.shape == (3,)
+    np.testing.assert_allclose(paralelo, serial)